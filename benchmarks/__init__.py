@@ -0,0 +1,5 @@
+"""
+Micro-benchmarks for the hot paths of the provider.
+
+Run a benchmark from the project root, e.g. ``python -m benchmarks.middleware``.
+"""
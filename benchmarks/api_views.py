@@ -0,0 +1,81 @@
+"""
+Framework overhead of the JSON API views: DRF ``APIView`` versus the lightweight ``JSONView``.
+
+Both variants return the same payload, so the difference is request wrapping, body parsing and content
+negotiation. Views are called directly with a ``RequestFactory`` request to keep middleware and URL resolution
+out of the numbers.
+"""
+
+from benchmarks.utils import bench, report, setup_django
+
+setup_django()
+
+from django.test import RequestFactory  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+from rest_framework.views import APIView  # noqa: E402
+
+from django_sso.core.http import FastJsonResponse  # noqa: E402
+from django_sso.core.views import JSONView  # noqa: E402
+
+PAYLOAD = {
+    "access_token": "x" * 200,
+    "token_type": "bearer",
+    "expires_in": 900,
+    "refresh_token": "y" * 86,
+    "scopes": ["openid", "email", "profile"],
+}
+FORM = {"client_id": "client", "client_secret": "secret", "code": "code", "grant_type": "authorization_code"}
+
+
+class DRFView(APIView):
+    permission_classes = []
+    authentication_classes = []
+
+    def get(self, request):
+        return Response(PAYLOAD)
+
+    def post(self, request):
+        return Response({**PAYLOAD, "client_id": request.data.get("client_id")})
+
+
+class LightweightView(JSONView):
+    def get(self, request):
+        return FastJsonResponse(PAYLOAD)
+
+    def post(self, request):
+        return FastJsonResponse({**PAYLOAD, "client_id": self.data.get("client_id")})
+
+
+def run():
+    factory = RequestFactory()
+    drf_view = DRFView.as_view()
+    lightweight_view = LightweightView.as_view()
+
+    report(
+        "GET, JSON response",
+        [
+            ("DRF APIView", bench(lambda: drf_view(factory.get("/")).render())),
+            ("JSONView", bench(lambda: lightweight_view(factory.get("/")))),
+        ],
+    )
+    report(
+        "POST form body, JSON response",
+        [
+            ("DRF APIView", bench(lambda: drf_view(factory.post("/", FORM)).render())),
+            ("JSONView", bench(lambda: lightweight_view(factory.post("/", FORM)))),
+        ],
+    )
+    report(
+        "POST JSON body, JSON response",
+        [
+            (
+                "DRF APIView",
+                bench(lambda: drf_view(factory.post("/", FORM, content_type="application/json")).render()),
+            ),
+            ("JSONView", bench(lambda: lightweight_view(factory.post("/", FORM, content_type="application/json")))),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,100 @@
+"""
+Authorization codes kept in the cache versus sealed into the code (``AUTH_CODE_MODE``).
+
+Reports the bytes each mode keeps in the cache per issued code (key plus pickled value, as django-redis stores
+them), the cache round trips of an authorize -> token exchange, and the latency of issuing and redeeming a code,
+alone and through ``TokenView``. The local cache hides the network: with Redis every round trip adds its latency.
+"""
+
+import pickle
+
+from benchmarks.utils import bench, migrate, report, setup_django
+
+setup_django()
+
+from django.core.cache import cache  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+
+from django_sso.users.api.views import TokenView  # noqa: E402
+from django_sso.users.models import Application, User  # noqa: E402
+from django_sso.users.utils import auth  # noqa: E402
+from django_sso.users.utils.auth import create_and_cache_auth_code, load_auth_code, mark_auth_code_used  # noqa: E402
+
+REDIRECT_URI = "https://example.com/callback"
+SCOPES = ["openid", "email", "profile"]
+CODE_ARGS = {
+    "nonce": "n-0S6_WzA2Mj",
+    "code_challenge": "E9Melhoa2OwvFrEMTJguCHaoeK1t8URWbuGJSstw-cM",
+    "code_challenge_method": "S256",
+}
+
+
+class RecordingCache:
+    """
+    Counts the cache calls of the auth code helpers and the bytes they write.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.written = 0
+
+    def __getattr__(self, name):
+        method = getattr(cache, name)
+
+        def call(key, *args, **kwargs):
+            self.calls += 1
+            if name in ("set", "add"):
+                self.written += len(cache.make_key(key)) + len(pickle.dumps(args[0] if args else kwargs["value"]))
+            return method(key, *args, **kwargs)
+
+        return call
+
+
+def exchange(user, app):
+    code = create_and_cache_auth_code(user, app, REDIRECT_URI, SCOPES, **CODE_ARGS)
+    mark_auth_code_used(code, load_auth_code(code, app))
+    return code
+
+
+def run():
+    migrate()
+
+    user = User.objects.create_user(email="user@example.com", password="password")
+    app = Application.objects.create(name="Benchmark", redirect_uris=REDIRECT_URI, allowed_scopes=" ".join(SCOPES))
+    raw_secret = app._raw_client_secret
+    factory = RequestFactory()
+    token_view = TokenView.as_view()
+
+    def token_request():
+        code = create_and_cache_auth_code(user, app, REDIRECT_URI, SCOPES, nonce=CODE_ARGS["nonce"])
+        data = {
+            "client_id": app.client_id,
+            "client_secret": raw_secret,
+            "code": code,
+            "redirect_uri": REDIRECT_URI,
+            "grant_type": "authorization_code",
+        }
+        response = token_view(factory.post("/api/token/", data))
+        assert response.status_code == 200, response.content
+
+    print(f"\n{'Mode':<10} {'code length':>12} {'bytes at authorize':>20} {'total written':>14} {'round trips':>12}")
+    print("-" * 72)
+    latencies, token_latencies = [], []
+    for mode in ("cache", "sealed"):
+        with override_settings(AUTH_CODE_MODE=mode, RATE_LIMIT_ENABLED=False):
+            recorder = auth.cache = RecordingCache()
+            code = create_and_cache_auth_code(user, app, REDIRECT_URI, SCOPES, **CODE_ARGS)
+            issued = recorder.written
+            mark_auth_code_used(code, load_auth_code(code, app))
+            print(f"{mode:<10} {len(code):>12} {issued:>20} {recorder.written:>14} {recorder.calls:>12}")
+            auth.cache = cache
+
+            latencies.append((mode, bench(lambda: exchange(user, app))))
+            token_latencies.append((mode, bench(token_request, iterations=500, warmup=50)))
+
+    report("Issue and redeem a code", latencies)
+    report("Issue a code and POST /token/", token_latencies)
+
+
+if __name__ == "__main__":
+    run()
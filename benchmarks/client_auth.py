@@ -0,0 +1,32 @@
+"""
+Per-request cost of client authentication on ``/token/``: the argon2 ``check_password`` it used to run versus
+``Application.check_client_secret`` with the peppered HMAC-SHA256 scheme, on an already loaded application.
+"""
+
+from benchmarks.utils import bench, migrate, report, setup_django
+
+setup_django()
+
+from django.contrib.auth.hashers import check_password, make_password  # noqa: E402
+
+from django_sso.users.models import Application  # noqa: E402
+
+
+def run():
+    migrate()
+
+    app = Application.objects.create(name="Benchmark", redirect_uris="https://example.com/callback")
+    raw_secret = app._raw_client_secret
+    argon2_secret = make_password(raw_secret, hasher="argon2")
+
+    report(
+        "Client secret verification",
+        [
+            ("argon2 (before)", bench(lambda: check_password(raw_secret, argon2_secret), iterations=20, warmup=2)),
+            ("hmac_sha256 (after)", bench(lambda: app.check_client_secret(raw_secret))),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    run()
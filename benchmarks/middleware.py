@@ -0,0 +1,39 @@
+"""
+Per-request overhead of the middleware pipeline on API routes.
+
+Compares the previous flat ``MIDDLEWARE`` stack with the path-aware dispatch, where API routes only run the
+security and CORS middleware.
+"""
+
+from benchmarks.utils import bench, report, setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+FULL_MIDDLEWARE = [
+    *[path for path in settings.MIDDLEWARE if path != "django_sso.core.middleware.PathDispatchMiddleware"],
+    *settings.WEB_MIDDLEWARE,
+]
+
+ENDPOINTS = [
+    ("jwks", "/api/users/jwks/"),
+    ("userinfo (no token)", "/api/users/userinfo/"),
+]
+
+
+def run():
+    for label, url in ENDPOINTS:
+        rows = []
+        with override_settings(MIDDLEWARE=FULL_MIDDLEWARE):
+            client = Client()
+            rows.append(("full middleware stack", bench(lambda: client.get(url))))
+
+        client = Client()
+        rows.append(("path-aware dispatch", bench(lambda: client.get(url))))
+        report(f"GET {url} [{label}]", rows)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,59 @@
+"""
+Cost of a rate limit check, next to the argon2 verification it protects.
+
+Uses the cache configured by the settings: the Redis Lua script when ``CACHES`` points at django-redis (e.g.
+``DJANGO_SETTINGS_MODULE=config.settings.production``), the in-process fallback otherwise.
+"""
+
+from benchmarks.utils import bench, report, setup_django
+
+setup_django()
+
+from itertools import count  # noqa: E402
+
+from django.contrib.auth.hashers import check_password, make_password  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from django_sso.core.exceptions import RateLimited  # noqa: E402
+from django_sso.core.ratelimit import get_rate_limiter  # noqa: E402
+
+UNLIMITED = {"login:ip": (10**9, 60), "login:account": (10**9, 60)}
+BLOCKED = {"login:ip": (1, 3600), "login:account": (1, 3600)}
+
+
+def run():
+    encoded = make_password("password", hasher="argon2")
+    ids = count()
+
+    with override_settings(RATE_LIMITS=UNLIMITED):
+        limiter = get_rate_limiter()
+
+        def allowed():
+            n = next(ids)
+            limiter.check(("login:ip", f"10.0.{n % 256}.{n // 256 % 256}"), ("login:account", f"user{n}@example.com"))
+
+        allowed_time = bench(allowed)
+
+    with override_settings(RATE_LIMITS=BLOCKED):
+        limiter = get_rate_limiter()
+
+        def blocked():
+            try:
+                limiter.check(("login:ip", "10.0.0.1"), ("login:account", "user@example.com"))
+            except RateLimited:
+                pass
+
+        blocked_time = bench(blocked)
+
+    report(
+        f"Login attempt ({type(limiter.backend).__name__})",
+        [
+            ("argon2 verify", bench(lambda: check_password("password", encoded), iterations=20, warmup=2)),
+            ("rate limit check, allowed", allowed_time),
+            ("rate limit check, blocked (local)", blocked_time),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    run()
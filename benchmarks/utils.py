@@ -0,0 +1,47 @@
+import logging
+import os
+import time
+
+
+def setup_django():
+    """Configure Django for a benchmark run (in-memory SQLite and local cache unless overridden)."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+    os.environ.setdefault("DATABASE_URL", "sqlite://:memory:")
+    os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+
+    import django
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    # 4xx responses are expected in some scenarios, keep them out of the output.
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+
+
+def migrate():
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0, interactive=False)
+
+
+def bench(fn, iterations=2000, warmup=200, repeat=5):
+    """Return the best average time per call of ``fn``, in seconds."""
+    for _ in range(warmup):
+        fn()
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best
+
+
+def report(title, rows):
+    """Print ``(name, seconds_per_op)`` rows, relative to the first one."""
+    print(f"\n{title}")
+    print("-" * 72)
+    baseline = rows[0][1]
+    for name, seconds in rows:
+        print(f"{name:<36} {seconds * 1e6:>10.1f} us/op {1 / seconds:>10.0f} op/s {baseline / seconds:>6.2f}x")
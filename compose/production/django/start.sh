@@ -9,4 +9,5 @@ echo "Collecting static files..."
 
 python /app/manage.py collectstatic --noinput
 
-exec /usr/local/bin/gunicorn config.wsgi --bind 0.0.0.0:8000 --chdir=/app
+# Threaded workers, so password hashing (on its own bounded pool) does not block the cheap endpoints.
+exec /usr/local/bin/gunicorn config.wsgi --bind 0.0.0.0:8000 --chdir=/app --threads "${GUNICORN_THREADS:-4}"
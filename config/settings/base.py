@@ -36,6 +36,17 @@ LANGUAGE_CODE = "en-us"
 # https://docs.djangoproject.com/en/dev/ref/settings/#databases
 DATABASES = {"default": env.db("DATABASE_URL")}
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# Read replicas (comma-separated URLs), see django_sso.core.db.routers.ReplicaRouter.
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[])):
+    DATABASES[f"replica_{_index}"] = {**env.db_url_config(_url), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(f"replica_{_index}")
+DATABASE_ROUTERS = ["django_sso.core.db.routers.ReplicaRouter"]
+# Models whose reads outside of transactions go to the replicas.
+REPLICA_ROUTED_MODELS = ["users.Application", "users.User"]
+# Seconds a client's reads stay on the primary after it wrote, longer than the replication lag.
+REPLICA_STICKY_SECONDS = 5
+REPLICA_STICKY_COOKIE = "sso_primary"
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -84,6 +95,9 @@ AUTHENTICATION_BACKENDS = [
 AUTH_USER_MODEL = "users.User"
 
 AUTH_CODE_TTL = env.int("DJANGO_AUTH_CODE_TTL", 10 * 60)
+# "cache": codes are random keys of their data in the cache. "sealed": the data is encrypted into the code itself
+# (django_sso.users.utils.auth), the cache only holds a small redeemed marker.
+AUTH_CODE_MODE = env("DJANGO_AUTH_CODE_MODE", default="cache")
 
 
 # PASSWORDS
@@ -91,11 +105,38 @@ AUTH_CODE_TTL = env.int("DJANGO_AUTH_CODE_TTL", 10 * 60)
 # https://docs.djangoproject.com/en/dev/ref/settings/#password-hashers
 PASSWORD_HASHERS = [
     # https://docs.djangoproject.com/en/dev/topics/auth/passwords/#using-argon2-with-django
-    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    # Django's Argon2 hasher, running on the bounded hashing pool below.
+    "django_sso.core.hashers.Argon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
     "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
 ]
+# Threads that compute password hashes, per process. Keep the total across gunicorn workers near the core count.
+PASSWORD_HASHING_WORKERS = env.int("DJANGO_PASSWORD_HASHING_WORKERS", default=os.cpu_count() or 1)
+# Hashes allowed to wait for a thread, past that the request fails fast with a 503.
+PASSWORD_HASHING_QUEUE_SIZE = env.int("DJANGO_PASSWORD_HASHING_QUEUE_SIZE", default=2 * PASSWORD_HASHING_WORKERS)
+# Retry-After (seconds) sent with the 503.
+PASSWORD_HASHING_RETRY_AFTER = 1
+# Argon2 cost parameters, tune them for the deployment hardware with `manage.py calibrate_hashers`.
+# The defaults are Django's. Stored hashes are upgraded to the current parameters on login.
+ARGON2_TIME_COST = env.int("DJANGO_ARGON2_TIME_COST", default=2)
+ARGON2_MEMORY_COST = env.int("DJANGO_ARGON2_MEMORY_COST", default=102400)  # KiB
+ARGON2_PARALLELISM = env.int("DJANGO_ARGON2_PARALLELISM", default=8)
+
+# RATE LIMITING
+# ------------------------------------------------------------------------------
+# GCRA limits (django_sso.core.ratelimit) as scope: (requests, period in seconds). A scope allows `requests` in a
+# burst, then one every `period / requests` seconds.
+RATE_LIMIT_ENABLED = env.bool("DJANGO_RATE_LIMIT_ENABLED", default=True)
+RATE_LIMITS = {
+    "login:ip": (30, 60),
+    "login:account": (10, 5 * 60),
+    "token:ip": (600, 60),
+    "token:client": (1200, 60),
+}
+# request.META key holding the client address when behind a proxy (e.g. "HTTP_X_REAL_IP"), REMOTE_ADDR otherwise.
+CLIENT_IP_HEADER = env("DJANGO_CLIENT_IP_HEADER", default=None)
+
 # https://docs.djangoproject.com/en/dev/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -110,6 +151,13 @@ AUTH_PASSWORD_VALIDATORS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
+    "django_sso.core.middleware.AdmissionControlMiddleware",
+    "django_sso.core.middleware.ReplicaStickinessMiddleware",
+    "django_sso.core.middleware.PathDispatchMiddleware",
+    "django_sso.core.middleware.RetryLaterMiddleware",
+]
+# Only the HTML views run this chain, API routes (see API_PATH_PREFIXES) skip it.
+WEB_MIDDLEWARE = [
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -118,6 +166,77 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
+API_PATH_PREFIXES = ["/api/", "/.well-known/", "/health/", "/metrics/"]
+# The admin checks only look at MIDDLEWARE, the session, auth and messages middleware live in WEB_MIDDLEWARE.
+SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
+
+# Admission control (django_sso.core.admission): adaptive per route class concurrency limits, excess load gets a 503.
+# Paths are prefixes, the first matching class wins. Limits and in-flight counts are per process.
+# Requests in flight across the route classes, keep it at the number of threads per gunicorn worker.
+ADMISSION_MAX_IN_FLIGHT = env.int("GUNICORN_THREADS", default=4)
+# Slots low priority classes (new logins) can't take, kept for token refreshes, userinfo and documents.
+ADMISSION_RESERVED = 1
+ADMISSION_CONTROL = {
+    "ENABLED": env.bool("DJANGO_ADMISSION_CONTROL_ENABLED", default=True),
+    "MAX_IN_FLIGHT": ADMISSION_MAX_IN_FLIGHT,
+    "RESERVED": ADMISSION_RESERVED,
+    # Multiplicative decrease of a limit for each request slower than the class' target latency (seconds).
+    "BACKOFF": 0.9,
+    "ROUTE_CLASSES": {
+        "refresh": {
+            "paths": ["/api/users/token/refresh/"],
+            "priority": "high",
+            "limit": 8,
+            "min_limit": 1,
+            "max_limit": 64,
+            "target_latency": 0.25,
+        },
+        "token": {
+            "paths": ["/api/users/token/"],
+            "priority": "low",
+            "limit": 8,
+            "min_limit": 1,
+            "max_limit": 64,
+            "target_latency": 0.25,
+        },
+        "userinfo": {
+            "paths": ["/api/users/userinfo/"],
+            "priority": "high",
+            "limit": 8,
+            "min_limit": 1,
+            "max_limit": 64,
+            "target_latency": 0.1,
+        },
+        "static": {
+            "paths": ["/.well-known/", "/api/users/jwks/"],
+            "priority": "high",
+            "limit": 8,
+            "min_limit": 1,
+            "max_limit": 64,
+            "target_latency": 0.05,
+        },
+        # Long-polls hold their thread for up to USER_CHANGES_MAX_WAIT seconds: the waiters of different applications
+        # may take every low priority slot, which the short wait gives back to logins within seconds.
+        "changes": {
+            "paths": ["/api/users/changes/"],
+            "priority": "low",
+            "limit": max(1, ADMISSION_MAX_IN_FLIGHT - ADMISSION_RESERVED),
+            "min_limit": max(1, ADMISSION_MAX_IN_FLIGHT - ADMISSION_RESERVED),
+            "max_limit": max(1, ADMISSION_MAX_IN_FLIGHT - ADMISSION_RESERVED),
+            # Above USER_CHANGES_MAX_WAIT, a long-poll is not a slow request.
+            "target_latency": 6.0,
+        },
+        "authorize": {
+            "paths": ["/users/authorize/", "/users/resume-oidc/", "/users/login/"],
+            "priority": "low",
+            "limit": 8,
+            "min_limit": 1,
+            "max_limit": 64,
+            # Includes a password hash on login.
+            "target_latency": 1.0,
+        },
+    },
+}
 
 # STATIC
 # ------------------------------------------------------------------------------
@@ -184,6 +303,85 @@ EMAIL_BACKEND = env(
 )
 # https://docs.djangoproject.com/en/dev/ref/settings/#email-timeout
 EMAIL_TIMEOUT = 5
+# Emails per second each worker process sends through an email backend (provider), as a token bucket.
+EMAIL_RATE_LIMITS = {
+    "anymail.backends.mailgun.EmailBackend": 25,
+}
+EMAIL_DEFAULT_RATE_LIMIT = 10
+# Failed delivery attempts after which an email is dropped.
+EMAIL_MAX_ATTEMPTS = 8
+# Seconds an email verification link stays valid (django_sso.users.utils.email_verification).
+EMAIL_VERIFICATION_TOKEN_MAX_AGE = 24 * 60 * 60
+
+# OUTBOX
+# ------------------------------------------------------------------------------
+# Handler of each outbox topic (django_sso.users.utils.outbox), called with a batch of messages.
+OUTBOX_HANDLERS = {
+    "email": "django_sso.users.utils.emails.deliver_outbox_emails",
+    "backchannel_logout": "django_sso.users.utils.backchannel_logout.deliver_logout_tokens",
+}
+OUTBOX_BATCH_SIZE = 100
+# Seconds a claimed message stays invisible to other dispatchers.
+OUTBOX_LEASE = 5 * 60
+OUTBOX_MAX_ATTEMPTS = 10
+
+# BACK-CHANNEL LOGOUT
+# ------------------------------------------------------------------------------
+# Logout tokens are POSTed concurrently (django_sso.users.utils.backchannel_logout): seconds before a request times
+# out, immediate retries of a failed connection and connections open at once. Other failures are retried by the
+# outbox.
+BACKCHANNEL_LOGOUT_TIMEOUT = 5
+BACKCHANNEL_LOGOUT_CONNECT_RETRIES = 2
+BACKCHANNEL_LOGOUT_MAX_CONNECTIONS = 100
+
+# AUDIT LOG
+# ------------------------------------------------------------------------------
+# Events are buffered (django_sso.users.utils.audit) and written in bulk inserts of AUDIT_FLUSH_SIZE. Without Redis
+# each process flushes its buffer once that many events or the oldest is AUDIT_FLUSH_INTERVAL seconds old, and
+# keeps at most AUDIT_BUFFER_SIZE events.
+AUDIT_FLUSH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 5
+AUDIT_BUFFER_SIZE = 10000
+# Days events are kept, and daily partitions created ahead (PostgreSQL).
+AUDIT_RETENTION_DAYS = 90
+AUDIT_PARTITIONS_AHEAD = 3
+# Events per page of /api/users/audit/, by default and at most.
+AUDIT_DEFAULT_PAGE_SIZE = 100
+AUDIT_MAX_PAGE_SIZE = 1000
+
+# ACTIVITY
+# ------------------------------------------------------------------------------
+# Users' last login and the last use of applications and refresh tokens are coalesced
+# (django_sso.users.utils.activity) and written at most ACTIVITY_MAX_STALENESS seconds late, in UPDATEs of
+# ACTIVITY_BATCH_SIZE rows.
+ACTIVITY_MAX_STALENESS = env.int("DJANGO_ACTIVITY_MAX_STALENESS", default=60)
+ACTIVITY_BATCH_SIZE = 1000
+
+# Subjects per request of the batch claims endpoint (/api/users/claims/).
+CLAIMS_BATCH_MAX_SUBJECTS = 1000
+
+# USER CHANGE FEED
+# ------------------------------------------------------------------------------
+# Seconds entries of the change feed (django_sso.users.utils.changes) are kept, and deleted per batch once older.
+USER_CHANGES_RETENTION = 7 * 24 * 60 * 60
+USER_CHANGES_PRUNE_BATCH_SIZE = 10000
+# Entries per page of /api/users/changes/, by default and at most.
+USER_CHANGES_PAGE_SIZE = 1000
+USER_CHANGES_MAX_PAGE_SIZE = 10000
+# Longest long-poll (the wait parameter), and seconds between checks for new entries meanwhile. Short, as a waiter
+# holds a gunicorn thread: readers keep up by polling again right away, the wait only saves them empty responses.
+USER_CHANGES_MAX_WAIT = 5
+USER_CHANGES_POLL_INTERVAL = 0.5
+
+# SCIM
+# ------------------------------------------------------------------------------
+# Users per page of a SCIM listing (django_sso.users.scim), by default and at most.
+SCIM_DEFAULT_COUNT = 100
+SCIM_MAX_RESULTS = 1000
+# Limits of a Bulk request, and the operations applied per transaction.
+SCIM_BULK_MAX_OPERATIONS = 10000
+SCIM_BULK_MAX_PAYLOAD_SIZE = 16 * 1024 * 1024
+SCIM_BULK_BATCH_SIZE = 500
 
 # ADMIN
 # ------------------------------------------------------------------------------
@@ -239,6 +437,36 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-schedule
+CELERY_BEAT_SCHEDULE = {
+    # Safety net, publishing a message already schedules a dispatch.
+    "dispatch-outbox": {
+        "task": "django_sso.users.tasks.dispatch_outbox",
+        "schedule": 30.0,
+    },
+    # Safety net, entries are sequenced as their transaction commits.
+    "sequence-user-changes": {
+        "task": "django_sso.users.tasks.sequence_user_changes",
+        "schedule": 10.0,
+    },
+    "prune-user-changes": {
+        "task": "django_sso.users.tasks.prune_user_changes",
+        "schedule": 60 * 60.0,
+    },
+    # Safety net, a full queue already schedules a flush.
+    "flush-audit-events": {
+        "task": "django_sso.users.tasks.flush_audit_events",
+        "schedule": 10.0,
+    },
+    "maintain-audit-log": {
+        "task": "django_sso.users.tasks.maintain_audit_log",
+        "schedule": 60 * 60.0,
+    },
+    "flush-activity": {
+        "task": "django_sso.users.tasks.flush_activity",
+        "schedule": float(ACTIVITY_MAX_STALENESS),
+    },
+}
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#worker-send-task-events
 CELERY_WORKER_SEND_TASK_EVENTS = True
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#std-setting-task_send_sent_event
@@ -259,7 +487,17 @@ SSO = {
     "ACCESS_TOKEN_EXPIRATION": timedelta(minutes=15),
     "REFRESH_TOKEN_EXPIRATION": timedelta(days=30),
     "ISSUER_URL": env("SSO_ISSUER_URL", default="http://localhost:8000"),
+    # Server-side key of the client secret HMACs, changing it invalidates every stored client secret.
+    "CLIENT_SECRET_PEPPER": env(
+        "SSO_CLIENT_SECRET_PEPPER",
+        default="s4Jq2xVn8cRkTz0LwYp6HdBmE3uGfA9iNo7Ct1KvXeQ5rUjZbDhWyMaSlPgIFO",
+    ),
     "ID_TOKEN_EXPIRATION": timedelta(minutes=15),
+    "LOGOUT_TOKEN_EXPIRATION": timedelta(minutes=2),
+    # Cache-Control max-age of the discovery and JWKS documents.
+    "DOCUMENT_CACHE_MAX_AGE": timedelta(hours=24),
+    # How often a process checks whether the documents were rebuilt elsewhere (after a key rotation).
+    "DOCUMENT_VERSION_CHECK_INTERVAL": timedelta(seconds=5),
 }
 
 # Django Crispy Forms
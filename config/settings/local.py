@@ -1,5 +1,5 @@
 from .base import *  # noqa
-from .base import APPS_DIR, env
+from .base import APPS_DIR, DATABASES, env
 
 # GENERAL
 # ------------------------------------------------------------------------------
@@ -13,6 +13,16 @@ SECRET_KEY = env(
 # https://docs.djangoproject.com/en/dev/ref/settings/#allowed-hosts
 ALLOWED_HOSTS = ["localhost", "0.0.0.0", "127.0.0.1"]
 
+# DATABASES
+# ------------------------------------------------------------------------------
+# A second local database standing in for a read replica, used by the routing tests
+# (django_sso/users/tests/views/test_replicas.py). Nothing is routed to it unless it is listed in DATABASE_REPLICAS.
+DATABASES["replica"] = {
+    **DATABASES["default"],
+    "NAME": f"{DATABASES['default']['NAME']}_replica",
+    "ATOMIC_REQUESTS": False,
+}
+
 # CACHES
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#caches
@@ -1,5 +1,5 @@
 from .base import *  # noqa
-from .base import env
+from .base import DATABASE_REPLICAS, DATABASES, SSO, env
 
 # GENERAL
 # ------------------------------------------------------------------------------
@@ -7,10 +7,31 @@ from .base import env
 SECRET_KEY = env("DJANGO_SECRET_KEY")
 # https://docs.djangoproject.com/en/dev/ref/settings/#allowed-hosts
 ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=[])
+# No default: the one in base.py is public.
+SSO["CLIENT_SECRET_PEPPER"] = env("SSO_CLIENT_SECRET_PEPPER")
 
 # DATABASES
 # ------------------------------------------------------------------------------
-DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)  # noqa: F405
+# With DATABASE_POOL each worker process takes its connections from a pool
+# (django_sso.core.db.backends.postgresql_pool) instead of keeping one per thread for CONN_MAX_AGE seconds.
+for _alias in ["default", *DATABASE_REPLICAS]:
+    if env.bool("DATABASE_POOL", default=False):
+        DATABASES[_alias]["ENGINE"] = "django_sso.core.db.backends.postgresql_pool"
+        DATABASES[_alias]["CONN_MAX_AGE"] = 0
+        DATABASES[_alias]["OPTIONS"] = {
+            **DATABASES[_alias].get("OPTIONS", {}),
+            "pool": {
+                "min_size": env.int("DATABASE_POOL_MIN_SIZE", default=2),
+                "max_size": env.int("DATABASE_POOL_MAX_SIZE", default=10),
+                # Seconds a request waits for a connection before a 503.
+                "timeout": env.float("DATABASE_POOL_TIMEOUT", default=5.0),
+                # Seconds before a connection is replaced, and before an idle one above min_size is closed.
+                "max_lifetime": env.float("DATABASE_POOL_MAX_LIFETIME", default=30 * 60.0),
+                "max_idle": env.float("DATABASE_POOL_MAX_IDLE", default=5 * 60.0),
+            },
+        }
+    else:
+        DATABASES[_alias]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
 
 # CACHES
 # ------------------------------------------------------------------------------
@@ -31,6 +52,8 @@ CACHES = {
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#secure-proxy-ssl-header
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
+# nginx sets X-Real-IP, the rate limiter keys on it.
+CLIENT_IP_HEADER = env("DJANGO_CLIENT_IP_HEADER", default="HTTP_X_REAL_IP")
 # https://docs.djangoproject.com/en/dev/ref/settings/#secure-ssl-redirect
 SECURE_SSL_REDIRECT = env.bool("DJANGO_SECURE_SSL_REDIRECT", default=True)
 # https://docs.djangoproject.com/en/dev/ref/settings/#session-cookie-secure
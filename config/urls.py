@@ -4,13 +4,14 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views import defaults as default_views
 
-from django_sso.core.views import health_check
+from django_sso.core.views import health_check, metrics
 from django_sso.users.api.views import DiscoveryView
 
 urlpatterns = [
     path(f"{settings.ADMIN_URL}/", admin.site.urls),
     path(".well-known/openid-configuration", DiscoveryView.as_view(), name="oidc_discovery"),
     path("health/", health_check, name="health_check"),
+    path("metrics/", metrics, name="metrics"),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 # API URLS
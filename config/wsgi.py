@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_wsgi_application()
+
+# Build the discovery and JWKS documents before the first request comes in.
+from django_sso.users.utils.discovery import build_documents  # noqa: E402
+
+build_documents()
@@ -0,0 +1,123 @@
+"""
+Admission control: per route class concurrency limits that adapt to latency, and load shedding.
+
+Each route class (authorize, token, refresh, userinfo, static documents) gets a concurrency limit that follows AIMD:
+it grows by ``1 / limit`` per request completed under the class target latency while the limit is in use, and
+shrinks by ``BACKOFF`` for each slower one. When Postgres or Redis slows down, the limits of the classes that depend
+on it drop and the excess is rejected right away with a 503, rather than tying up every thread of the process.
+
+On top of that, low priority classes (new logins) only get ``MAX_IN_FLIGHT - RESERVED`` of the process' requests,
+the remaining slots are kept for high priority ones (token refreshes, userinfo, documents).
+"""
+
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from django_sso.core.metrics import Counter, Gauge, Histogram
+
+admission_limit = Gauge("admission_limit", "Current concurrency limit of a route class.", ["route_class"])
+admission_in_flight = Gauge("admission_in_flight", "Requests being handled, per route class.", ["route_class"])
+admission_rejected = Counter(
+    "admission_rejected_total", "Requests shed by admission control.", ["route_class", "reason"]
+)
+admission_latency = Histogram(
+    "admission_request_seconds", "Latency of the requests admitted, per route class.", ["route_class"]
+)
+
+
+class RouteClass:
+    def __init__(self, name, paths, priority, limit, min_limit, max_limit, target_latency, backoff):
+        self.name = name
+        self.paths = tuple(paths)
+        self.low_priority = priority == "low"
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.in_flight = 0
+
+    def record(self, latency: float, in_flight: int):
+        """
+        Adjust the limit to a completed request, called with the controller lock held.
+        """
+        if latency > self.target_latency:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif in_flight >= self.limit / 2:
+            # Only grow a limit that is actually used.
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class AdmissionController:
+    def __init__(self, config: dict):
+        self.max_in_flight = config["MAX_IN_FLIGHT"]
+        self.low_priority_limit = max(1, self.max_in_flight - config["RESERVED"])
+        self.in_flight = 0
+        self.low_priority_in_flight = 0
+        self._lock = threading.Lock()
+
+        self.route_classes = []
+        for name, options in config["ROUTE_CLASSES"].items():
+            route_class = RouteClass(name, backoff=config["BACKOFF"], **options)
+            self.route_classes.append(route_class)
+            admission_limit.set_function(lambda route_class=route_class: int(route_class.limit), route_class=name)
+            admission_in_flight.set_function(lambda route_class=route_class: route_class.in_flight, route_class=name)
+
+    def classify(self, path: str) -> RouteClass | None:
+        for route_class in self.route_classes:
+            if path.startswith(route_class.paths):
+                return route_class
+        return None
+
+    def acquire(self, route_class: RouteClass) -> str | None:
+        """
+        Admit a request of ``route_class``, or return why it is rejected.
+        """
+        with self._lock:
+            if route_class.in_flight >= int(route_class.limit):
+                reason = "limit"
+            elif self.in_flight >= self.max_in_flight:
+                reason = "capacity"
+            elif route_class.low_priority and self.low_priority_in_flight >= self.low_priority_limit:
+                reason = "priority"
+            else:
+                route_class.in_flight += 1
+                self.in_flight += 1
+                if route_class.low_priority:
+                    self.low_priority_in_flight += 1
+                return None
+
+        admission_rejected.inc(route_class=route_class.name, reason=reason)
+        return reason
+
+    def release(self, route_class: RouteClass, latency: float):
+        with self._lock:
+            route_class.record(latency, route_class.in_flight)
+            route_class.in_flight -= 1
+            self.in_flight -= 1
+            if route_class.low_priority:
+                self.low_priority_in_flight -= 1
+        admission_latency.observe(latency, route_class=route_class.name)
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(settings.ADMISSION_CONTROL)
+    return _controller
+
+
+@receiver(setting_changed)
+def reset_admission_controller(*, setting, **kwargs):
+    global _controller
+    if setting == "ADMISSION_CONTROL":
+        _controller = None
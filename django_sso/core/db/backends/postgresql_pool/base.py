@@ -0,0 +1,170 @@
+"""
+PostgreSQL backend (psycopg 3) taking its connections from a ``psycopg_pool.ConnectionPool`` per process and alias,
+rather than opening one per thread and keeping it ``CONN_MAX_AGE`` seconds::
+
+    DATABASES["default"]["ENGINE"] = "django_sso.core.db.backends.postgresql_pool"
+    DATABASES["default"]["OPTIONS"]["pool"] = {"min_size": 2, "max_size": 10, "max_lifetime": 30 * 60}
+
+Django closes the connection after each request (``CONN_MAX_AGE`` must be 0), which gives it back to the pool. Pool
+options are those of ``ConnectionPool`` (``min_size``, ``max_size``, ``timeout``, ``max_lifetime``, ``max_idle``,
+``max_waiting``...), plus ``check`` (default ``True``) to check connections with a round trip when they are checked
+out, so a connection dropped by the server or a failover is replaced instead of failing the request.
+
+When no connection frees up within ``timeout`` the request gets a 503 (``DatabasePoolExhausted``). The time spent
+waiting for a connection, the pool size and the connections in use are exposed on ``/metrics/``.
+"""
+
+import os
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+from django.utils.asyncio import async_unsafe
+
+from django_sso.core.exceptions import DatabasePoolExhausted
+from django_sso.core.metrics import Counter, Gauge, Histogram
+
+try:
+    from psycopg_pool import ConnectionPool, PoolTimeout
+except ImportError as e:
+    raise ImproperlyConfigured(f"Error loading psycopg_pool module: {e}")
+
+if not is_psycopg3:
+    raise ImproperlyConfigured("The postgresql_pool backend requires psycopg 3.")
+
+pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled database connection.",
+    ["alias"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+pool_timeouts = Counter(
+    "db_pool_timeouts_total", "Requests that got no pooled database connection in time.", ["alias"]
+)
+pool_size = Gauge("db_pool_size", "Connections open in the pool, in use or idle.", ["alias"])
+pool_max_size = Gauge("db_pool_max_size", "Connections the pool may open.", ["alias"])
+pool_in_use = Gauge("db_pool_in_use", "Pooled connections checked out.", ["alias"])
+pool_waiting = Gauge("db_pool_waiting", "Requests waiting for a pooled connection.", ["alias"])
+
+# (pid, pool) per alias. A pool's worker threads don't survive a fork, a forked process creates its own pool.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias: str, conn_params: dict, options: dict) -> ConnectionPool:
+    pid, pool = _pools.get(alias, (None, None))
+    if pid == os.getpid():
+        return pool
+
+    with _pools_lock:
+        pid, pool = _pools.get(alias, (None, None))
+        if pid != os.getpid():
+            pool = create_pool(alias, conn_params, options)
+            _pools[alias] = (os.getpid(), pool)
+    return pool
+
+
+def create_pool(alias: str, conn_params: dict, options: dict) -> ConnectionPool:
+    options = dict(options)
+    check = options.pop("check", True)
+    pool = ConnectionPool(
+        # Django sets autocommit on checkout anyway, idle connections are left outside of transactions.
+        kwargs={**conn_params, "autocommit": True},
+        check=ConnectionPool.check_connection if check else None,
+        name=alias,
+        open=True,
+        **options,
+    )
+
+    def in_use():
+        stats = pool.get_stats()
+        return stats.get("pool_size", 0) - stats.get("pool_available", 0)
+
+    pool_size.set_function(lambda: pool.get_stats().get("pool_size", 0), alias=alias)
+    pool_max_size.set_function(lambda: pool.max_size, alias=alias)
+    pool_in_use.set_function(in_use, alias=alias)
+    pool_waiting.set_function(lambda: pool.get_stats().get("requests_waiting", 0), alias=alias)
+    return pool
+
+
+def close_pool(alias: str):
+    """
+    Close the pool of ``alias`` and its connections, the next connection opens a new one.
+    """
+    with _pools_lock:
+        pid, pool = _pools.pop(alias, (None, None))
+    if pid == os.getpid():
+        pool.close()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def create_test_db(self, *args, **kwargs):
+        # Connect to the test database from now on.
+        close_pool(self.connection.alias)
+        return super().create_test_db(*args, **kwargs)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle connections to the test database would prevent dropping it.
+        close_pool(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    _pool = None
+
+    @property
+    def pool_options(self) -> dict:
+        options = self.settings_dict["OPTIONS"].get("pool", {})
+        return {} if options is True else options
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            # Creating or dropping the test database, not worth a pool.
+            return super().get_new_connection(conn_params)
+        if self.settings_dict["CONN_MAX_AGE"] != 0:
+            raise ImproperlyConfigured("Pooled connections are given back after each request, set CONN_MAX_AGE to 0.")
+
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        try:
+            self.isolation_level = IsolationLevel(isolation_level or IsolationLevel.READ_COMMITTED)
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {isolation_level} specified. "
+                "Use one of the psycopg.IsolationLevel values."
+            )
+
+        pool = get_pool(self.alias, conn_params, self.pool_options)
+        started_at = time.perf_counter()
+        try:
+            connection = pool.getconn()
+        except PoolTimeout:
+            pool_timeouts.inc(alias=self.alias)
+            raise DatabasePoolExhausted()
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started_at, alias=self.alias)
+
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        self._pool = pool
+        return connection
+
+    def _close(self):
+        if self._pool is None:
+            return super()._close()
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            # The pool rolls back a transaction left open and discards broken connections.
+            self._pool.putconn(self.connection)
+        # Back in the pool, even if closed within an atomic block.
+        self.connection = None
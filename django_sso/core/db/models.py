@@ -1,10 +1,11 @@
-import uuid
-
 from django.db import models
 
+from django_sso.utils.uuid import uuid7
+
 
 class BaseModel(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, unique=True)
+    # Time-ordered, new rows append to the primary key index. Rows created before keep their random (v4) ids.
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,67 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# The ReplicaState of the request being handled, see ReplicaStickinessMiddleware.
+_state = ContextVar("replica_state", default=None)
+
+
+class ReplicaState:
+    def __init__(self, pinned: bool = False):
+        # Reads go to the primary: the client wrote recently, or this request wrote.
+        self.pinned = pinned
+        self.wrote = False
+
+
+def start_request(pinned: bool):
+    """
+    Track the writes of a request, whose reads stay on the primary when ``pinned``. Returns the token to pass to
+    ``end_request``.
+    """
+    return _state.set(ReplicaState(pinned))
+
+
+def end_request(token) -> bool:
+    """
+    Stop tracking the request, returns whether it wrote a routed model.
+    """
+    state = _state.get()
+    _state.reset(token)
+    return state is not None and state.wrote
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of ``REPLICA_ROUTED_MODELS`` to one of the ``DATABASE_REPLICAS``, and all writes to the primary.
+
+    Reads stay on the primary within a transaction on it (views under ``ATOMIC_REQUESTS`` included, so only the
+    views marked non-atomic read from replicas), and for the rest of a request once it wrote a routed model. The
+    replication lag is covered by ``ReplicaStickinessMiddleware``, which pins the following requests of the same
+    client to the primary for ``REPLICA_STICKY_SECONDS``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or model._meta.label not in settings.REPLICA_ROUTED_MODELS:
+            return None
+        state = _state.get()
+        if state is not None and (state.pinned or state.wrote):
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label in settings.REPLICA_ROUTED_MODELS:
+            state = _state.get()
+            if state is not None:
+                state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -0,0 +1,124 @@
+"""
+Sending outbox emails: a batch goes out over one backend connection, throttled by a per-provider token bucket.
+"""
+
+import logging
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils.html import strip_tags
+
+logger = logging.getLogger(__name__)
+
+# Errors that will not go away on a retry, the message is dropped.
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+try:
+    from anymail.exceptions import AnymailInvalidAddress, AnymailRecipientsRefused
+except ImportError:
+    pass
+else:
+    PERMANENT_ERRORS += (AnymailInvalidAddress, AnymailRecipientsRefused)
+
+
+class TokenBucket:
+    """
+    Allows ``rate`` operations per second on average, and bursts of up to ``capacity``.
+    """
+
+    clock = staticmethod(time.monotonic)
+    sleep = staticmethod(time.sleep)
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = self.clock()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """
+        Take a token, sleeping until one is available.
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(backend: str) -> TokenBucket:
+    """
+    The token bucket of an email backend (provider), shared by the threads of this process.
+    """
+    rate = settings.EMAIL_RATE_LIMITS.get(backend, settings.EMAIL_DEFAULT_RATE_LIMIT)
+    with _buckets_lock:
+        bucket = _buckets.get(backend)
+        if bucket is None or bucket.rate != rate:
+            bucket = _buckets[backend] = TokenBucket(rate)
+    return bucket
+
+
+def make_message(subject: str, html_content: str, to: str, attachments=None) -> dict:
+    """
+    A JSON serializable message, as passed to ``deliver``.
+    """
+    return {"subject": subject, "html": html_content, "to": to, "attachments": attachments or [], "attempts": 0}
+
+
+def build_email(message: dict, connection=None) -> EmailMultiAlternatives:
+    email = EmailMultiAlternatives(
+        message["subject"],
+        strip_tags(message["html"]),
+        settings.DEFAULT_FROM_EMAIL or "noreply@example.com",
+        [message["to"]],
+        attachments=[tuple(attachment) for attachment in message["attachments"]],
+        connection=connection,
+    )
+    email.attach_alternative(message["html"], "text/html")
+    return email
+
+
+def deliver(messages: list[dict]) -> list[dict]:
+    """
+    Send ``messages`` over a single connection.
+
+    Messages the provider rejects are logged and dropped. On any other error delivery stops, and the messages not
+    sent yet are returned for a retry, the failing one with its ``attempts`` increased (it is dropped after
+    ``EMAIL_MAX_ATTEMPTS``).
+    """
+    if not messages:
+        return []
+
+    bucket = get_bucket(settings.EMAIL_BACKEND)
+    connection = get_connection(fail_silently=False)
+    sent = 0
+    try:
+        connection.open()
+        for message in messages:
+            bucket.take()
+            try:
+                connection.send_messages([build_email(message, connection)])
+            except PERMANENT_ERRORS:
+                logger.warning("Dropping email to %s, rejected by the provider", message["to"], exc_info=True)
+            sent += 1
+    except Exception:
+        remaining = messages[sent:]
+        failed = {**remaining[0], "attempts": remaining[0]["attempts"] + 1}
+        logger.warning("Email delivery failed, %d message(s) left for a retry", len(remaining), exc_info=True)
+        if failed["attempts"] >= settings.EMAIL_MAX_ATTEMPTS:
+            logger.error("Dropping email to %s after %d attempts", failed["to"], failed["attempts"])
+            return remaining[1:]
+        return [failed, *remaining[1:]]
+    finally:
+        connection.close()
+    return []
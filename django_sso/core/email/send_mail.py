@@ -1,26 +1,13 @@
-from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.utils.html import strip_tags
+# utils
+from django_sso.users.utils import outbox
 
-from config import celery_app
 
-
-@celery_app.task()
 def send_mail(subject, html_content, to, attachments=None):
-    try:
-        text_content = strip_tags(html_content)
-        from_email = settings.DEFAULT_FROM_EMAIL or "noreply@example.com"
-
-        email = EmailMultiAlternatives(
-            subject,
-            text_content,
-            from_email,
-            [to],
-            attachments=attachments,
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-        return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
+    """
+    Queue an email through the outbox, in the current transaction. The worker sends it in a batch with the other
+    emails of the outbox.
+
+    ``attachments`` are ``(filename, content, mimetype)`` tuples with text content.
+    """
+    payload = {"to": to, "subject": subject, "html": html_content, "attachments": attachments or []}
+    return outbox.publish("email", payload)
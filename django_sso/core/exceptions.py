@@ -0,0 +1,28 @@
+class RetryLater(Exception):
+    """
+    Raised to shed a request that the client may retry, rendered by ``RetryLaterMiddleware``.
+    """
+
+    status_code = 503
+    error = "temporarily_unavailable"
+    error_description = "The server is busy, please retry later."
+
+    def __init__(self, retry_after: int = 1, error_description: str | None = None):
+        super().__init__(error_description or self.error_description)
+        self.retry_after = retry_after
+        if error_description:
+            self.error_description = error_description
+
+
+class HashingQueueFull(RetryLater):
+    error_description = "Too many password hashing requests, please retry later."
+
+
+class RateLimited(RetryLater):
+    status_code = 429
+    error = "rate_limited"
+    error_description = "Too many requests, please retry later."
+
+
+class DatabasePoolExhausted(RetryLater):
+    error_description = "No database connection available, please retry later."
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from django_sso.core.exceptions import HashingQueueFull
+from django_sso.core.metrics import Counter, Gauge, Histogram
+
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+hash_seconds = Histogram(
+    "password_hash_seconds", "Time spent computing password hashes.", ["operation"], buckets=HASH_BUCKETS
+)
+hash_wait_seconds = Histogram(
+    "password_hash_wait_seconds", "Time password hashes waited for a hashing worker.", buckets=HASH_BUCKETS
+)
+hash_rejected = Counter("password_hash_rejected_total", "Password hashes rejected because the queue was full.")
+hash_queue_depth = Gauge("password_hash_queue_depth", "Password hashes waiting for a hashing worker.")
+hash_in_progress = Gauge("password_hash_in_progress", "Password hashes being computed.")
+
+_local = threading.local()
+
+
+class HashingExecutor:
+    """
+    Runs password hashing on a bounded pool of threads.
+
+    argon2 releases the GIL, so the pool gives real parallelism while capping how many request threads can
+    burn CPU on hashing at once. At most ``workers`` hashes run and ``queue_size`` wait; past that ``run``
+    fails fast with ``HashingQueueFull`` instead of letting logins starve the cheap endpoints.
+    """
+
+    def __init__(self, workers: int, queue_size: int, retry_after: int = 1):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hashing")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, operation: str, function, *args):
+        """
+        Run ``function(*args)`` on the pool and wait for the result.
+        """
+        if getattr(_local, "in_pool", False):
+            # Already on a hashing thread (e.g. a background rehash), waiting on the pool could deadlock.
+            return function(*args)
+
+        future = self.submit(operation, function, *args)
+        if future is None:
+            raise HashingQueueFull(retry_after=self.retry_after)
+        return future.result()
+
+    def submit(self, operation: str, function, *args) -> Future | None:
+        """
+        Queue ``function(*args)`` on the pool without waiting, ``None`` when the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            hash_rejected.inc()
+            return None
+
+        submitted_at = time.perf_counter()
+        hash_queue_depth.inc()
+
+        def task():
+            started_at = time.perf_counter()
+            hash_queue_depth.dec()
+            hash_in_progress.inc()
+            hash_wait_seconds.observe(started_at - submitted_at)
+            _local.in_pool = True
+            try:
+                return function(*args)
+            finally:
+                _local.in_pool = False
+                hash_in_progress.dec()
+                hash_seconds.observe(time.perf_counter() - started_at, operation=operation)
+
+        try:
+            future = self._executor.submit(task)
+        except BaseException:
+            hash_queue_depth.dec()
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def map(self, operation: str, function, items) -> list:
+        """
+        ``[function(item) for item in items]`` on the pool, with at most ``workers`` of them queued at once so that
+        logins still find room. Raises ``HashingQueueFull`` when none of them can be queued.
+        """
+        if getattr(_local, "in_pool", False):
+            return [function(item) for item in items]
+
+        results, futures = [], deque()
+        for item in items:
+            if len(futures) >= self.workers:
+                results.append(futures.popleft().result())
+            while (future := self.submit(operation, function, item)) is None:
+                if not futures:
+                    raise HashingQueueFull(retry_after=self.retry_after)
+                results.append(futures.popleft().result())
+            futures.append(future)
+        results += [future.result() for future in futures]
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_hashing_executor() -> HashingExecutor:
+    """
+    The process-wide executor, created lazily so each forked worker gets its own threads.
+    """
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = HashingExecutor(
+                    workers=settings.PASSWORD_HASHING_WORKERS,
+                    queue_size=settings.PASSWORD_HASHING_QUEUE_SIZE,
+                    retry_after=settings.PASSWORD_HASHING_RETRY_AFTER,
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+@receiver(setting_changed)
+def reset_hashing_executor(*, setting, **kwargs):
+    global _executor
+    if setting.startswith("PASSWORD_HASHING_") and _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Django's Argon2 hasher, with the hashing offloaded to the ``HashingExecutor``.
+
+    The cost parameters come from the ``ARGON2_*`` settings (see the ``calibrate_hashers`` command), hashes
+    made with other parameters are upgraded on the next successful login.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+    def encode(self, password, salt):
+        return get_hashing_executor().run("encode", super().encode, password, salt)
+
+    def verify(self, password, encoded):
+        return get_hashing_executor().run("verify", super().verify, password, encoded)
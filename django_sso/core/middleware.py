@@ -0,0 +1,166 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+from django_sso.core.admission import get_admission_controller
+from django_sso.core.db.routers import end_request, start_request
+from django_sso.core.exceptions import RetryLater
+from django_sso.core.http import FastJsonResponse
+
+
+def is_api_path(path: str) -> bool:
+    return path.startswith(tuple(settings.API_PATH_PREFIXES))
+
+
+class PathDispatchMiddleware:
+    """
+    Runs ``settings.WEB_MIDDLEWARE`` for the HTML views only.
+
+    Requests whose path starts with one of ``settings.API_PATH_PREFIXES`` go straight to the view, so the
+    token, userinfo and JWKS endpoints never pay for sessions, CSRF, auth or messages. Everything else goes
+    through a chain built the same way Django's handler builds ``MIDDLEWARE``, including the
+    ``process_view``, ``process_template_response`` and ``process_exception`` hooks.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+
+        handler = convert_exception_to_response(get_response)
+        for middleware_path in reversed(settings.WEB_MIDDLEWARE):
+            middleware = import_string(middleware_path)
+            try:
+                mw_instance = middleware(handler)
+            except MiddlewareNotUsed:
+                continue
+
+            if hasattr(mw_instance, "process_view"):
+                self._view_middleware.insert(0, mw_instance.process_view)
+            if hasattr(mw_instance, "process_template_response"):
+                self._template_response_middleware.append(mw_instance.process_template_response)
+            if hasattr(mw_instance, "process_exception"):
+                self._exception_middleware.append(mw_instance.process_exception)
+
+            handler = convert_exception_to_response(mw_instance)
+
+        self.web_handler = handler
+
+    def __call__(self, request):
+        if is_api_path(request.path_info):
+            return self.get_response(request)
+        return self.web_handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if is_api_path(request.path_info):
+            return None
+        for middleware_method in self._view_middleware:
+            response = middleware_method(request, view_func, view_args, view_kwargs)
+            if response:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        if is_api_path(request.path_info):
+            return response
+        for middleware_method in self._template_response_middleware:
+            response = middleware_method(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        if is_api_path(request.path_info):
+            return None
+        for middleware_method in self._exception_middleware:
+            response = middleware_method(request, exception)
+            if response:
+                return response
+        return None
+
+
+class RetryLaterMiddleware:
+    """
+    Turns ``RetryLater`` exceptions (e.g. a full password hashing queue) into an error response with a
+    ``Retry-After`` header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, RetryLater):
+            return None
+        return retry_later_response(exception)
+
+
+class AdmissionControlMiddleware:
+    """
+    Sheds requests that admission control does not admit (see ``django_sso.core.admission``) with a 503.
+
+    Sits early in ``MIDDLEWARE`` so rejected requests cost next to nothing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.ADMISSION_CONTROL["ENABLED"]:
+            return self.get_response(request)
+
+        controller = get_admission_controller()
+        route_class = controller.classify(request.path_info)
+        if route_class is None:
+            return self.get_response(request)
+
+        if controller.acquire(route_class) is not None:
+            return retry_later_response(RetryLater(error_description="The server is overloaded, please retry later."))
+
+        started_at = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            controller.release(route_class, time.perf_counter() - started_at)
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Read-your-writes for ``ReplicaRouter``: a request that wrote a routed model sets a cookie keeping the client's
+    reads on the primary for ``REPLICA_STICKY_SECONDS``, the time the replicas may lag behind.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = start_request(pinned=settings.REPLICA_STICKY_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = end_request(token)
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+def retry_later_response(exception: RetryLater) -> FastJsonResponse:
+    response = FastJsonResponse(
+        {"error": exception.error, "error_description": exception.error_description},
+        status=exception.status_code,
+    )
+    response["Retry-After"] = str(exception.retry_after)
+    return response
@@ -0,0 +1,225 @@
+"""
+GCRA rate limiting for the endpoints that burn CPU on credentials (login, token).
+
+Each limit keeps a single value per key, its theoretical arrival time (TAT). A request is allowed when the TAT, moved
+forward by one emission interval (``period / limit``), stays within the burst tolerance (``period``) of now. This
+allows ``limit`` requests in a burst, then one every ``period / limit`` seconds.
+
+With Redis the keys of one request are checked and updated by a Lua script, so a check is one atomic round trip. Any
+other cache backend falls back to a per-process implementation. Keys known to be blocked are kept in process so
+repeat offenders are rejected without a round trip.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from django_sso.core.exceptions import RateLimited
+from django_sso.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+rate_limited = Counter("rate_limited_total", "Requests rejected by the rate limiter.", ["scope", "source"])
+
+GCRA_SCRIPT = """
+local time = redis.call('TIME')
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+local tats = {}
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[2 * i - 1])
+    local tolerance = tonumber(ARGV[2 * i])
+    local tat = math.max(tonumber(redis.call('GET', key)) or now, now)
+    local allow_at = tat + interval - tolerance
+    if allow_at > now then
+        return {0, allow_at - now, i}
+    end
+    tats[i] = tat + interval
+end
+for i, key in ipairs(KEYS) do
+    redis.call('SET', key, tats[i], 'PX', tats[i] - now)
+end
+return {1, 0, 0}
+"""
+
+
+class RedisBackend:
+    """
+    Checks all the limits of a request in one ``EVALSHA``. Fails open when Redis is unavailable.
+    """
+
+    def __init__(self, client):
+        self.script = client.register_script(GCRA_SCRIPT)
+
+    def check(self, keys: list[str], limits: list[tuple[int, int]]) -> tuple[bool, int, int]:
+        from redis.exceptions import RedisError
+
+        args = [value for limit in limits for value in limit]
+        try:
+            allowed, retry_after_ms, index = self.script(keys=keys, args=args)
+        except RedisError:
+            logger.warning("Rate limiting skipped, Redis is unavailable", exc_info=True)
+            return True, 0, -1
+        return bool(allowed), int(retry_after_ms), int(index) - 1
+
+
+class LocalBackend:
+    """
+    The GCRA of the Lua script, kept in process. Limits are per process, meant for development and tests.
+    """
+
+    def __init__(self):
+        self._tats = {}
+        self._lock = threading.Lock()
+
+    def check(self, keys: list[str], limits: list[tuple[int, int]]) -> tuple[bool, int, int]:
+        now = int(time.time() * 1000)
+        with self._lock:
+            tats = []
+            for i, (key, (interval, tolerance)) in enumerate(zip(keys, limits)):
+                tat = max(self._tats.get(key, now), now)
+                allow_at = tat + interval - tolerance
+                if allow_at > now:
+                    return False, allow_at - now, i
+                tats.append(tat + interval)
+            self._tats.update(zip(keys, tats))
+            if len(self._tats) > 100_000:
+                self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+        return True, 0, -1
+
+    def reset(self):
+        with self._lock:
+            self._tats.clear()
+
+
+class BlockedKeys:
+    """
+    Keys rejected by the backend and the (monotonic) time they are blocked until, bounded in size.
+    """
+
+    def __init__(self, max_size: int = 10_000):
+        self.max_size = max_size
+        self._blocked = {}
+        self._lock = threading.Lock()
+
+    def retry_after(self, key: str) -> float:
+        until = self._blocked.get(key)
+        if until is None:
+            return 0
+        remaining = until - time.monotonic()
+        if remaining <= 0:
+            self._blocked.pop(key, None)
+            return 0
+        return remaining
+
+    def block(self, key: str, seconds: float):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._blocked) >= self.max_size:
+                self._blocked = {key: until for key, until in self._blocked.items() if until > now}
+                if len(self._blocked) >= self.max_size:
+                    self._blocked.clear()
+            self._blocked[key] = now + seconds
+
+    def clear(self):
+        with self._lock:
+            self._blocked.clear()
+
+
+class RateLimiter:
+    def __init__(self, backend, key_prefix: str = "ratelimit"):
+        self.backend = backend
+        self.key_prefix = key_prefix
+        self.blocked = BlockedKeys()
+
+    def make_key(self, scope: str, identifier: str) -> str:
+        # Identifiers are user input (emails, client ids), hash them to bound the key size.
+        digest = hashlib.blake2b(identifier.encode(), digest_size=16).hexdigest()
+        return f"{self.key_prefix}:{scope}:{digest}"
+
+    def check(self, *limits: tuple[str, str | None]):
+        """
+        Count a request against the ``(scope, identifier)`` limits, raising ``RateLimited`` when one is exceeded.
+
+        The rate of each scope comes from ``settings.RATE_LIMITS``, limits without an identifier are skipped.
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        scopes, keys, rates = [], [], []
+        for scope, identifier in limits:
+            if not identifier:
+                continue
+            key = self.make_key(scope, identifier)
+            retry_after = self.blocked.retry_after(key)
+            if retry_after:
+                rate_limited.inc(scope=scope, source="local")
+                raise RateLimited(retry_after=math.ceil(retry_after))
+
+            limit, period = settings.RATE_LIMITS[scope]
+            interval = period * 1000 // limit
+            scopes.append(scope)
+            keys.append(key)
+            rates.append((interval, interval * limit))
+
+        if not keys:
+            return
+
+        allowed, retry_after_ms, index = self.backend.check(keys, rates)
+        if not allowed:
+            self.blocked.block(keys[index], retry_after_ms / 1000)
+            rate_limited.inc(scope=scopes[index], source="backend")
+            raise RateLimited(retry_after=math.ceil(retry_after_ms / 1000))
+
+
+def get_backend():
+    try:
+        from django_redis import get_redis_connection
+        from django_redis.cache import RedisCache
+    except ImportError:
+        return LocalBackend()
+
+    if isinstance(cache, RedisCache):
+        return RedisBackend(get_redis_connection("default"))
+    return LocalBackend()
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(get_backend())
+    return _rate_limiter
+
+
+@receiver(setting_changed)
+def reset_rate_limiter(*, setting, **kwargs):
+    global _rate_limiter
+    if setting.startswith("RATE_LIMIT") or setting == "CACHES":
+        _rate_limiter = None
+
+
+def check_rate_limits(*limits: tuple[str, str | None]):
+    get_rate_limiter().check(*limits)
+
+
+def get_client_ip(request) -> str:
+    """
+    The client address, from ``settings.CLIENT_IP_HEADER`` when the app runs behind a proxy that sets it.
+    """
+    if settings.CLIENT_IP_HEADER:
+        ip = request.META.get(settings.CLIENT_IP_HEADER)
+        if ip:
+            return ip.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
@@ -0,0 +1,16 @@
+from django.core.cache import cache
+
+
+def get_client():
+    """
+    The Redis client behind the default cache, or ``None`` when the cache is not Redis (e.g. local development).
+    """
+    try:
+        from django_redis import get_redis_connection
+        from django_redis.cache import RedisCache
+    except ImportError:
+        return None
+
+    if isinstance(cache, RedisCache):
+        return get_redis_connection("default")
+    return None
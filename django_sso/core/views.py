@@ -2,11 +2,47 @@ import time
 
 from django.core.cache import cache
 from django.db import connection
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
 from django.utils.timezone import now
+from django.views import View
 from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
+from django_sso.core.http import FastJsonResponse, UnsupportedMediaType, parse_request_data
+from django_sso.core.metrics import REGISTRY
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class JSONView(View):
+    """
+    Lightweight base class for the JSON API endpoints.
+
+    Skips DRF's request wrapping, authentication and content negotiation. The request body is parsed once
+    into ``self.data`` and handlers return a ``FastJsonResponse``. Parse errors and unsupported methods get the
+    same status codes and bodies DRF would send.
+    """
+
+    body_methods = ("post", "put", "patch")
+
+    def dispatch(self, request, *args, **kwargs):
+        self.data = {}
+        if request.method.lower() in self.body_methods:
+            try:
+                self.data = parse_request_data(request)
+            except UnsupportedMediaType as e:
+                return FastJsonResponse({"detail": f'Unsupported media type "{e}" in request.'}, status=415)
+            except ValueError as e:
+                return FastJsonResponse({"detail": f"JSON parse error - {e}"}, status=400)
+
+        return super().dispatch(request, *args, **kwargs)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = FastJsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+        response["Allow"] = ", ".join(self._allowed_methods())
+        return response
+
 
 @never_cache
 @require_http_methods(["GET"])
@@ -53,3 +89,12 @@ def health_check(request):
         },
         status=status_code,
     )
+
+
+@never_cache
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Prometheus metrics of the current process.
+    """
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
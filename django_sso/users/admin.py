@@ -1,16 +1,34 @@
 from django.contrib import admin, messages
 from django.contrib.auth import admin as auth_admin
 from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import path
 from django.utils.translation import gettext_lazy as _
 
 from django_sso.users.forms import UserAdminChangeForm, UserAdminCreationForm
 
 # local
-from .models import Application
+from .models import Application, RefreshTokenUsage
+
+# utils
+from .utils.export import EXPORT_FORMATS, iter_users, parse_fields, parse_since, render_rows
 
 User = get_user_model()
 
 
+class RefreshTokenUsageInline(admin.TabularInline):
+    model = RefreshTokenUsage
+    fields = ("application", "last_used_at")
+    readonly_fields = fields
+    ordering = ("-last_used_at",)
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(User)
 class UserAdmin(auth_admin.UserAdmin):
     form = UserAdminChangeForm
@@ -41,6 +59,7 @@ class UserAdmin(auth_admin.UserAdmin):
         ),
         (_("Important dates"), {"fields": ("last_login", "date_joined")}),
     )
+    inlines = [RefreshTokenUsageInline]
     list_display = ["email", "username", "is_superuser"]
     search_fields = ["first_name", "last_name", "email"]
     ordering = ["id"]
@@ -54,19 +73,51 @@ class UserAdmin(auth_admin.UserAdmin):
         ),
     )
 
+    def get_urls(self):
+        return [
+            path("export/", self.admin_site.admin_view(self.export_view), name="users_user_export"),
+            *super().get_urls(),
+        ]
+
+    def export_view(self, request):
+        """
+        Stream the users as NDJSON (default) or CSV: ``?format=csv&fields=id,email&since=2024-01-01T00:00:00``.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        fmt = request.GET.get("format", "ndjson")
+        try:
+            if fmt not in EXPORT_FORMATS:
+                raise ValueError(f"Unsupported format: {fmt}")
+            fields = parse_fields(request.GET.get("fields"))
+            since = parse_since(request.GET.get("since"))
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+
+        response = StreamingHttpResponse(
+            render_rows(iter_users(fields, since), fields, fmt),
+            content_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        )
+        response["Content-Disposition"] = f'attachment; filename="users.{fmt}"'
+        return response
+
 
 @admin.register(Application)
 class ApplicationAdmin(admin.ModelAdmin):
-    readonly_fields = ("id", "client_id", "client_secret", "created_at", "updated_at")
-    list_display = ("name", "client_id", "is_active", "created_at")
+    readonly_fields = ("id", "client_id", "client_secret", "created_at", "updated_at", "last_used_at")
+    list_display = ("name", "client_id", "is_active", "last_used_at", "created_at")
     search_fields = ("name", "client_id")
     ordering = ("-created_at",)
 
     fieldsets = (
         (None, {"fields": ("name", "is_active")}),
         (_("OAuth2 Credentials"), {"fields": ("client_id", "client_secret")}),
-        (_("Security Settings"), {"fields": ("redirect_uris", "allowed_scopes")}),
-        (_("Timestamps"), {"fields": ("created_at", "updated_at")}),
+        (
+            _("Security Settings"),
+            {"fields": ("redirect_uris", "allowed_scopes", "id_token_claims", "backchannel_logout_uri")},
+        ),
+        (_("Timestamps"), {"fields": ("created_at", "updated_at", "last_used_at")}),
     )
 
     def save_model(self, request, obj, form, change):
@@ -1,13 +1,25 @@
 from django.urls import path
 
-from .views import JWKSView, LogoutView, RefreshTokenView, TokenView, UserInfoView
+from .views import (
+    AuditEventsView,
+    ChangesView,
+    ClaimsView,
+    JWKSView,
+    LogoutView,
+    RefreshTokenView,
+    TokenView,
+    UserInfoView,
+)
 
 app_name = "accounts"
 
 urlpatterns = [
     path("token/", TokenView.as_view(), name="token"),
-    path("token/refresh/", RefreshTokenView.as_view(), name="token"),
+    path("token/refresh/", RefreshTokenView.as_view(), name="token_refresh"),
     path("userinfo/", UserInfoView.as_view(), name="userinfo"),
+    path("claims/", ClaimsView.as_view(), name="claims"),
+    path("changes/", ChangesView.as_view(), name="changes"),
+    path("audit/", AuditEventsView.as_view(), name="audit"),
     path("logout/", LogoutView.as_view(), name="logout"),
     path("jwks/", JWKSView.as_view(), name="jwks"),
 ]
@@ -1,46 +1,64 @@
 import base64
 import hashlib
-import json
 import secrets
+import uuid
 
 import jwt
 
 # django
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.hashers import check_password
 from django.core.cache import cache
-from django.http import JsonResponse
-from django.urls import reverse
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
 from django.utils.timezone import now
 
 # rest framework
-from rest_framework import permissions, status
-from rest_framework.response import Response
-from rest_framework.views import APIView
+from rest_framework import status
 
 # local
+from django_sso.core.http import FastJsonResponse
+from django_sso.core.ratelimit import check_rate_limits, get_client_ip
+from django_sso.core.views import JSONView
+
 # model
-from django_sso.users.models import Application
+from django_sso.users.models import Application, AuditEvent, UserChange
 
 # serializer
 from django_sso.users.serializers import TokenRequestSerializer
 
 # utils
+from django_sso.users.utils import activity, audit
+from django_sso.users.utils.auth import load_auth_code, mark_auth_code_used
+from django_sso.users.utils.backchannel_logout import publish_logout, record_rp_session
+from django_sso.users.utils.changes import ExpiredCursor, read_changes
+from django_sso.users.utils.claims import (
+    COLUMN_CLAIMS,
+    SCOPE_CLAIMS,
+    build_id_token_claims,
+    filter_claims,
+    get_claims_version,
+    get_many_user_claims,
+    get_user_claims,
+    userinfo_etag,
+)
+from django_sso.users.utils.client_auth import authenticate_client
+from django_sso.users.utils.discovery import get_document
+from django_sso.users.utils.export import parse_since
 from django_sso.utils.string import normalize_uri
 
 User = get_user_model()
 
 
-class TokenView(APIView):
-    permission_classes = [
-        permissions.AllowAny,
-    ]
-
+class TokenView(JSONView):
     def post(self, request, *args, **kwargs):
-        serializer = TokenRequestSerializer(data=request.data)
+        check_rate_limits(("token:ip", get_client_ip(request)), ("token:client", str(self.data.get("client_id", ""))))
+
+        serializer = TokenRequestSerializer(data=self.data)
         if not serializer.is_valid():
-            return JsonResponse({"error": "invalid_request", "error_description": serializer.errors}, status=400)
+            return FastJsonResponse({"error": "invalid_request", "error_description": serializer.errors}, status=400)
 
         data = serializer.validated_data
         client_id = data["client_id"]
@@ -48,43 +66,43 @@ class TokenView(APIView):
         code = data["code"]
         redirect_uri = data["redirect_uri"]
         grant_type = data["grant_type"]
-        code_verifier = request.data.get("code_verifier")
+        code_verifier = self.data.get("code_verifier")
 
         if grant_type != "authorization_code":
-            return Response({"error": "unsupported_grant_type"}, status=status.HTTP_400_BAD_REQUEST)
+            return FastJsonResponse({"error": "unsupported_grant_type"}, status=status.HTTP_400_BAD_REQUEST)
 
         client = Application.objects.filter(client_id=client_id).first()
-        if not client or not check_password(client_secret, client.client_secret):
-            return Response({"error": "invalid_client"}, status=status.HTTP_400_BAD_REQUEST)
+        if not client or not client.check_client_secret(client_secret):
+            return FastJsonResponse({"error": "invalid_client"}, status=status.HTTP_400_BAD_REQUEST)
 
-        code_data_raw = cache.get(f"auth_code:{code}")
-        if not code_data_raw:
-            return Response(
+        code_data = load_auth_code(code, client)
+        if not code_data:
+            return FastJsonResponse(
                 {"error": "invalid_grant", "error_description": "Invalid or expired authorization code"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        code_data = json.loads(code_data_raw)
-
         if normalize_uri(redirect_uri) != normalize_uri(code_data["redirect_uri"]):
-            return Response(
+            return FastJsonResponse(
                 {"error": "invalid_grant", "error_description": "Invalid redirect URI"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
         if code_data["used"]:
-            return Response(
+            return FastJsonResponse(
                 {"error": "invalid_grant", "error_description": "Code already used"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        else:
-            code_data["used"] = True
 
         pkce_error = self._validate_pkce(code_data, code_verifier)
         if pkce_error:
             return pkce_error
 
-        cache.set(f"auth_code:{code}", json.dumps(code_data), timeout=60)
+        if not mark_auth_code_used(code, code_data):
+            return FastJsonResponse(
+                {"error": "invalid_grant", "error_description": "Code already used"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         user = User.objects.get(id=code_data["user_id"])
         scopes = code_data["scopes"]
@@ -92,6 +110,11 @@ class TokenView(APIView):
 
         access_token = self._generate_access_token(user, client, code_data)
         refresh_token = self._generate_refresh_token(user, client, code_data)
+        record_rp_session(user.id, client.client_id)
+        activity.touch_token(user.id, client.client_id)
+        audit.record(
+            AuditEvent.Event.TOKEN_ISSUED, request, user_id=user.id, client_id=client.client_id, scopes=scopes
+        )
         response = {
             "access_token": access_token,
             "token_type": "bearer",
@@ -99,9 +122,12 @@ class TokenView(APIView):
             "refresh_token": refresh_token,
         }
         if "openid" in scopes:
-            id_token = self._generate_id_token(user, client, nonce)
+            claims = build_id_token_claims(
+                user, scopes, [*client.get_id_token_claims(), *code_data.get("claims", [])], request
+            )
+            id_token = self._generate_id_token(user, client, nonce, claims)
             response["id_token"] = id_token
-        return Response(response)
+        return FastJsonResponse(response)
 
     def _validate_pkce(self, code_data, code_verifier):
         """Validate PKCE code_verifier against stored code_challenge."""
@@ -112,7 +138,7 @@ class TokenView(APIView):
             return None
 
         if not code_verifier:
-            return Response(
+            return FastJsonResponse(
                 {"error": "invalid_request", "error_description": "Missing code_verifier for PKCE"}, status=400
             )
 
@@ -123,23 +149,24 @@ class TokenView(APIView):
                 .decode("ascii")
             )
             if expected != code_challenge:
-                return Response(
+                return FastJsonResponse(
                     {"error": "invalid_grant", "error_description": "Invalid code_verifier (S256)"}, status=400
                 )
         elif code_challenge_method == "plain":
             if code_verifier != code_challenge:
-                return Response(
+                return FastJsonResponse(
                     {"error": "invalid_grant", "error_description": "Invalid code_verifier (plain)"}, status=400
                 )
         else:
-            return Response(
+            return FastJsonResponse(
                 {"error": "invalid_request", "error_description": "Unsupported code_challenge_method"}, status=400
             )
 
         return None
 
-    def _generate_id_token(self, user, client, nonce):
+    def _generate_id_token(self, user, client, nonce, claims=None):
         payload = {
+            **(claims or {}),
             "iss": settings.SSO.get("ISSUER_URL", "http://localhost:8000"),
             "sub": str(user.id),
             "aud": client.client_id,
@@ -177,48 +204,44 @@ class TokenView(APIView):
         return token
 
 
-class UserInfoView(APIView):
-    permission_classes = []
-    authentication_classes = []
-
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class UserInfoView(JSONView):
     def get(self, request):
         token = self._get_token_from_request(request)
         if not token:
-            return Response({"error": "missing_token"}, status=401)
+            return FastJsonResponse({"error": "missing_token"}, status=401)
 
         if cache.get(f"blacklisted_token:{token}"):
-            return Response({"error": "token_revoked"}, status=401)
+            return FastJsonResponse({"error": "token_revoked"}, status=401)
 
         try:
             payload = jwt.decode(token, settings.SSO["JWT_SECRET_KEY"], algorithms=["HS256"])
         except jwt.ExpiredSignatureError:
-            return Response({"error": "token_expired"}, status=401)
+            return FastJsonResponse({"error": "token_expired"}, status=401)
         except jwt.InvalidTokenError:
-            return Response({"error": "invalid_token"}, status=401)
-
-        user = User.objects.filter(id=payload["user_id"]).first()
-        if not user:
-            return Response({"error": "user_not_found"}, status=404)
+            return FastJsonResponse({"error": "invalid_token"}, status=401)
 
+        user_id = payload["user_id"]
         scopes = payload.get("scopes", [])
 
-        data = {"sub": str(user.id)}
-        if "email" in scopes:
-            data["email"] = user.email
-            data["email_verified"] = user.email_verified
-        if "profile" in scopes:
-            data.update(
-                {
-                    "name": user.username,
-                    "given_name": user.first_name,
-                    "family_name": user.last_name,
-                    "profile_picture": (
-                        request.build_absolute_uri(user.profile_picture.url) if user.profile_picture else None
-                    ),
-                }
-            )
+        # The ETag only depends on the claims version and the scopes, so a matching If-None-Match is
+        # answered without loading the user.
+        version = get_claims_version(user_id)
+        if version is None:
+            return FastJsonResponse({"error": "user_not_found"}, status=404)
 
-        return Response(data)
+        etag = userinfo_etag(user_id, version, scopes)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            claims = get_user_claims(user_id, version)
+            if claims is None:
+                return FastJsonResponse({"error": "user_not_found"}, status=404)
+            response = FastJsonResponse(filter_claims(claims, scopes, request))
+
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
     def _get_token_from_request(self, request):
         auth_header = request.headers.get("Authorization", "")
@@ -227,19 +250,15 @@ class UserInfoView(APIView):
         return None
 
 
-class RefreshTokenView(APIView):
-    permission_classes = [
-        permissions.AllowAny,
-    ]
-
+class RefreshTokenView(JSONView):
     def post(self, request, *args, **kwargs):
-        refresh_token = request.data.get("refresh_token")
+        refresh_token = self.data.get("refresh_token")
         if not refresh_token:
-            return Response({"error": "missing_refresh_token"}, status=status.HTTP_400_BAD_REQUEST)
+            return FastJsonResponse({"error": "missing_refresh_token"}, status=status.HTTP_400_BAD_REQUEST)
 
         refresh_token_data = cache.get(f"refresh_token:{refresh_token}")
         if not refresh_token_data:
-            return Response(
+            return FastJsonResponse(
                 {"error": "invalid_grant", "error_description": "Invalid or expired refresh token"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
@@ -250,20 +269,23 @@ class RefreshTokenView(APIView):
 
         client = Application.objects.filter(client_id=client_id).first()
         if not client:
-            return Response({"error": "invalid_client"}, status=status.HTTP_400_BAD_REQUEST)
+            return FastJsonResponse({"error": "invalid_client"}, status=status.HTTP_400_BAD_REQUEST)
 
         if refresh_token_data["exp"] < now():
-            return Response({"error": "token_expired"}, status=status.HTTP_400_BAD_REQUEST)
+            return FastJsonResponse({"error": "token_expired"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             user = get_user_model().objects.get(id=user_id)
         except get_user_model().DoesNotExist:
-            return Response({"error": "user_not_found"}, status=status.HTTP_404_NOT_FOUND)
+            return FastJsonResponse({"error": "user_not_found"}, status=status.HTTP_404_NOT_FOUND)
 
         access_token = self._generate_access_token(user, client, scopes)
         new_refresh_token = self._generate_refresh_token(user, client, scopes)
+        record_rp_session(user.id, client.client_id)
+        activity.touch_token(user.id, client.client_id)
+        audit.record(AuditEvent.Event.TOKEN_REFRESHED, request, user_id=user.id, client_id=client.client_id)
 
-        return Response(
+        return FastJsonResponse(
             {
                 "access_token": access_token,
                 "token_type": "bearer",
@@ -305,29 +327,184 @@ class RefreshTokenView(APIView):
         return token
 
 
-class LogoutView(APIView):
-    permission_classes = [
-        permissions.AllowAny,
-    ]
+class ClaimsView(JSONView):
+    """
+    Claims of many users at once, for relying party backends rendering lists of users.
+
+    The client authenticates with its credentials (HTTP Basic or ``client_id`` / ``client_secret`` parameters) and
+    must be allowed the ``claims`` scope; the claims released are those of its other allowed scopes. Takes a JSON
+    body ``{"sub": [...]}`` and answers in columnar form::
+
+        {"columns": ["sub", "email", ...], "rows": [["<id>", "user@example.com", ...], ...], "not_found": [...]}
+    """
+
+    def post(self, request):
+        client = authenticate_client(request, self.data)
+        if client is None:
+            return FastJsonResponse({"error": "invalid_client"}, status=401)
+        scopes = client.get_allowed_scopes()
+        if "claims" not in scopes:
+            return FastJsonResponse({"error": "unauthorized_client"}, status=403)
+
+        subjects = self.data.get("sub")
+        if not isinstance(subjects, list) or not all(isinstance(subject, str) for subject in subjects):
+            return FastJsonResponse(
+                {"error": "invalid_request", "error_description": "sub must be a list of subject identifiers"},
+                status=400,
+            )
+        if len(subjects) > settings.CLAIMS_BATCH_MAX_SUBJECTS:
+            return FastJsonResponse(
+                {
+                    "error": "invalid_request",
+                    "error_description": f"At most {settings.CLAIMS_BATCH_MAX_SUBJECTS} subjects per request",
+                },
+                status=400,
+            )
+
+        user_ids, not_found = [], []
+        for subject in dict.fromkeys(subjects):
+            try:
+                user_ids.append(str(uuid.UUID(subject)))
+            except ValueError:
+                not_found.append(subject)
+
+        claims = get_many_user_claims(user_ids)
+        columns = ["sub", *(name for scope, names in SCOPE_CLAIMS.items() if scope in scopes for name in names)]
+        rows = []
+        for user_id in user_ids:
+            if user_id in claims:
+                released = filter_claims(claims[user_id], scopes, request)
+                rows.append([released[column] for column in columns])
+            else:
+                not_found.append(user_id)
+        return FastJsonResponse({"columns": columns, "rows": rows, "not_found": not_found})
+
+
+class AuditEventsView(JSONView):
+    """
+    The audit log, newest first, for clients allowed the ``audit`` scope (HTTP Basic credentials).
+
+    Filters: ``sub`` (user id), ``client_id``, ``event``, ``since`` and ``until`` (ISO 8601). Pass ``next_cursor``
+    as ``cursor`` for the next page.
+    """
+
+    def get(self, request):
+        client = authenticate_client(request)
+        if client is None:
+            return FastJsonResponse({"error": "invalid_client"}, status=401)
+        if "audit" not in client.get_allowed_scopes():
+            return FastJsonResponse({"error": "unauthorized_client"}, status=403)
+
+        params = request.GET
+        try:
+            user_id = uuid.UUID(params["sub"]) if params.get("sub") else None
+            since, until = (parse_since(params.get(name)) for name in ("since", "until"))
+            before = audit.decode_cursor(params["cursor"]) if params.get("cursor") else None
+            limit = min(
+                max(int(params.get("limit") or settings.AUDIT_DEFAULT_PAGE_SIZE), 1), settings.AUDIT_MAX_PAGE_SIZE
+            )
+        except ValueError as e:
+            return FastJsonResponse({"error": "invalid_request", "error_description": str(e)}, status=400)
+
+        events = audit.query_events(
+            user_id, params.get("client_id"), params.get("event"), since, until, before, limit=limit + 1
+        )
+        body = {
+            "events": [
+                {
+                    "id": event.id,
+                    "event": event.event,
+                    "sub": str(event.user_id) if event.user_id else None,
+                    "client_id": event.client_id,
+                    "ip": event.ip,
+                    "time": event.created_at.isoformat(),
+                    "data": event.data,
+                }
+                for event in events[:limit]
+            ],
+            "next_cursor": audit.encode_cursor(events[limit - 1]) if len(events) > limit else None,
+        }
+        return FastJsonResponse(body)
+
+
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class ChangesView(JSONView):
+    """
+    The user change feed (`django_sso.users.utils.changes`), for relying party backends keeping a copy of users.
+
+    Authenticated with the client's HTTP Basic credentials, the client must be allowed the ``claims`` scope. Each
+    change lists the claims that changed among the ones the client's scopes release, and whether the user is
+    active. Pass the returned ``cursor`` to the next call; ``wait`` (seconds) long-polls while there is nothing new.
+    A cursor older than the retention is answered with 410, the client has to resynchronize.
+    """
+
+    def get(self, request):
+        client = authenticate_client(request)
+        if client is None:
+            return FastJsonResponse({"error": "invalid_client"}, status=401)
+        scopes = client.get_allowed_scopes()
+        if "claims" not in scopes:
+            return FastJsonResponse({"error": "unauthorized_client"}, status=403)
+
+        try:
+            limit = int(request.GET.get("limit") or settings.USER_CHANGES_PAGE_SIZE)
+            wait = float(request.GET.get("wait") or 0)
+            rows, cursor, has_more = read_changes(
+                request.GET.get("cursor"),
+                min(max(limit, 1), settings.USER_CHANGES_MAX_PAGE_SIZE),
+                min(max(wait, 0), settings.USER_CHANGES_MAX_WAIT),
+            )
+        except ExpiredCursor:
+            return FastJsonResponse(
+                {"error": "expired_cursor", "error_description": "Changes after this cursor were pruned"}, status=410
+            )
+        except ValueError:
+            return FastJsonResponse(
+                {"error": "invalid_request", "error_description": "Invalid cursor, limit or wait"}, status=400
+            )
+
+        released = {name for scope in scopes for name in SCOPE_CLAIMS.get(scope, ())}
+        changes = []
+        for _, user_id, kind, fields, is_active, created_at in rows:
+            claims = [COLUMN_CLAIMS[field] for field in fields if COLUMN_CLAIMS.get(field) in released]
+            if kind == UserChange.Kind.UPDATED and not claims and "is_active" not in fields:
+                continue
+            changes.append(
+                {
+                    "sub": str(user_id),
+                    "type": kind,
+                    "claims": claims,
+                    "active": is_active,
+                    "time": created_at.isoformat(),
+                }
+            )
+        return FastJsonResponse({"changes": changes, "cursor": cursor, "has_more": has_more})
+
 
+class LogoutView(JSONView):
     def post(self, request):
         token = self._get_token_from_request(request)
         if not token:
-            return Response({"error": "missing_token"}, status=400)
+            return FastJsonResponse({"error": "missing_token"}, status=400)
 
         try:
             payload = jwt.decode(token, settings.SSO["JWT_SECRET_KEY"], algorithms=["HS256"])
         except jwt.ExpiredSignatureError:
-            return Response({"error": "token_expired"}, status=400)
+            return FastJsonResponse({"error": "token_expired"}, status=400)
         except jwt.InvalidTokenError:
-            return Response({"error": "invalid_token"}, status=400)
+            return FastJsonResponse({"error": "invalid_token"}, status=400)
 
         exp_timestamp = payload["exp"]
         ttl = exp_timestamp - int(now().timestamp())
         if ttl > 0:
             cache.set(f"blacklisted_token:{token}", "1", timeout=ttl)
 
-        return Response(status=204)
+        audit.record(
+            AuditEvent.Event.LOGOUT, request, user_id=payload["user_id"], client_id=payload.get("client_id", "")
+        )
+        # The other applications the user signed in to are told over the back-channel.
+        publish_logout(payload["user_id"], exclude_client_id=payload.get("client_id"))
+        return HttpResponse(status=204)
 
     def _get_token_from_request(self, request):
         auth_header = request.headers.get("Authorization", "")
@@ -336,47 +513,13 @@ class LogoutView(APIView):
         return None
 
 
-class DiscoveryView(APIView):
-    permission_classes = []
-    authentication_classes = []
-
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class DiscoveryView(JSONView):
     def get(self, request):
-        issuer = settings.SSO.get("ISSUER_URL", request.build_absolute_uri("/"))
-        base = issuer.rstrip("/")
-        return Response(
-            {
-                "issuer": issuer,
-                "authorization_endpoint": base + reverse("accounts:web:authorize"),
-                "token_endpoint": base + reverse("accounts:api:token"),
-                "userinfo_endpoint": base + reverse("accounts:api:userinfo"),
-                "jwks_uri": base + reverse("accounts:api:jwks"),
-                "response_types_supported": ["code"],
-                "subject_types_supported": ["public"],
-                "id_token_signing_alg_values_supported": ["HS256"],
-                "scopes_supported": ["openid", "email", "profile"],
-                "claims_supported": ["sub", "email", "email_verified", "name", "given_name", "family_name"],
-                "grant_types_supported": ["authorization_code", "refresh_token"],
-                "token_endpoint_auth_methods_supported": ["client_secret_post"],
-                "code_challenge_methods_supported": ["plain", "S256"],
-            }
-        )
-
+        return get_document("discovery").response(request)
 
-class JWKSView(APIView):
-    permission_classes = []
-    authentication_classes = []
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class JWKSView(JSONView):
     def get(self, request):
-        # TODO: add RS256 support
-        return Response(
-            {
-                "keys": [
-                    {
-                        "kty": "oct",
-                        "use": "sig",
-                        "alg": "HS256",
-                        "kid": "default",
-                    }
-                ]
-            }
-        )
+        return get_document("jwks").response(request)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "django_sso.users"
+
+    def ready(self):
+        from django_sso.users import signals  # noqa: F401
@@ -3,11 +3,10 @@ from django.contrib.auth import forms as admin_forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import PasswordResetForm as DJPasswordResetForm
 from django.forms import EmailField
-from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
 
 # local
-from django_sso.core.email.send_mail import send_mail
+from django_sso.users.utils.emails import send_templated_email
 
 User = get_user_model()
 
@@ -56,10 +55,9 @@ class PasswordResetForm(DJPasswordResetForm):
         """
         Override this to send a custom email.
         """
-        subject = render_to_string(subject_template_name, context).strip()
-        body = render_to_string(email_template_name, context)
-
-        send_mail.delay(subject, body, to_email)
+        # Rendered by the worker, which reloads the user.
+        user = context.pop("user")
+        send_templated_email(to_email, subject_template_name, email_template_name, context, user=user)
 
 
 class ResendVerificationForm(forms.Form):
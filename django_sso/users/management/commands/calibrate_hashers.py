@@ -0,0 +1,129 @@
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import argon2
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Memory costs tried, in KiB. 19 MiB is the OWASP minimum for Argon2id.
+MEMORY_COSTS = (19456, 32768, 47104, 65536, 102400, 131072, 262144)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark Argon2 cost parameters on this machine and print (or write) the strongest configuration "
+        "that keeps a login under the target latency while `--concurrency` logins hash at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-ms", type=int, default=250, help="Latency budget of one hash, in ms.")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.PASSWORD_HASHING_WORKERS,
+            help="Hashes running at once, defaults to PASSWORD_HASHING_WORKERS.",
+        )
+        parser.add_argument(
+            "--max-memory-mb",
+            type=int,
+            default=1024,
+            help="Memory budget of the concurrent hashes together, in MiB.",
+        )
+        parser.add_argument("--parallelism", type=int, default=1, help="Argon2 lanes per hash.")
+        parser.add_argument(
+            "--memory-costs",
+            type=lambda value: [int(cost) for cost in value.split(",")],
+            default=MEMORY_COSTS,
+            help="Comma-separated memory costs to try, in KiB.",
+        )
+        parser.add_argument("--rounds", type=int, default=5, help="Measurements per configuration.")
+        parser.add_argument("--output", help="Env file to write the settings to, e.g. .envs/.production/.django.")
+
+    def handle(self, *args, **options):
+        target = options["target_ms"] / 1000
+        concurrency = options["concurrency"]
+        parallelism = options["parallelism"]
+        rounds = options["rounds"]
+        max_memory = options["max_memory_mb"] * 1024
+
+        results = []
+        for memory_cost in sorted(options["memory_costs"]):
+            if memory_cost * concurrency > max_memory:
+                break
+
+            latency = self.measure(1, memory_cost, parallelism, concurrency, rounds)
+            if latency > target:
+                # Higher memory costs are only slower.
+                break
+
+            # The hashing time grows about linearly with the time cost, start from the estimate and step down.
+            time_cost = max(1, int(target / latency))
+            while time_cost > 1:
+                latency = self.measure(time_cost, memory_cost, parallelism, concurrency, rounds)
+                if latency <= target:
+                    break
+                time_cost -= 1
+            if time_cost == 1:
+                latency = self.measure(1, memory_cost, parallelism, concurrency, rounds)
+
+            results.append((time_cost, memory_cost, latency))
+            self.stdout.write(f"time_cost={time_cost} memory_cost={memory_cost} KiB: {latency * 1000:.0f} ms")
+
+        if not results:
+            raise CommandError(
+                f"No configuration hashes under {options['target_ms']} ms with {concurrency} concurrent hashes, "
+                "raise --target-ms or lower --concurrency."
+            )
+
+        # The most work (time x memory) that fits the budget, favoring memory on ties.
+        time_cost, memory_cost, latency = max(results, key=lambda result: (result[0] * result[1], result[1]))
+        values = {
+            "DJANGO_ARGON2_TIME_COST": time_cost,
+            "DJANGO_ARGON2_MEMORY_COST": memory_cost,
+            "DJANGO_ARGON2_PARALLELISM": parallelism,
+        }
+
+        throughput = concurrency / latency
+        self.stdout.write(
+            f"Selected time_cost={time_cost} memory_cost={memory_cost} KiB parallelism={parallelism}: "
+            f"{latency * 1000:.0f} ms per hash, ~{throughput:.0f} logins/s per process "
+            f"(~{throughput / (os.cpu_count() or 1):.1f} per core)."
+        )
+
+        if options["output"]:
+            write_env_file(Path(options["output"]), values)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            for name, value in values.items():
+                self.stdout.write(f"{name}={value}")
+
+    def measure(self, time_cost, memory_cost, parallelism, concurrency, rounds) -> float:
+        """
+        Median over ``rounds`` of the slowest hash while ``concurrency`` hashes run at once, in seconds.
+        """
+        hasher = argon2.PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+
+        def timed_hash(_):
+            started_at = time.perf_counter()
+            hasher.hash("calibration-password")
+            return time.perf_counter() - started_at
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return statistics.median(max(pool.map(timed_hash, range(concurrency))) for _ in range(rounds))
+
+
+def write_env_file(path: Path, values: dict):
+    """
+    Set ``values`` in an env file, replacing existing assignments and keeping the other lines.
+    """
+    lines = path.read_text().splitlines() if path.exists() else []
+    remaining = dict(values)
+    for i, line in enumerate(lines):
+        name = line.split("=", 1)[0].strip()
+        if name in remaining:
+            lines[i] = f"{name}={remaining.pop(name)}"
+    lines.extend(f"{name}={value}" for name, value in remaining.items())
+    path.write_text("\n".join(lines) + "\n")
@@ -0,0 +1,207 @@
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+FIELDS = ("email", "username", "first_name", "last_name", "email_verified", "is_active", "date_joined")
+BOOLEAN_FIELDS = ("email_verified", "is_active")
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    """
+    Hash plaintext passwords with the default hasher, run in the worker processes.
+    """
+    return [make_password(password) for password in passwords]
+
+
+def read_records(path: str, fmt: str):
+    """
+    Yield the records of a CSV (with a header) or JSONL file, as dicts. ``-`` reads stdin.
+
+    A line that isn't valid JSON is yielded as the ``ValidationError`` to report for it.
+    """
+    stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield ValidationError(f"Invalid JSON: {e}")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Import users from a CSV (with a header) or JSONL file. Recognized columns: email (required), username, "
+        "first_name, last_name, email_verified, is_active, date_joined, and either password_hash (an encoded "
+        "password of one of the PASSWORD_HASHERS, e.g. legacy bcrypt or PBKDF2 hashes, upgraded on the next login) "
+        "or password (plaintext, hashed on a process pool). Users whose email already exists are skipped, invalid "
+        "records are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, - for stdin.")
+        parser.add_argument("--format", choices=("csv", "jsonl"), help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Users inserted per transaction.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes hashing plaintext passwords, 0 hashes in this process.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording the records already imported. An import is resumed from it when it exists.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("csv" if path.endswith(".csv") else "jsonl" if path != "-" else None)
+        if fmt is None:
+            raise CommandError("--format is required when reading from stdin.")
+        batch_size = options["batch_size"]
+        checkpoint = Path(options["checkpoint"]) if options["checkpoint"] else None
+
+        start = int(checkpoint.read_text()) if checkpoint and checkpoint.exists() else 0
+        if start:
+            self.stdout.write(f"Resuming after record {start}")
+
+        pool = None
+        if options["workers"] > 0:
+            # Fork, so the workers inherit the configured settings.
+            pool = ProcessPoolExecutor(options["workers"], mp_context=multiprocessing.get_context("fork"))
+        self.workers = options["workers"]
+
+        records = itertools.islice(read_records(path, fmt), start, None)
+        processed, self.created, self.skipped, self.failed = start, 0, 0, 0
+        started_at = time.monotonic()
+        try:
+            while batch := list(itertools.islice(records, batch_size)):
+                self.import_batch(batch, processed, pool)
+                processed += len(batch)
+                if checkpoint:
+                    self.save_checkpoint(checkpoint, processed)
+
+                rate = (processed - start) / (time.monotonic() - started_at)
+                self.stdout.write(
+                    f"{processed} records: {self.created} created, {self.skipped} skipped, {self.failed} failed "
+                    f"({rate:.0f} records/s)"
+                )
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {self.created} users from {processed - start} records."))
+
+    def import_batch(self, records: list[dict], offset: int, pool):
+        User = get_user_model()
+
+        users, plaintext = {}, []
+        for number, record in enumerate(records, offset + 1):
+            try:
+                user, password = self.build_user(User, record)
+            except ValidationError as e:
+                self.failed += 1
+                self.stderr.write(f"Record {number}: {'; '.join(e.messages)}")
+                continue
+            if user.email in users:
+                self.skipped += 1
+                continue
+            users[user.email] = user
+            if password is not None:
+                plaintext.append((user, password))
+
+        existing = set(User.objects.filter(email__in=users).values_list("email", flat=True))
+        self.skipped += len(existing)
+        plaintext = [(user, password) for user, password in plaintext if user.email not in existing]
+
+        passwords = [password for _, password in plaintext]
+        if pool and passwords:
+            chunk_size = -(-len(passwords) // self.workers)
+            chunks = [passwords[i : i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+            hashes = itertools.chain.from_iterable(pool.map(hash_passwords, chunks))
+        else:
+            hashes = hash_passwords(passwords)
+        for (user, _), encoded in zip(plaintext, hashes):
+            user.password = encoded
+
+        new_users = [user for email, user in users.items() if email not in existing]
+        with transaction.atomic():
+            # Users created by someone else since the lookup above are left alone.
+            User.objects.bulk_create(new_users, ignore_conflicts=True)
+            # The ids are set here, those that didn't make it were skipped.
+            created = User.objects.filter(pk__in=[user.pk for user in new_users]).count()
+        self.created += created
+        self.skipped += len(new_users) - created
+
+    def build_user(self, User, record: dict):
+        """
+        Return the unsaved user of a record, and its plaintext password if it has one to hash.
+        """
+        if isinstance(record, ValidationError):
+            raise record
+        if not isinstance(record, dict):
+            raise ValidationError("Expected an object.")
+        invalid = [
+            field
+            for field in (*FIELDS, "password", "password_hash")
+            if record.get(field) is not None
+            and not isinstance(record[field], (bool, str) if field in BOOLEAN_FIELDS else str)
+        ]
+        if invalid:
+            raise ValidationError(f"Invalid value for {', '.join(invalid)}.")
+
+        email = User.objects.normalize_email((record.get("email") or "").strip())
+        validate_email(email)
+
+        fields = {field: record[field] for field in FIELDS if record.get(field) not in (None, "")}
+        for field in BOOLEAN_FIELDS:
+            if isinstance(fields.get(field), str):
+                fields[field] = fields[field].strip().lower() in TRUE_VALUES
+        if "date_joined" in fields:
+            date_joined = User._meta.get_field("date_joined").to_python(fields["date_joined"])
+            if not settings.USE_TZ and timezone.is_aware(date_joined):
+                date_joined = timezone.make_naive(date_joined)
+            fields["date_joined"] = date_joined
+        fields["email"] = email
+        user = User(**fields)
+
+        password, encoded = record.get("password"), record.get("password_hash")
+        if encoded:
+            try:
+                # Only the algorithms of PASSWORD_HASHERS, anything else could never be checked.
+                identify_hasher(encoded)
+            except ValueError:
+                raise ValidationError("Unknown password hash format.")
+            user.password = encoded
+            return user, None
+        if password:
+            return user, password
+        user.set_unusable_password()
+        return user, None
+
+    def save_checkpoint(self, path: Path, processed: int):
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(str(processed))
+        tmp.replace(path)
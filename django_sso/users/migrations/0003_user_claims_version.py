@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-19 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0002_user_email_verified"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="claims_version",
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name="Claims version"),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-19 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0003_user_claims_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="application",
+            name="id_token_claims",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="Space-separated claims (e.g. email email_verified name) to embed in ID tokens, limited to the granted scopes.",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.11 on 2026-10-19 14:33
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0004_application_id_token_claims"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxMessage",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("topic", models.CharField(max_length=64, verbose_name="Topic")),
+                ("payload", models.JSONField(verbose_name="Payload")),
+                ("attempts", models.PositiveSmallIntegerField(default=0, verbose_name="Attempts")),
+                ("available_at", models.DateTimeField(default=django.utils.timezone.now, verbose_name="Available at")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["available_at"], name="outbox_available_at_idx")],
+            },
+        ),
+    ]
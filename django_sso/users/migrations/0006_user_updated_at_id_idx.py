@@ -0,0 +1,16 @@
+# Generated by Django 4.2.11 on 2026-10-19 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0005_outboxmessage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(fields=["updated_at", "id"], name="user_updated_at_id_idx"),
+        ),
+    ]
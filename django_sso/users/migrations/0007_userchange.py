@@ -0,0 +1,35 @@
+# Generated by Django 4.2.11 on 2026-10-19 14:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0006_user_updated_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserChange",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("user_id", models.UUIDField(verbose_name="User ID")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("updated", "Updated"), ("deleted", "Deleted")],
+                        default="updated",
+                        max_length=16,
+                        verbose_name="Kind",
+                    ),
+                ),
+                ("fields", models.JSONField(default=list, verbose_name="Changed fields")),
+                ("is_active", models.BooleanField(default=True, verbose_name="Active")),
+                (
+                    "created_at",
+                    models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name="Created at"),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-19 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0007_userchange"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="application",
+            name="backchannel_logout_uri",
+            field=models.URLField(
+                blank=True,
+                default="",
+                help_text="Receives a logout token when a user logs out of another application (OIDC Back-Channel Logout).",
+                max_length=2048,
+                verbose_name="Back-channel logout URI",
+            ),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.11 on 2026-10-19 14:59
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def create_audit_table(apps, schema_editor):
+    """
+    On PostgreSQL the table is partitioned by range of ``created_at``, the daily partitions are created as needed by
+    ``django_sso.users.utils.audit``. The primary key of a partitioned table has to include the partition key, and
+    the id is a ``bigserial`` since identity columns of partitioned tables need PostgreSQL 17.
+    """
+    model = apps.get_model("users", "AuditEvent")
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.create_model(model)
+        return
+
+    schema_editor.execute(
+        """
+        CREATE TABLE users_auditevent (
+            id bigserial NOT NULL,
+            created_at timestamp with time zone NOT NULL,
+            event varchar(32) NOT NULL,
+            user_id uuid NULL,
+            client_id varchar(152) NOT NULL,
+            ip inet NULL,
+            data jsonb NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)
+
+
+def drop_audit_table(apps, schema_editor):
+    # Drops the partitions along.
+    schema_editor.delete_model(apps.get_model("users", "AuditEvent"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0008_application_backchannel_logout_uri"),
+    ]
+
+    operations = [
+        # The table is created by create_audit_table().
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="AuditEvent",
+                    fields=[
+                        ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                        (
+                            "created_at",
+                            models.DateTimeField(default=django.utils.timezone.now, verbose_name="Created at"),
+                        ),
+                        (
+                            "event",
+                            models.CharField(
+                                choices=[
+                                    ("login", "Login"),
+                                    ("login_failed", "Failed login"),
+                                    ("code_issued", "Authorization code issued"),
+                                    ("token_issued", "Tokens issued"),
+                                    ("token_refreshed", "Tokens refreshed"),
+                                    ("logout", "Logout"),
+                                ],
+                                max_length=32,
+                                verbose_name="Event",
+                            ),
+                        ),
+                        ("user_id", models.UUIDField(blank=True, null=True, verbose_name="User ID")),
+                        (
+                            "client_id",
+                            models.CharField(blank=True, default="", max_length=152, verbose_name="Client ID"),
+                        ),
+                        ("ip", models.GenericIPAddressField(blank=True, null=True, verbose_name="IP address")),
+                        ("data", models.JSONField(default=dict, verbose_name="Data")),
+                    ],
+                    options={
+                        "indexes": [
+                            models.Index(fields=["created_at"], name="audit_created_at_idx"),
+                            models.Index(fields=["user_id", "created_at"], name="audit_user_created_at_idx"),
+                            models.Index(fields=["client_id", "created_at"], name="audit_client_created_at_idx"),
+                        ],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_audit_table, drop_audit_table),
+    ]
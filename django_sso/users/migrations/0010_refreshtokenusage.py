@@ -0,0 +1,48 @@
+# Generated by Django 4.2.11 on 2026-10-19 15:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0009_auditevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="application",
+            name="last_used_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name="Last used"),
+        ),
+        migrations.CreateModel(
+            name="RefreshTokenUsage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("last_used_at", models.DateTimeField(verbose_name="Last used")),
+                (
+                    "application",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="refresh_token_usages",
+                        to="users.application",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="refresh_token_usages",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="refreshtokenusage",
+            constraint=models.UniqueConstraint(
+                fields=("user", "application"), name="refresh_token_usage_user_application_uniq"
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.11 on 2026-10-19 15:19
+
+from django.db import migrations, models
+import django_sso.utils.uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0010_refreshtokenusage"),
+    ]
+
+    # Only the model state changes: ids are generated in Python, and Django never created an index for unique=True on
+    # a primary key, so there's no SQL to run. Existing rows keep their ids.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="application",
+                    name="id",
+                    field=models.UUIDField(
+                        default=django_sso.utils.uuid.uuid7, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="outboxmessage",
+                    name="id",
+                    field=models.UUIDField(
+                        default=django_sso.utils.uuid.uuid7, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="user",
+                    name="id",
+                    field=models.UUIDField(
+                        default=django_sso.utils.uuid.uuid7, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+            ]
+        ),
+    ]
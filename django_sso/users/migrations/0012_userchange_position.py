@@ -0,0 +1,25 @@
+# Generated by Django 4.2.11 on 2026-10-19 15:31
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def position_existing_changes(apps, schema_editor):
+    # Entries recorded so far were served in id order, which keeps the cursors handed out valid.
+    UserChange = apps.get_model("users", "UserChange")
+    UserChange.objects.using(schema_editor.connection.alias).update(position=F("id"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0011_uuid7_primary_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userchange",
+            name="position",
+            field=models.BigIntegerField(editable=False, null=True, unique=True, verbose_name="Position"),
+        ),
+        migrations.RunPython(position_existing_changes, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
 import secrets
+from functools import partial
 
-from django.contrib.auth.hashers import make_password
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 # local imports
 from django_sso.core.db.models import BaseModel
@@ -11,6 +13,9 @@ from django_sso.core.db.models import BaseModel
 from django_sso.users.managers import UserManager
 
 # utils
+from django_sso.users.utils.claims import set_claims_version
+from django_sso.users.utils.client_secret import check_client_secret, make_client_secret, must_update_client_secret
+from django_sso.users.utils.passwords import forget_superseded_password, rehash_password, superseded_session_auth_hash
 from django_sso.utils.string import normalize_uri
 
 
@@ -29,12 +34,101 @@ class User(BaseModel, AbstractUser):
     )
 
     email_verified = models.BooleanField("Email verified", default=False)
+    claims_version = models.PositiveIntegerField("Claims version", default=1, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
 
+    # Fields that feed the userinfo / ID token claims, changing any of them bumps `claims_version`.
+    CLAIM_FIELDS = ("email", "email_verified", "username", "first_name", "last_name", "profile_picture")
+
     objects = UserManager()
 
+    class Meta(BaseModel.Meta):
+        # Keyset pagination of the user export (django_sso.users.utils.export).
+        indexes = [models.Index(fields=["updated_at", "id"], name="user_updated_at_id_idx")]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_claims = instance._claim_values()
+        instance._loaded_active = instance.__dict__.get("is_active")
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_claims = self._claim_values()
+        self._loaded_active = self.__dict__.get("is_active")
+
+    def _claim_values(self):
+        # Read from __dict__ so deferred fields are not loaded, file fields are compared by name.
+        values = {}
+        for field in self.CLAIM_FIELDS:
+            value = self.__dict__.get(field)
+            values[field] = getattr(value, "name", value)
+        return values
+
+    def changed_fields(self) -> list[str]:
+        """
+        The claim fields and ``is_active``, if they changed since the instance was loaded.
+        """
+        loaded_claims = getattr(self, "_loaded_claims", None)
+        if loaded_claims is None:
+            return []
+        claims = self._claim_values()
+        changed = [field for field in self.CLAIM_FIELDS if loaded_claims[field] != claims[field]]
+        if self._loaded_active != self.__dict__.get("is_active"):
+            changed.append("is_active")
+        return changed
+
+    def save(self, *args, **kwargs):
+        """
+        Bump `claims_version` when a claim field changed since the instance was loaded, and record the change in the
+        user change feed along with (de)activations.
+
+        Note that `QuerySet.update()` bypasses this, bump the version and record the change yourself when updating
+        these fields in bulk.
+        """
+        changed = self.changed_fields()
+        claims_changed = any(field in self.CLAIM_FIELDS for field in changed)
+        if claims_changed:
+            self.claims_version += 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "claims_version"}
+
+        super().save(*args, **kwargs)
+
+        self._loaded_claims = self._claim_values()
+        self._loaded_active = self.__dict__.get("is_active")
+        if changed:
+            UserChange.record([UserChange(user_id=self.pk, fields=changed, is_active=self.is_active)])
+        if claims_changed:
+            transaction.on_commit(partial(set_claims_version, self.pk, self.claims_version))
+
+    def check_password(self, raw_password):
+        """
+        Like Django's, but a hash made with outdated parameters is upgraded in the background once the request
+        commits, so the login does not pay for a second hash.
+        """
+
+        def setter(raw_password):
+            transaction.on_commit(partial(rehash_password, self.pk, self.password, raw_password))
+
+        return check_password(raw_password, self.password, setter)
+
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        if not self._state.adding:
+            forget_superseded_password(self.pk)
+
+    def get_session_auth_fallback_hash(self):
+        yield from super().get_session_auth_fallback_hash()
+        # Sessions created before a background rehash carry the HMAC of the previous hash.
+        superseded_hash = superseded_session_auth_hash(self.pk, self.password)
+        if superseded_hash:
+            yield superseded_hash
+
     def __str__(self):
         return f"{self.username}"
 
@@ -51,8 +145,22 @@ class Application(BaseModel):
 
     redirect_uris = models.TextField(help_text="Newline-separated list of allowed redirect URIs.")
     allowed_scopes = models.TextField(default="openid email profile")
+    id_token_claims = models.TextField(
+        blank=True,
+        default="",
+        help_text="Space-separated claims (e.g. email email_verified name) to embed in ID tokens, "
+        "limited to the granted scopes.",
+    )
+    backchannel_logout_uri = models.URLField(
+        "Back-channel logout URI",
+        max_length=2048,
+        blank=True,
+        default="",
+        help_text="Receives a logout token when a user logs out of another application (OIDC Back-Channel Logout).",
+    )
 
     is_active = models.BooleanField(default=True)
+    last_used_at = models.DateTimeField("Last used", null=True, blank=True, editable=False)
 
     def save(self, *args, **kwargs):
         if not self.client_id:
@@ -61,10 +169,24 @@ class Application(BaseModel):
         if not self.client_secret:
             raw_secret = secrets.token_urlsafe(64)
             self._raw_client_secret = raw_secret
-            self.client_secret = make_password(raw_secret, hasher="argon2")
+            self.client_secret = make_client_secret(raw_secret)
 
         return super().save(*args, **kwargs)
 
+    def check_client_secret(self, raw_secret):
+        """
+        Check ``raw_secret`` against the stored secret, migrating a secret from the old scheme once it verified.
+        """
+        if not check_client_secret(raw_secret, self.client_secret):
+            return False
+
+        if must_update_client_secret(self.client_secret):
+            encoded = make_client_secret(raw_secret)
+            # Conditional, so concurrent authentications of the same client migrate it once.
+            Application.objects.filter(pk=self.pk, client_secret=self.client_secret).update(client_secret=encoded)
+            self.client_secret = encoded
+        return True
+
     def _generate_unique_client_id(self, length=32):
         token = secrets.token_urlsafe(length)
 
@@ -79,5 +201,112 @@ class Application(BaseModel):
     def get_allowed_scopes(self):
         return [s.strip() for s in self.allowed_scopes.split() if s.strip()]
 
+    def get_id_token_claims(self):
+        return [c.strip() for c in self.id_token_claims.split() if c.strip()]
+
     def __str__(self):
         return self.name
+
+
+class RefreshTokenUsage(models.Model):
+    """
+    When a user's refresh tokens were last used at an application, written behind by
+    `django_sso.users.utils.activity`. Refresh tokens rotate on every use, so usage is tracked per user and
+    application rather than per token.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="refresh_token_usages")
+    application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name="refresh_token_usages")
+    last_used_at = models.DateTimeField("Last used")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "application"], name="refresh_token_usage_user_application_uniq")
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} at {self.application_id} ({self.last_used_at})"
+
+
+class OutboxMessage(BaseModel):
+    """
+    A message (email, event) written in the transaction that produced it, and handed to its topic's handler by the
+    outbox dispatcher once committed. See `django_sso.users.utils.outbox`.
+    """
+
+    topic = models.CharField("Topic", max_length=64)
+    payload = models.JSONField("Payload")
+    attempts = models.PositiveSmallIntegerField("Attempts", default=0)
+    available_at = models.DateTimeField("Available at", default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["available_at"], name="outbox_available_at_idx")]
+
+    def __str__(self):
+        return f"{self.topic} ({self.id})"
+
+
+class UserChange(models.Model):
+    """
+    An entry of the user change feed (`django_sso.users.utils.changes`): the claims or the active status of a user
+    changed, or the user was deleted. Entries are served in the order of `position`, given once they are committed.
+    """
+
+    class Kind(models.TextChoices):
+        UPDATED = "updated", "Updated"
+        DELETED = "deleted", "Deleted"
+
+    id = models.BigAutoField(primary_key=True)
+    user_id = models.UUIDField("User ID")
+    kind = models.CharField("Kind", max_length=16, choices=Kind.choices, default=Kind.UPDATED)
+    fields = models.JSONField("Changed fields", default=list)
+    is_active = models.BooleanField("Active", default=True)
+    created_at = models.DateTimeField("Created at", default=timezone.now, db_index=True)
+    position = models.BigIntegerField("Position", null=True, unique=True, editable=False)
+
+    @classmethod
+    def record(cls, changes: list["UserChange"]):
+        """
+        Add entries to the feed, within the current transaction. Once it commits they get their positions and
+        long-polling readers are woken.
+        """
+        from django_sso.users.utils.changes import publish_changes
+
+        cls.objects.bulk_create(changes)
+        transaction.on_commit(publish_changes, robust=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.user_id} ({self.id})"
+
+
+class AuditEvent(models.Model):
+    """
+    An authentication event, written in bulk by `django_sso.users.utils.audit`. On PostgreSQL the table is
+    partitioned by day of `created_at`, see migration 0009.
+    """
+
+    class Event(models.TextChoices):
+        LOGIN = "login", "Login"
+        LOGIN_FAILED = "login_failed", "Failed login"
+        CODE_ISSUED = "code_issued", "Authorization code issued"
+        TOKEN_ISSUED = "token_issued", "Tokens issued"
+        TOKEN_REFRESHED = "token_refreshed", "Tokens refreshed"
+        LOGOUT = "logout", "Logout"
+
+    id = models.BigAutoField(primary_key=True)
+    created_at = models.DateTimeField("Created at", default=timezone.now)
+    event = models.CharField("Event", max_length=32, choices=Event.choices)
+    user_id = models.UUIDField("User ID", null=True, blank=True)
+    client_id = models.CharField("Client ID", max_length=152, blank=True, default="")
+    ip = models.GenericIPAddressField("IP address", null=True, blank=True)
+    data = models.JSONField("Data", default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="audit_created_at_idx"),
+            models.Index(fields=["user_id", "created_at"], name="audit_user_created_at_idx"),
+            models.Index(fields=["client_id", "created_at"], name="audit_client_created_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.event} {self.user_id or '-'} ({self.created_at})"
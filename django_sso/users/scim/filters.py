@@ -0,0 +1,154 @@
+"""
+SCIM filter expressions (RFC 7644 section 3.4.2.2) compiled to ``Q`` objects, so filtering happens in SQL.
+
+``userName eq`` and ``id eq`` are exact matches on the unique email and primary key indexes, which is what
+provisioning clients use to look a user up before creating or updating it.
+"""
+
+import re
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+# local
+from .resources import ATTRIBUTE_FIELDS, SCIMError, attribute_path, parse_datetime_value
+
+re_token = re.compile(r'\s*(?:(\()|(\))|("(?:[^"\\]|\\.)*")|([^\s()\["]+(?:\[[^\]]*\][^\s()"]*)?))')
+
+LOOKUPS = {
+    "eq": "exact",
+    "co": "contains",
+    "sw": "startswith",
+    "ew": "endswith",
+    "gt": "gt",
+    "ge": "gte",
+    "lt": "lt",
+    "le": "lte",
+}
+DATETIME_FIELDS = ("date_joined", "updated_at")
+
+
+def tokenize(expression: str) -> list:
+    tokens, position = [], 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = re_token.match(expression, position)
+        if not match or match.end() == position:
+            raise SCIMError(f"Invalid filter: {expression}", scim_type="invalidFilter")
+        position = match.end()
+        opening, closing, string, word = match.groups()
+        if string is not None:
+            tokens.append(("string", string[1:-1].replace('\\"', '"').replace("\\\\", "\\")))
+        else:
+            tokens.append(("symbol", opening or closing or word))
+    return tokens
+
+
+class Parser:
+    """
+    filter := term ("or" term)*, term := factor ("and" factor)*, factor := ["not"] ("(" filter ")" | comparison)
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, lowered=True):
+        if self.position >= len(self.tokens):
+            return None
+        kind, value = self.tokens[self.position]
+        return value.lower() if kind == "symbol" and lowered else value
+
+    def take(self):
+        if self.position >= len(self.tokens):
+            raise SCIMError("Unexpected end of filter", scim_type="invalidFilter")
+        self.position += 1
+        return self.tokens[self.position - 1]
+
+    def parse(self) -> Q:
+        q = self.filter()
+        if self.position != len(self.tokens):
+            raise SCIMError(f"Unexpected token in filter: {self.peek(False)}", scim_type="invalidFilter")
+        return q
+
+    def filter(self) -> Q:
+        q = self.term()
+        while self.peek() == "or":
+            self.take()
+            q |= self.term()
+        return q
+
+    def term(self) -> Q:
+        q = self.factor()
+        while self.peek() == "and":
+            self.take()
+            q &= self.factor()
+        return q
+
+    def factor(self) -> Q:
+        if self.peek() == "not":
+            self.take()
+            return ~self.factor()
+        if self.peek() == "(":
+            self.take()
+            q = self.filter()
+            if self.take() != ("symbol", ")"):
+                raise SCIMError("Unbalanced parentheses in filter", scim_type="invalidFilter")
+            return q
+        return self.comparison()
+
+    def comparison(self) -> Q:
+        kind, path = self.take()
+        if kind != "symbol":
+            raise SCIMError(f"Expected an attribute, got {path!r}", scim_type="invalidFilter")
+        field = ATTRIBUTE_FIELDS.get(attribute_path(path))
+        if field is None:
+            raise SCIMError(f"Unsupported filter attribute: {path}", scim_type="invalidFilter")
+
+        operator = self.take()[1].lower()
+        if operator == "pr":
+            if field in ("username", "first_name", "last_name"):
+                return ~Q(**{f"{field}__isnull": True}) & ~Q(**{field: ""})
+            # Always present.
+            return Q()
+
+        kind, raw = self.take()
+        value = raw if kind == "string" else {"true": True, "false": False, "null": None}.get(raw.lower(), raw)
+        if operator == "ne":
+            return ~compare(field, "eq", value)
+        return compare(field, operator, value)
+
+
+def compare(field: str, operator: str, value) -> Q:
+    lookup = LOOKUPS.get(operator)
+    if lookup is None:
+        raise SCIMError(f"Unsupported filter operator: {operator}", scim_type="invalidFilter")
+    if value is None:
+        return Q(**{f"{field}__isnull": True})
+
+    if field == "id":
+        if lookup != "exact":
+            raise SCIMError("id only supports eq and ne", scim_type="invalidFilter")
+        try:
+            value = uuid.UUID(str(value))
+        except ValueError:
+            return Q(pk__in=[])
+    elif field == "is_active":
+        if lookup != "exact" or not isinstance(value, bool):
+            raise SCIMError("active only supports eq and ne with a boolean", scim_type="invalidFilter")
+    elif field in DATETIME_FIELDS:
+        value = parse_datetime_value(value)
+    elif not isinstance(value, str):
+        raise SCIMError(f"Expected a string, got {value!r}", scim_type="invalidFilter")
+    elif field == "email" and lookup == "exact":
+        # Stored normalized, so the match stays on the unique index.
+        value = get_user_model().objects.normalize_email(value)
+    return Q(**{f"{field}__{lookup}": value})
+
+
+def parse_filter(expression: str) -> Q:
+    """
+    Compile a SCIM filter to a ``Q`` object on the User model, raises ``SCIMError`` (invalidFilter).
+    """
+    return Parser(tokenize(expression)).parse()
@@ -0,0 +1,292 @@
+"""
+Applying SCIM operations (create, replace, patch, delete) in batches.
+
+A batch runs in one transaction with a fixed number of queries whatever its size: the creates are checked against
+existing emails with one query and inserted with ``bulk_create``, the users to update or delete are loaded with one
+``in_bulk``, updated with one ``bulk_update`` and deleted with one ``DELETE`` (plus one per table referencing users,
+which is handled as its foreign key's ``on_delete`` says: a user that protected rows refer to fails with a 409).
+Within a batch the creates run first, then the updates, then the deletes, so an operation can refer to a user created
+earlier in the same request by its ``bulkId``. Passwords are hashed before the transaction starts, in parallel on the
+password hashing pool.
+"""
+
+import uuid
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, models, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils import timezone
+
+# utils
+from django_sso.core.hashers import get_hashing_executor
+
+# model
+from django_sso.users.models import UserChange
+from django_sso.users.utils.claims import delete_claims_versions, set_claims_versions
+
+# local
+from .resources import SCIMError, parse_resource, patch_values, to_resource
+
+
+def operation_result(operation: dict, status: int, location=None, response=None) -> dict:
+    result = {"method": str(operation.get("method", "")).upper(), "status": str(status)}
+    if operation.get("bulkId"):
+        result["bulkId"] = operation["bulkId"]
+    if location:
+        result["location"] = location
+    if response is not None:
+        result["response"] = response
+    return result
+
+
+def error_result(operation: dict, error: SCIMError) -> dict:
+    return operation_result(operation, error.status, response=error.as_dict())
+
+
+def user_reference(path: str) -> str:
+    """
+    The id (or ``bulkId:...`` reference) of a ``/Users/<id>`` path.
+    """
+    prefix, _, reference = (path or "").strip("/").partition("/")
+    if prefix != "Users" or not reference or "/" in reference:
+        raise SCIMError(f"Invalid path: {path}", scim_type="invalidPath")
+    return reference
+
+
+class Batch:
+    def __init__(self, operations: list[dict], base_url: str, bulk_ids: dict, include_resources=False):
+        self.operations = operations
+        self.base_url = base_url
+        # bulkId -> id of the users created by the request, shared by its batches.
+        self.bulk_ids = bulk_ids
+        self.include_resources = include_resources
+        self.results = [None] * len(operations)
+        self.User = get_user_model()
+
+    def location(self, user) -> str:
+        return f"{self.base_url}/{user.id}"
+
+    def succeed(self, index, status, user=None):
+        response = to_resource(user, self.location(user)) if user and self.include_resources else None
+        self.results[index] = operation_result(
+            self.operations[index], status, self.location(user) if user else None, response
+        )
+
+    def fail(self, index, error: SCIMError):
+        self.results[index] = error_result(self.operations[index], error)
+
+    def apply(self) -> list[dict]:
+        creates, updates, deletes = [], [], []
+        for index, operation in enumerate(self.operations):
+            try:
+                method = str(operation.get("method", "")).upper()
+                data = operation.get("data")
+                if method == "POST":
+                    if (operation.get("path") or "").strip("/") != "Users":
+                        raise SCIMError(f"Invalid path: {operation.get('path')}", scim_type="invalidPath")
+                    password = data.get("password") if isinstance(data, dict) else None
+                    creates.append((index, parse_resource(data), password))
+                elif method in ("PUT", "PATCH"):
+                    values = parse_resource(data) if method == "PUT" else patch_values(data)
+                    updates.append((index, user_reference(operation.get("path")), values))
+                elif method == "DELETE":
+                    deletes.append((index, user_reference(operation.get("path"))))
+                else:
+                    raise SCIMError(f"Unsupported method: {method}", scim_type="invalidSyntax")
+            except SCIMError as e:
+                self.fail(index, e)
+
+        # Hashed in parallel and before the transaction, which doesn't hold its locks while argon2 runs.
+        passwords = [password for _, _, password in creates if password]
+        hashes = iter(get_hashing_executor().map("encode", make_password, passwords))
+        creates = [(index, values, next(hashes) if password else None) for index, values, password in creates]
+
+        with transaction.atomic():
+            self.create(creates)
+            users = self.load([reference for _, reference, _ in updates] + [reference for _, reference in deletes])
+            self.update(updates, users)
+            self.delete(deletes, users)
+        return self.results
+
+    def create(self, creates):
+        if not creates:
+            return
+        emails = [values["email"] for _, values, _ in creates]
+        taken = set(self.User.objects.filter(email__in=emails).values_list("email", flat=True))
+
+        new = []
+        for index, values, encoded in creates:
+            if values["email"] in taken:
+                self.fail(index, SCIMError(f"{values['email']} already exists", 409, "uniqueness"))
+                continue
+            taken.add(values["email"])
+            user = self.User(**values)
+            if encoded:
+                user.password = encoded
+            else:
+                user.set_unusable_password()
+            new.append((index, user))
+
+        try:
+            with transaction.atomic():
+                self.User.objects.bulk_create([user for _, user in new])
+        except IntegrityError:
+            # Someone else created one of the emails meanwhile, find out which one by one.
+            for position, (index, user) in enumerate(new):
+                try:
+                    with transaction.atomic():
+                        user.save(force_insert=True)
+                except IntegrityError:
+                    self.fail(index, SCIMError(f"{user.email} already exists", 409, "uniqueness"))
+                    new[position] = None
+            new = [item for item in new if item]
+
+        for index, user in new:
+            bulk_id = self.operations[index].get("bulkId")
+            if bulk_id:
+                self.bulk_ids[bulk_id] = str(user.id)
+            self.succeed(index, 201, user)
+
+    def resolve(self, reference: str) -> uuid.UUID | None:
+        if reference.startswith("bulkId:"):
+            reference = self.bulk_ids.get(reference[len("bulkId:") :], "")
+        try:
+            return uuid.UUID(reference)
+        except ValueError:
+            return None
+
+    def load(self, references) -> dict:
+        ids = {self.resolve(reference) for reference in references} - {None}
+        return self.User.objects.in_bulk(ids) if ids else {}
+
+    def update(self, updates, users: dict):
+        changed, fields, updated = {}, set(), []
+        new_emails = {values["email"] for _, _, values in updates if "email" in values}
+        owners = dict(self.User.objects.filter(email__in=new_emails).values_list("email", "id")) if new_emails else {}
+
+        for index, reference, values in updates:
+            user = users.get(self.resolve(reference))
+            if user is None:
+                self.fail(index, SCIMError(f"User {reference} not found", 404))
+                continue
+            email = values.get("email", user.email)
+            if owners.get(email, user.id) != user.id:
+                self.fail(index, SCIMError(f"{email} already exists", 409, "uniqueness"))
+                continue
+            owners.pop(user.email, None)
+            owners[email] = user.id
+
+            for field, value in values.items():
+                if getattr(user, field) != value:
+                    setattr(user, field, value)
+                    fields.add(field)
+                    changed[user.id] = user
+            updated.append((index, user))
+
+        if changed:
+            self.save(changed.values(), fields)
+        for index, user in updated:
+            self.succeed(index, 200, user)
+
+    def save(self, users, fields):
+        versions, changes = {}, []
+        now = timezone.now()
+        for user in users:
+            user.updated_at = now
+            # As User.save() does, QuerySet.bulk_update() wouldn't.
+            changed = user.changed_fields()
+            if any(field in user.CLAIM_FIELDS for field in changed):
+                user.claims_version += 1
+                versions[user.id] = user.claims_version
+            if changed:
+                changes.append(UserChange(user_id=user.id, fields=changed, is_active=user.is_active))
+            user._loaded_claims = user._claim_values()
+            user._loaded_active = user.is_active
+        self.User.objects.bulk_update(list(users), [*fields, "updated_at", "claims_version"])
+        if changes:
+            UserChange.record(changes)
+        if versions:
+            transaction.on_commit(partial(set_claims_versions, versions))
+
+    def delete(self, deletes, users: dict):
+        ids = {}
+        for index, reference in deletes:
+            user = users.get(self.resolve(reference))
+            if user is None:
+                self.fail(index, SCIMError(f"User {reference} not found", 404))
+                continue
+            ids.setdefault(user.id, []).append(index)
+        if not ids:
+            return
+
+        protected = self.protected(ids)
+        for user_id, indexes in ids.items():
+            for index in indexes:
+                if user_id in protected:
+                    self.fail(index, SCIMError(f"User {user_id} is referenced by {protected[user_id]}", 409))
+                else:
+                    self.results[index] = operation_result(self.operations[index], 204)
+        ids = ids.keys() - protected.keys()
+        if ids:
+            self.delete_users(ids)
+
+    def protected(self, ids) -> dict:
+        """
+        The users among ``ids`` that rows of a ``PROTECT`` or ``RESTRICT`` relation refer to, mapped to its model.
+        """
+        protected = {}
+        for relation in get_candidate_relations_to_delete(self.User._meta):
+            if relation.on_delete in (models.PROTECT, models.RESTRICT):
+                name = relation.field.name
+                related = relation.related_model._base_manager.filter(**{f"{name}__in": ids})
+                for user_id in related.values_list(name, flat=True).distinct():
+                    protected.setdefault(user_id, relation.related_model._meta.label)
+        return protected
+
+    def delete_users(self, ids):
+        # What the post_delete receivers of User do, for all the users at once rather than one query per user.
+        UserChange.record(
+            [UserChange(user_id=user_id, kind=UserChange.Kind.DELETED, is_active=False) for user_id in ids]
+        )
+        delete_claims_versions(ids)
+
+        # The rows referencing the users as their relation's on_delete says, then the users themselves without
+        # per-row signals.
+        for relation in get_candidate_relations_to_delete(self.User._meta):
+            field = relation.field
+            related = relation.related_model._base_manager.filter(**{f"{field.name}__in": ids})
+            if relation.on_delete == models.CASCADE:
+                related.delete()
+            elif relation.on_delete == models.SET_NULL:
+                related.update(**{field.name: None})
+            elif relation.on_delete == models.SET_DEFAULT:
+                related.update(**{field.name: field.get_default()})
+            elif relation.on_delete not in (models.DO_NOTHING, models.PROTECT, models.RESTRICT):
+                # SET(...): not used on users, and silently skipping it would leave dangling rows.
+                raise NotImplementedError(f"{relation.related_model._meta.label}.{field.name}: unsupported on_delete")
+        users = self.User.objects.filter(pk__in=ids)
+        users._raw_delete(users.db)
+
+
+def apply_operations(operations: list[dict], base_url: str, bulk_ids=None, include_resources=False) -> list[dict]:
+    """
+    Apply ``operations`` (as in a BulkRequest) in one transaction, returning their BulkResponse results in order.
+    """
+    return Batch(operations, base_url, {} if bulk_ids is None else bulk_ids, include_resources).apply()
+
+
+def apply_bulk(operations: list[dict], base_url: str, batch_size: int, fail_on_errors: int | None = None):
+    """
+    Apply a BulkRequest's operations in transactions of ``batch_size``. Once ``fail_on_errors`` operations failed
+    the remaining batches are not applied, as RFC 7644 section 3.7.3 describes.
+    """
+    results, bulk_ids, errors = [], {}, 0
+    for start in range(0, len(operations), batch_size):
+        if fail_on_errors and errors >= fail_on_errors:
+            break
+        batch_results = apply_operations(operations[start : start + batch_size], base_url, bulk_ids)
+        errors += sum(int(result["status"]) >= 400 for result in batch_results)
+        results += batch_results
+    return results
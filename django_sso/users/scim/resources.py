@@ -0,0 +1,214 @@
+"""
+SCIM 2.0 (RFC 7643) representation of users.
+
+``userName`` and the primary ``emails`` value are the user's email, ``displayName`` the username, ``name`` the
+first and last names and ``active`` is ``is_active``. Attributes the User model doesn't store (``externalId``,
+``title``, addresses...) are accepted and ignored, so identity providers can sync their full schema.
+"""
+
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+SCHEMA_USER = "urn:ietf:params:scim:schemas:core:2.0:User"
+SCHEMA_LIST_RESPONSE = "urn:ietf:params:scim:api:messages:2.0:ListResponse"
+SCHEMA_PATCH_OP = "urn:ietf:params:scim:api:messages:2.0:PatchOp"
+SCHEMA_BULK_REQUEST = "urn:ietf:params:scim:api:messages:2.0:BulkRequest"
+SCHEMA_BULK_RESPONSE = "urn:ietf:params:scim:api:messages:2.0:BulkResponse"
+SCHEMA_ERROR = "urn:ietf:params:scim:api:messages:2.0:Error"
+SCHEMA_SERVICE_PROVIDER_CONFIG = "urn:ietf:params:scim:schemas:core:2.0:ServiceProviderConfig"
+
+# Columns needed to render a resource.
+RESOURCE_FIELDS = ("id", "email", "username", "first_name", "last_name", "is_active", "date_joined", "updated_at")
+
+# Lowercased attribute paths to the model fields they are stored in.
+ATTRIBUTE_FIELDS = {
+    "id": "id",
+    "username": "email",
+    "emails": "email",
+    "emails.value": "email",
+    "displayname": "username",
+    "name.givenname": "first_name",
+    "name.familyname": "last_name",
+    "active": "is_active",
+    "meta.created": "date_joined",
+    "meta.lastmodified": "updated_at",
+}
+
+# Field values of the attributes a PUT leaves out.
+REPLACE_DEFAULTS = {"username": None, "first_name": "", "last_name": "", "is_active": True}
+
+re_filter = re.compile(r"\[[^\]]*\]")
+
+
+class SCIMError(Exception):
+    def __init__(self, detail: str, status: int = 400, scim_type: str | None = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+        self.scim_type = scim_type
+
+    def as_dict(self) -> dict:
+        error = {"schemas": [SCHEMA_ERROR], "status": str(self.status), "detail": self.detail}
+        if self.scim_type:
+            error["scimType"] = self.scim_type
+        return error
+
+
+def attribute_path(path: str) -> str:
+    """
+    Normalize an attribute path: lowercased, without the core schema URN nor value filters.
+    """
+    path = re_filter.sub("", path.strip().lower())
+    prefix = SCHEMA_USER.lower() + ":"
+    return path[len(prefix) :] if path.startswith(prefix) else path
+
+
+def parse_datetime_value(value) -> object:
+    """
+    Parse a datetime attribute value as stored (naive unless ``USE_TZ``), raises ``SCIMError``.
+    """
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise SCIMError(f"Invalid datetime: {value}", scim_type="invalidValue")
+    if not settings.USE_TZ and timezone.is_aware(parsed):
+        parsed = timezone.make_naive(parsed)
+    return parsed
+
+
+def to_resource(user, location: str) -> dict:
+    resource = {
+        "schemas": [SCHEMA_USER],
+        "id": str(user.id),
+        "userName": user.email,
+        "name": {"givenName": user.first_name, "familyName": user.last_name},
+        "emails": [{"value": user.email, "type": "work", "primary": True}],
+        "active": user.is_active,
+        "meta": {
+            "resourceType": "User",
+            "created": user.date_joined.isoformat(),
+            "lastModified": user.updated_at.isoformat(),
+            "location": location,
+        },
+    }
+    if user.username:
+        resource["displayName"] = user.username
+    return resource
+
+
+def _boolean(value) -> bool:
+    # Some providers send booleans as strings.
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    if not isinstance(value, bool):
+        raise SCIMError(f"Expected a boolean, got {value!r}", scim_type="invalidValue")
+    return value
+
+
+def _string(field: str, value, required=False) -> str:
+    if value is None and not required:
+        return ""
+    if not isinstance(value, str):
+        raise SCIMError(f"Expected a string, got {value!r}", scim_type="invalidValue")
+    max_length = get_user_model()._meta.get_field(field).max_length
+    if len(value) > max_length:
+        raise SCIMError(f"Longer than {max_length} characters: {value[:32]}...", scim_type="invalidValue")
+    return value
+
+
+def _email(value) -> str:
+    if isinstance(value, list):
+        # The primary email, or the first one.
+        emails = [item for item in value if isinstance(item, dict)]
+        primary = next((item for item in emails if item.get("primary")), emails[0] if emails else {})
+        value = primary.get("value")
+    elif isinstance(value, dict):
+        value = value.get("value")
+    email = get_user_model().objects.normalize_email(_string("email", value, required=True).strip())
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise SCIMError(f"Invalid email: {email}", scim_type="invalidValue")
+    return email
+
+
+def set_attribute(values: dict, path: str, value):
+    """
+    Set the model field of the attribute at ``path`` in ``values``. Unsupported attributes are ignored.
+    """
+    path = attribute_path(path)
+    if path == "name" or (path == "" and isinstance(value, dict)):
+        if not isinstance(value, dict):
+            raise SCIMError("Expected a complex value for name", scim_type="invalidValue")
+        prefix = "name." if path == "name" else ""
+        for key, item in value.items():
+            set_attribute(values, prefix + key, item)
+        return
+
+    field = ATTRIBUTE_FIELDS.get(path)
+    if field == "email":
+        values["email"] = _email(value)
+    elif field == "username":
+        values["username"] = _string("username", value) or None
+    elif field in ("first_name", "last_name"):
+        values[field] = _string(field, value)
+    elif field == "is_active":
+        values["is_active"] = _boolean(value)
+
+
+def parse_resource(data, replace=True) -> dict:
+    """
+    The model field values of a User resource. With ``replace`` (POST, PUT) the attributes left out get their
+    defaults, as a PUT replaces the whole resource.
+    """
+    if not isinstance(data, dict):
+        raise SCIMError("Expected a User resource", scim_type="invalidSyntax")
+    if not (data.get("userName") or data.get("emails")):
+        raise SCIMError("userName is required", scim_type="invalidValue")
+
+    values = dict(REPLACE_DEFAULTS) if replace else {}
+    for key, value in data.items():
+        if key.lower() not in ("schemas", "id", "meta", "password"):
+            set_attribute(values, key, value)
+    if data.get("userName"):
+        # userName wins over emails.
+        values["email"] = _email(data["userName"])
+    return values
+
+
+def patch_values(data) -> dict:
+    """
+    The model field values a PatchOp request sets.
+
+    All the stored attributes are single-valued, so the result doesn't depend on the current values: ``add`` and
+    ``replace`` set them, ``remove`` clears them.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("Operations"), list):
+        raise SCIMError("Expected a PatchOp request", scim_type="invalidSyntax")
+
+    values = {}
+    for operation in data["Operations"]:
+        if not isinstance(operation, dict):
+            raise SCIMError("Expected a patch operation", scim_type="invalidSyntax")
+        op = str(operation.get("op", "")).lower()
+        path = operation.get("path") or ""
+        if op in ("add", "replace"):
+            if not path and not isinstance(operation.get("value"), dict):
+                raise SCIMError("A patch operation without path takes a complex value", scim_type="invalidValue")
+            set_attribute(values, path, operation.get("value"))
+        elif op == "remove":
+            field = ATTRIBUTE_FIELDS.get(attribute_path(path))
+            if not path:
+                raise SCIMError("remove requires a path", scim_type="noTarget")
+            if field in ("email", "is_active", "id"):
+                raise SCIMError(f"{path} can't be removed", scim_type="mutability")
+            if field in REPLACE_DEFAULTS:
+                values[field] = REPLACE_DEFAULTS[field]
+        else:
+            raise SCIMError(f"Unsupported patch operation: {op}", scim_type="invalidSyntax")
+    return values
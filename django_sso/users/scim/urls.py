@@ -0,0 +1,12 @@
+from django.urls import path
+
+from .views import BulkView, ServiceProviderConfigView, UsersView, UserView
+
+app_name = "accounts"
+
+urlpatterns = [
+    path("Users", UsersView.as_view(), name="users"),
+    path("Users/<str:user_id>", UserView.as_view(), name="user"),
+    path("Bulk", BulkView.as_view(), name="bulk"),
+    path("ServiceProviderConfig", ServiceProviderConfigView.as_view(), name="service_provider_config"),
+]
@@ -0,0 +1,211 @@
+import base64
+import binascii
+import uuid
+
+import orjson
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+
+# local
+from django_sso.core.http import FastJsonResponse
+from django_sso.core.views import JSONView
+
+# utils
+from django_sso.users.utils.client_auth import authenticate_client
+
+from .filters import parse_filter
+from .provisioning import apply_bulk, apply_operations
+from .resources import (
+    RESOURCE_FIELDS,
+    SCHEMA_BULK_RESPONSE,
+    SCHEMA_LIST_RESPONSE,
+    SCHEMA_SERVICE_PROVIDER_CONFIG,
+    SCIMError,
+    to_resource,
+)
+
+User = get_user_model()
+
+SCIM_CONTENT_TYPE = "application/scim+json"
+
+
+def scim_response(data, status=200, **kwargs):
+    return FastJsonResponse(data, status=status, content_type=SCIM_CONTENT_TYPE, **kwargs)
+
+
+def encode_cursor(user_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(user_id.bytes).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(bytes=base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise SCIMError(f"Invalid cursor: {cursor}", scim_type="invalidCursor")
+
+
+class SCIMView(JSONView):
+    """
+    Base class of the SCIM endpoints: authenticated with the HTTP Basic credentials of an application allowed the
+    ``scim`` scope, errors rendered as SCIM error responses.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        client = authenticate_client(request)
+        if client is None:
+            response = scim_response(SCIMError("Invalid client credentials", 401).as_dict(), status=401)
+            response["WWW-Authenticate"] = 'Basic realm="SCIM"'
+            return response
+        if "scim" not in client.get_allowed_scopes():
+            return scim_response(SCIMError("The client is not allowed the scim scope", 403).as_dict(), status=403)
+
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except SCIMError as e:
+            return scim_response(e.as_dict(), status=e.status)
+
+    def users_url(self) -> str:
+        return self.request.build_absolute_uri(reverse("accounts:scim:users"))
+
+    def operation_response(self, result: dict):
+        status = int(result["status"])
+        if status == 204:
+            response = HttpResponse(status=204)
+        else:
+            response = scim_response(result["response"], status=status)
+        if result.get("location"):
+            response["Location"] = result["location"]
+        return response
+
+
+def parse_int(value, default: int) -> int:
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise SCIMError(f"Expected an integer, got {value!r}", scim_type="invalidValue")
+
+
+class UsersView(SCIMView):
+    def get(self, request):
+        """
+        List users. With a ``cursor`` parameter (empty for the first page) pages are keyset paginated on the primary
+        key and link with ``nextCursor`` (RFC 9865), otherwise ``startIndex`` pagination applies.
+        """
+        queryset = User.objects.only(*RESOURCE_FIELDS).order_by("id")
+        if request.GET.get("filter"):
+            queryset = queryset.filter(parse_filter(request.GET["filter"]))
+        count = min(
+            max(parse_int(request.GET.get("count"), settings.SCIM_DEFAULT_COUNT), 0), settings.SCIM_MAX_RESULTS
+        )
+
+        body = {"schemas": [SCHEMA_LIST_RESPONSE]}
+        if "cursor" in request.GET:
+            cursor = request.GET["cursor"]
+            page = queryset.filter(id__gt=decode_cursor(cursor)) if cursor else queryset
+            users = list(page[: count + 1])
+            if len(users) > count:
+                users = users[:count]
+                body["nextCursor"] = encode_cursor(users[-1].id)
+            if not cursor:
+                # Counted once, on the first page.
+                body["totalResults"] = queryset.count()
+        else:
+            start_index = max(parse_int(request.GET.get("startIndex"), 1), 1)
+            body["totalResults"] = queryset.count()
+            body["startIndex"] = start_index
+            users = list(queryset[start_index - 1 : start_index - 1 + count])
+
+        users_url = self.users_url()
+        body["itemsPerPage"] = len(users)
+        body["Resources"] = [to_resource(user, f"{users_url}/{user.id}") for user in users]
+        return scim_response(body)
+
+    def post(self, request):
+        operation = {"method": "POST", "path": "/Users", "data": self.data}
+        [result] = apply_operations([operation], self.users_url(), include_resources=True)
+        return self.operation_response(result)
+
+
+class UserView(SCIMView):
+    def get(self, request, user_id):
+        try:
+            user = User.objects.only(*RESOURCE_FIELDS).filter(id=uuid.UUID(user_id)).first()
+        except ValueError:
+            user = None
+        if user is None:
+            raise SCIMError(f"User {user_id} not found", 404)
+        return scim_response(to_resource(user, f"{self.users_url()}/{user.id}"))
+
+    def apply(self, method: str, user_id: str):
+        operation = {"method": method, "path": f"/Users/{user_id}", "data": self.data}
+        [result] = apply_operations([operation], self.users_url(), include_resources=True)
+        return self.operation_response(result)
+
+    def put(self, request, user_id):
+        return self.apply("PUT", user_id)
+
+    def patch(self, request, user_id):
+        return self.apply("PATCH", user_id)
+
+    def delete(self, request, user_id):
+        return self.apply("DELETE", user_id)
+
+
+# Each batch commits on its own, rather than the request holding its locks until the last one.
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class BulkView(SCIMView):
+    # The body is read here, under its own size limit rather than DATA_UPLOAD_MAX_MEMORY_SIZE.
+    body_methods = ()
+
+    def post(self, request):
+        body = request.read(settings.SCIM_BULK_MAX_PAYLOAD_SIZE + 1)
+        if len(body) > settings.SCIM_BULK_MAX_PAYLOAD_SIZE:
+            raise SCIMError(f"Payload larger than {settings.SCIM_BULK_MAX_PAYLOAD_SIZE} bytes", 413, "tooLarge")
+        try:
+            data = orjson.loads(body)
+        except orjson.JSONDecodeError as e:
+            raise SCIMError(f"JSON parse error - {e}", scim_type="invalidSyntax")
+
+        operations = data.get("Operations") if isinstance(data, dict) else None
+        if not isinstance(operations, list) or not all(isinstance(operation, dict) for operation in operations):
+            raise SCIMError("Expected a BulkRequest", scim_type="invalidSyntax")
+        if len(operations) > settings.SCIM_BULK_MAX_OPERATIONS:
+            raise SCIMError(f"More than {settings.SCIM_BULK_MAX_OPERATIONS} operations", 413, "tooMany")
+
+        fail_on_errors = parse_int(data.get("failOnErrors"), 0) or None
+        results = apply_bulk(operations, self.users_url(), settings.SCIM_BULK_BATCH_SIZE, fail_on_errors)
+        return scim_response({"schemas": [SCHEMA_BULK_RESPONSE], "Operations": results})
+
+
+class ServiceProviderConfigView(SCIMView):
+    def get(self, request):
+        return scim_response(
+            {
+                "schemas": [SCHEMA_SERVICE_PROVIDER_CONFIG],
+                "patch": {"supported": True},
+                "bulk": {
+                    "supported": True,
+                    "maxOperations": settings.SCIM_BULK_MAX_OPERATIONS,
+                    "maxPayloadSize": settings.SCIM_BULK_MAX_PAYLOAD_SIZE,
+                },
+                "filter": {"supported": True, "maxResults": settings.SCIM_MAX_RESULTS},
+                "changePassword": {"supported": False},
+                "sort": {"supported": False},
+                "etag": {"supported": False},
+                "pagination": {"cursor": True, "index": True, "defaultPaginationMethod": "cursor"},
+                "authenticationSchemes": [
+                    {
+                        "type": "httpbasic",
+                        "name": "HTTP Basic",
+                        "description": "client_id and client_secret of an application allowed the scim scope",
+                        "primary": True,
+                    }
+                ],
+            }
+        )
@@ -0,0 +1,38 @@
+from django.contrib.auth.signals import user_logged_in, user_login_failed
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+# local
+from django_sso.users.models import AuditEvent, User, UserChange
+from django_sso.users.utils import activity, audit
+from django_sso.users.utils.claims import delete_claims_version
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user_claims(sender, instance, **kwargs):
+    delete_claims_version(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def record_deleted_user(sender, instance, **kwargs):
+    UserChange.record([UserChange(user_id=instance.pk, kind=UserChange.Kind.DELETED, is_active=False)])
+
+
+# Replaced by record_last_login, which doesn't UPDATE the user on every login.
+user_logged_in.disconnect(dispatch_uid="update_last_login")
+
+
+@receiver(user_logged_in)
+def record_last_login(sender, request, user, **kwargs):
+    activity.touch_user(user)
+
+
+@receiver(user_logged_in)
+def audit_login(sender, request, user, **kwargs):
+    audit.record(AuditEvent.Event.LOGIN, request, user_id=user.pk)
+
+
+@receiver(user_login_failed)
+def audit_login_failed(sender, credentials, request=None, **kwargs):
+    username = credentials.get("username") or credentials.get(User.USERNAME_FIELD, "")
+    audit.record(AuditEvent.Event.LOGIN_FAILED, request, username=username)
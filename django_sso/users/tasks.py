@@ -1,18 +1,98 @@
+import time
+
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.utils.html import strip_tags
+from django.core.cache import cache
 
 from config import celery_app
+from django_sso.core.redis import get_client
+from django_sso.users.utils import activity, audit, changes, outbox
+
+
+@celery_app.task(ignore_result=True)
+def dispatch_outbox():
+    """
+    Dispatch outbox messages in batches until none is available.
+    """
+    # Messages published from now on schedule another dispatch.
+    cache.delete(outbox.DISPATCH_SCHEDULED_KEY)
+
+    deadline = time.monotonic() + settings.CELERY_TASK_SOFT_TIME_LIMIT / 2
+    while time.monotonic() < deadline:
+        if outbox.dispatch() < settings.OUTBOX_BATCH_SIZE:
+            return
+
+    # Out of time with messages left, continue in a fresh task.
+    dispatch_outbox.delay()
+
+
+@celery_app.task(ignore_result=True)
+def sequence_user_changes():
+    """
+    Sequence the user changes whose transaction committed without running ``publish_changes`` (the process died).
+    """
+    changes.publish_changes()
+
+
+@celery_app.task(ignore_result=True)
+def prune_user_changes():
+    """
+    Delete the user change feed entries older than ``USER_CHANGES_RETENTION``, in batches.
+    """
+    deadline = time.monotonic() + settings.CELERY_TASK_SOFT_TIME_LIMIT / 2
+    while time.monotonic() < deadline:
+        if changes.prune(settings.USER_CHANGES_PRUNE_BATCH_SIZE) < settings.USER_CHANGES_PRUNE_BATCH_SIZE:
+            return
+
+    prune_user_changes.delay()
+
+
+@celery_app.task(ignore_result=True)
+def flush_audit_events():
+    """
+    Write the audit events queued in Redis, in bulk inserts of ``AUDIT_FLUSH_SIZE``.
+    """
+    client = get_client()
+    if client is None:
+        return
+
+    # Events queued from now on schedule another flush.
+    cache.delete(audit.FLUSH_SCHEDULED_KEY)
+
+    deadline = time.monotonic() + settings.CELERY_TASK_SOFT_TIME_LIMIT / 2
+    while time.monotonic() < deadline:
+        entries = audit.pop(client, settings.AUDIT_FLUSH_SIZE)
+        if not entries:
+            return
+        try:
+            audit.write(entries)
+        except Exception:
+            audit.push_back(client, entries)
+            raise
+
+    flush_audit_events.delay()
+
+
+@celery_app.task(ignore_result=True)
+def maintain_audit_log():
+    """
+    Create the upcoming audit log partitions and drop the expired ones.
+    """
+    audit.maintain()
+
 
+@celery_app.task(ignore_result=True)
+def flush_activity():
+    """
+    Write the activity timestamps coalesced since the last flush.
+    """
+    client = get_client()
+    if client is None:
+        activity.flush_pending()
+        return
 
-@celery_app.task()
-def send_email(subject, html_content, to):
+    pending = activity.pop(client)
     try:
-        text_content = strip_tags(html_content)
-        email = EmailMultiAlternatives(subject, text_content, settings.EMAIL_HOST_USER, [to])
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-        return True
-    except Exception as e:
-        print(e)
-        return False
+        activity.write(pending)
+    except Exception:
+        activity.push_back(client, pending)
+        raise
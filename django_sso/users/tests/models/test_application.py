@@ -1,6 +1,7 @@
 from unittest.mock import patch
 
-from django.contrib.auth.hashers import check_password
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.db import IntegrityError
 
 # django
@@ -8,6 +9,7 @@ from django.test import TestCase
 
 # local
 from django_sso.users.models import Application
+from django_sso.users.utils.client_secret import PREFIX, check_client_secret
 
 
 class ApplicationModelTest(TestCase):
@@ -27,7 +29,28 @@ class ApplicationModelTest(TestCase):
     def test_client_secret_is_hashed(self):
         app = Application.objects.create(**self.app_data)
         raw_secret = app._raw_client_secret  # Saved during `save()`
-        self.assertTrue(check_password(raw_secret, app.client_secret))
+        self.assertTrue(app.client_secret.startswith(PREFIX))
+        self.assertTrue(check_client_secret(raw_secret, app.client_secret))
+        self.assertFalse(check_client_secret(raw_secret + "x", app.client_secret))
+
+    def test_client_secret_depends_on_pepper(self):
+        app = Application.objects.create(**self.app_data)
+        with self.settings(SSO={**settings.SSO, "CLIENT_SECRET_PEPPER": "another-pepper"}):
+            self.assertFalse(app.check_client_secret(app._raw_client_secret))
+
+    def test_legacy_client_secret_is_migrated(self):
+        app = Application.objects.create(**self.app_data)
+        raw_secret = app._raw_client_secret
+        Application.objects.filter(pk=app.pk).update(client_secret=make_password(raw_secret, hasher="argon2"))
+        app.refresh_from_db()
+
+        self.assertFalse(app.check_client_secret("wrong"))
+        self.assertTrue(app.client_secret.startswith("argon2$"))
+
+        self.assertTrue(app.check_client_secret(raw_secret))
+        app.refresh_from_db()
+        self.assertTrue(app.client_secret.startswith(PREFIX))
+        self.assertTrue(app.check_client_secret(raw_secret))
 
     def test_get_redirect_uris_parsing(self):
         app = Application.objects.create(**self.app_data)
@@ -29,3 +29,10 @@ class UserModelTests(TestCase):
         # Try to create a user with the same email, which should raise an IntegrityError
         with self.assertRaises(Exception):  # IntegrityError, handled by Django's default DB backends
             User.objects.create_user(email="unique@example.com", username="user2", password="anotherpassword")
+
+    def test_ids_are_time_ordered(self):
+        users = [User.objects.create_user(email=f"user{n}@example.com", password="securepassword") for n in range(5)]
+
+        # UUIDv7 ids increase with creation time
+        self.assertTrue(all(user.id.version == 7 for user in users))
+        self.assertEqual(sorted(user.id for user in users), [user.id for user in users])
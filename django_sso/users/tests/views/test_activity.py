@@ -0,0 +1,170 @@
+import re
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from redis.exceptions import ConnectionError
+
+# local
+from django_sso.users.models import Application, RefreshTokenUsage, User
+from django_sso.users.tasks import flush_activity
+from django_sso.users.utils import activity, outbox
+from django_sso.users.utils.auth import create_and_cache_auth_code
+
+
+class HashClient:
+    """
+    The Redis hash commands the activity timestamps use, in memory.
+    """
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field.encode()] = value.encode()
+
+    def hsetnx(self, key, field, value):
+        self.hashes.setdefault(key, {}).setdefault(field.encode(), value.encode())
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def pipeline(self):
+        return Pipeline(self)
+
+
+class Pipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((getattr(self.client, name), args))
+
+    def execute(self):
+        return [command(*args) for command, args in self.commands]
+
+
+@override_settings(ACTIVITY_MAX_STALENESS=3600)
+class ActivityTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for timestamps in activity._pending.values():
+            timestamps.clear()
+        self.user = User.objects.create_user(email="user@example.com", password="password")
+        self.app = Application.objects.create(name="RP", redirect_uris="https://example.com/cb")
+
+    def exchange_code(self):
+        code = create_and_cache_auth_code(self.user, self.app, "https://example.com/cb", ["email"])
+        response = self.client.post(
+            reverse("accounts:api:token"),
+            {
+                "client_id": self.app.client_id,
+                "client_secret": self.app._raw_client_secret,
+                "code": code,
+                "redirect_uri": "https://example.com/cb",
+                "grant_type": "authorization_code",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["refresh_token"]
+
+    def test_login_is_written_behind(self):
+        response = self.client.post(
+            reverse("accounts:web:login"), {"username": "user@example.com", "password": "password"}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+        self.assertEqual(activity.flush_pending(), 1)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    @override_settings(ACTIVITY_MAX_STALENESS=0)
+    def test_flushed_once_stale(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("accounts:web:login"), {"username": "user@example.com", "password": "password"})
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_password_reset_link_survives_the_login_flush(self):
+        self.client.post(reverse("accounts:web:password_reset"), {"email": "user@example.com"})
+        outbox.dispatch()
+        link = re.search(r"/users/reset/\S+/\S+/", mail.outbox[0].body).group()
+
+        self.client.post(reverse("accounts:web:login"), {"username": "user@example.com", "password": "password"})
+        activity.flush_pending()
+        self.client.logout()
+        response = self.client.get(link)
+        self.assertEqual(response.status_code, 302)
+
+        response = self.client.post(
+            response.url, {"new_password1": "a-New-passw0rd", "new_password2": "a-New-passw0rd"}
+        )
+        self.assertEqual(response.status_code, 302)
+        # Used once.
+        self.assertFalse(self.client.get(link, follow=True).context["validlink"])
+
+    def test_token_usage(self):
+        refresh_token = self.exchange_code()
+        activity.flush_pending()
+        self.app.refresh_from_db()
+        usage = RefreshTokenUsage.objects.get(user=self.user, application=self.app)
+        self.assertEqual(usage.last_used_at, self.app.last_used_at)
+
+        response = self.client.post(reverse("accounts:api:token_refresh"), {"refresh_token": refresh_token})
+        self.assertEqual(response.status_code, 200)
+        activity.flush_pending()
+        usage.refresh_from_db()
+        self.assertGreater(usage.last_used_at, self.app.last_used_at)
+        self.assertEqual(RefreshTokenUsage.objects.count(), 1)
+
+        # Dropped with the user.
+        self.user.delete()
+        self.assertFalse(RefreshTokenUsage.objects.exists())
+
+    @override_settings(ACTIVITY_BATCH_SIZE=2)
+    def test_coalesced_in_batches(self):
+        users = [self.user, *(User.objects.create_user(email=f"user{i}@example.com") for i in range(2))]
+        for user in users * 3:
+            activity.touch_user(user)
+
+        # Two UPDATEs, within a savepoint.
+        with self.assertNumQueries(4):
+            self.assertEqual(activity.flush_pending(), 3)
+        self.assertEqual(User.objects.filter(last_login__isnull=False).count(), 3)
+
+    def test_redis(self):
+        client = HashClient()
+        with mock.patch("django_sso.users.utils.activity.get_client", return_value=client):
+            self.exchange_code()
+            self.exchange_code()
+        self.assertEqual(
+            {key: len(fields) for key, fields in client.hashes.items()},
+            {"activity:clients": 1, "activity:grants": 1},
+        )
+        self.assertIsNone(Application.objects.get(pk=self.app.pk).last_used_at)
+
+        with mock.patch("django_sso.users.tasks.get_client", return_value=client):
+            flush_activity()
+        self.assertEqual(client.hashes, {})
+        self.assertIsNotNone(Application.objects.get(pk=self.app.pk).last_used_at)
+        self.assertTrue(RefreshTokenUsage.objects.filter(user=self.user, application=self.app).exists())
+
+    def test_redis_failure_falls_back_to_the_process(self):
+        client = mock.Mock()
+        client.hset.side_effect = client.rpush.side_effect = ConnectionError("Connection refused")
+        with mock.patch("django_sso.users.utils.activity.get_client", return_value=client), mock.patch(
+            "django_sso.users.utils.audit.get_client", return_value=client
+        ), self.assertLogs("django_sso.users.utils.activity", "WARNING"):
+            self.exchange_code()
+
+        self.assertEqual(activity.flush_pending(), 2)
+        self.assertIsNotNone(Application.objects.get(pk=self.app.pk).last_used_at)
+        self.assertTrue(RefreshTokenUsage.objects.filter(user=self.user, application=self.app).exists())
@@ -0,0 +1,116 @@
+import copy
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+# local
+from django_sso.core.admission import AdmissionController, get_admission_controller
+
+
+def admission_config(max_in_flight=4, reserved=1, limit=8, max_limit=16):
+    config = copy.deepcopy(settings.ADMISSION_CONTROL)
+    config.update(MAX_IN_FLIGHT=max_in_flight, RESERVED=reserved)
+    for route_class in config["ROUTE_CLASSES"].values():
+        route_class.update(limit=limit, min_limit=1, max_limit=max_limit)
+    return config
+
+
+class AdmissionControllerTest(TestCase):
+    def setUp(self):
+        self.controller = AdmissionController(admission_config(max_in_flight=3, reserved=1))
+        self.classes = {route_class.name: route_class for route_class in self.controller.route_classes}
+
+    def test_classify(self):
+        self.assertEqual(self.controller.classify(reverse("accounts:api:token_refresh")).name, "refresh")
+        self.assertEqual(self.controller.classify(reverse("accounts:api:token")).name, "token")
+        self.assertEqual(self.controller.classify(reverse("oidc_discovery")).name, "static")
+        self.assertEqual(self.controller.classify(reverse("accounts:web:login")).name, "authorize")
+        self.assertEqual(self.controller.classify(reverse("accounts:api:changes")).name, "changes")
+        self.assertIsNone(self.controller.classify(reverse("health_check")))
+
+    def test_refresh_is_prioritized_over_logins(self):
+        authorize, refresh = self.classes["authorize"], self.classes["refresh"]
+        self.assertIsNone(self.controller.acquire(authorize))
+        self.assertIsNone(self.controller.acquire(self.classes["token"]))
+        # The last slot is reserved for high priority classes.
+        self.assertEqual(self.controller.acquire(authorize), "priority")
+        self.assertIsNone(self.controller.acquire(refresh))
+        self.assertEqual(self.controller.acquire(refresh), "capacity")
+
+        self.controller.release(authorize, 0.01)
+        self.assertIsNone(self.controller.acquire(authorize))
+
+    def test_change_feed_waiters_of_every_application_are_served(self):
+        controller = AdmissionController(settings.ADMISSION_CONTROL)
+        changes = controller.classify(reverse("accounts:api:changes"))
+        waiters = settings.ADMISSION_CONTROL["MAX_IN_FLIGHT"] - settings.ADMISSION_CONTROL["RESERVED"]
+        for _ in range(waiters):
+            self.assertIsNone(controller.acquire(changes))
+        self.assertEqual(controller.acquire(changes), "limit")
+        # Token refreshes still get the reserved slot.
+        self.assertIsNone(controller.acquire(controller.classify(reverse("accounts:api:token_refresh"))))
+
+        # Waiting the longest allowed is not a slow request, the limit holds.
+        for _ in range(waiters):
+            controller.release(changes, settings.USER_CHANGES_MAX_WAIT + settings.USER_CHANGES_POLL_INTERVAL)
+        self.assertEqual(changes.limit, waiters)
+
+    def test_limit_adapts_to_latency(self):
+        userinfo = self.classes["userinfo"]
+        for _ in range(10):
+            self.controller.acquire(userinfo)
+            self.controller.release(userinfo, userinfo.target_latency * 10)
+        self.assertAlmostEqual(userinfo.limit, 8 * 0.9**10)
+
+        for _ in range(100):
+            self.controller.acquire(userinfo)
+            self.controller.release(userinfo, userinfo.target_latency * 10)
+        self.assertEqual(userinfo.limit, 1)
+        self.assertEqual(self.controller.acquire(userinfo), None)
+        self.assertEqual(self.controller.acquire(userinfo), "limit")
+        self.controller.release(userinfo, 0)
+
+        # Fast requests grow the limit back, but only as far as it is used.
+        for _ in range(50):
+            self.controller.acquire(userinfo)
+            self.controller.release(userinfo, 0)
+        self.assertEqual(userinfo.limit, 2.5)
+
+        for _ in range(50):
+            while self.controller.acquire(userinfo) is None:
+                pass
+            for _ in range(userinfo.in_flight):
+                self.controller.release(userinfo, 0)
+        self.assertGreaterEqual(userinfo.limit, 6)
+
+
+@override_settings(ADMISSION_CONTROL=admission_config(limit=1, max_limit=1))
+class AdmissionControlMiddlewareTest(TestCase):
+    def test_excess_load_is_shed(self):
+        controller = get_admission_controller()
+        static = controller.classify(reverse("accounts:api:jwks"))
+        self.assertEqual(self.client.get(reverse("accounts:api:jwks")).status_code, 200)
+
+        controller.acquire(static)
+        try:
+            response = self.client.get(reverse("accounts:api:jwks"))
+        finally:
+            controller.release(static, 0)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(response.json()["error"], "temporarily_unavailable")
+
+        # Other route classes are unaffected.
+        controller.acquire(static)
+        try:
+            self.assertEqual(self.client.get(reverse("oidc_discovery")).status_code, 503)
+            self.assertEqual(self.client.get(reverse("accounts:api:userinfo")).status_code, 401)
+        finally:
+            controller.release(static, 0)
+
+    def test_metrics(self):
+        self.client.get(reverse("accounts:api:jwks"))
+        content = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('admission_limit{route_class="static"} 1', content)
+        self.assertIn('admission_request_seconds_count{route_class="static"}', content)
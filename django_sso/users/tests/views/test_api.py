@@ -0,0 +1,206 @@
+import json
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+# local
+from django_sso.users.models import Application, User
+from django_sso.users.utils.auth import create_and_cache_auth_code
+
+
+class TokenFlowTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="user@example.com", username="user", password="securepassword")
+        self.client_app = Application.objects.create(
+            name="Test App",
+            redirect_uris="https://example.com/callback",
+            allowed_scopes="openid email profile",
+        )
+        self.client_secret = self.client_app._raw_client_secret
+
+    def _token_request(self, **overrides):
+        code = create_and_cache_auth_code(
+            self.user, self.client_app, "https://example.com/callback", ["openid", "email"], nonce="n-0S6"
+        )
+        data = {
+            "client_id": self.client_app.client_id,
+            "client_secret": self.client_secret,
+            "code": code,
+            "redirect_uri": "https://example.com/callback",
+            "grant_type": "authorization_code",
+        }
+        data.update(overrides)
+        return data
+
+    def test_code_exchange_and_userinfo(self):
+        response = self.client.post(reverse("accounts:api:token"), self._token_request())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        body = response.json()
+        self.assertEqual(body["token_type"], "bearer")
+        self.assertIn("refresh_token", body)
+
+        id_token = jwt.decode(
+            body["id_token"], settings.SSO["JWT_SECRET_KEY"], algorithms=["HS256"], audience=self.client_app.client_id
+        )
+        self.assertEqual(id_token["sub"], str(self.user.id))
+        self.assertEqual(id_token["nonce"], "n-0S6")
+
+        response = self.client.get(
+            reverse("accounts:api:userinfo"), HTTP_AUTHORIZATION=f"Bearer {body['access_token']}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), {"sub": str(self.user.id), "email": "user@example.com", "email_verified": False}
+        )
+
+    def test_json_body_is_accepted(self):
+        response = self.client.post(
+            reverse("accounts:api:token"), self._token_request(), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_code_cannot_be_reused(self):
+        data = self._token_request()
+        self.assertEqual(self.client.post(reverse("accounts:api:token"), data).status_code, 200)
+
+        response = self.client.post(reverse("accounts:api:token"), data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "invalid_grant", "error_description": "Code already used"})
+
+    def test_invalid_client_secret(self):
+        response = self.client.post(reverse("accounts:api:token"), self._token_request(client_secret="wrong"))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "invalid_client"})
+
+    def test_missing_fields(self):
+        response = self.client.post(reverse("accounts:api:token"), {"client_id": "abc"})
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual(body["error"], "invalid_request")
+        self.assertEqual(body["error_description"]["code"], ["This field is required."])
+
+    def test_malformed_json(self):
+        response = self.client.post(reverse("accounts:api:token"), "{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()["detail"].startswith("JSON parse error"))
+
+    def test_unsupported_media_type(self):
+        response = self.client.post(reverse("accounts:api:token"), "code=abc", content_type="text/plain")
+        self.assertEqual(response.status_code, 415)
+
+    def test_method_not_allowed(self):
+        response = self.client.get(reverse("accounts:api:token"))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response.json(), {"detail": 'Method "GET" not allowed.'})
+        self.assertIn("POST", response["Allow"])
+
+    def test_userinfo_requires_token(self):
+        response = self.client.get(reverse("accounts:api:userinfo"))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"error": "missing_token"})
+
+    def test_refresh_token(self):
+        body = self.client.post(reverse("accounts:api:token"), self._token_request()).json()
+        response = self.client.post(reverse("accounts:api:token"), {"refresh_token": body["refresh_token"]})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse("accounts:api:token_refresh"), {"refresh_token": body["refresh_token"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()["refresh_token"], body["refresh_token"])
+
+    def test_logout_revokes_access_token(self):
+        body = self.client.post(reverse("accounts:api:token"), self._token_request()).json()
+        auth = f"Bearer {body['access_token']}"
+
+        response = self.client.post(reverse("accounts:api:logout"), HTTP_AUTHORIZATION=auth)
+        self.assertEqual(response.status_code, 204)
+
+        response = self.client.get(reverse("accounts:api:userinfo"), HTTP_AUTHORIZATION=auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"error": "token_revoked"})
+
+
+class IdTokenClaimsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com", username="user", first_name="Ada", password="securepassword"
+        )
+        self.client_app = Application.objects.create(
+            name="Test App",
+            redirect_uris="https://example.com/callback",
+            allowed_scopes="openid email profile",
+            id_token_claims="email email_verified",
+        )
+
+    def _id_token(self, scopes, claims=None):
+        code = create_and_cache_auth_code(
+            self.user, self.client_app, "https://example.com/callback", scopes, nonce="n", claims=claims
+        )
+        response = self.client.post(
+            reverse("accounts:api:token"),
+            {
+                "client_id": self.client_app.client_id,
+                "client_secret": self.client_app._raw_client_secret,
+                "code": code,
+                "redirect_uri": "https://example.com/callback",
+                "grant_type": "authorization_code",
+            },
+        )
+        return jwt.decode(
+            response.json()["id_token"],
+            settings.SSO["JWT_SECRET_KEY"],
+            algorithms=["HS256"],
+            audience=self.client_app.client_id,
+        )
+
+    def test_client_configured_claims(self):
+        id_token = self._id_token(["openid", "email"])
+        self.assertEqual(id_token["email"], "user@example.com")
+        self.assertFalse(id_token["email_verified"])
+        self.assertNotIn("given_name", id_token)
+
+    def test_requested_claims(self):
+        id_token = self._id_token(["openid", "email", "profile"], claims=["given_name"])
+        self.assertEqual(id_token["given_name"], "Ada")
+        self.assertEqual(id_token["email"], "user@example.com")
+
+    def test_claims_are_limited_to_granted_scopes(self):
+        id_token = self._id_token(["openid"], claims=["given_name"])
+        self.assertNotIn("email", id_token)
+        self.assertNotIn("given_name", id_token)
+
+    def test_authorize_passes_claims_parameter_to_code(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("accounts:web:authorize"),
+            {
+                "client_id": self.client_app.client_id,
+                "redirect_uri": "https://example.com/callback",
+                "scope": "openid profile",
+                "nonce": "n",
+                "claims": '{"id_token": {"given_name": null, "unknown": null}}',
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        code = response["Location"].split("code=")[1].split("&")[0]
+        self.assertEqual(json.loads(cache.get(f"auth_code:{code}"))["claims"], ["given_name"])
+
+    def test_authorize_rejects_malformed_claims_parameter(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("accounts:web:authorize"),
+            {
+                "client_id": self.client_app.client_id,
+                "redirect_uri": "https://example.com/callback",
+                "scope": "openid",
+                "nonce": "n",
+                "claims": "[1, 2]",
+            },
+        )
+        self.assertEqual(response["Location"], "/error?error=invalid_request")
@@ -0,0 +1,161 @@
+import base64
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import ConnectionError
+
+# local
+from django_sso.users.models import Application, AuditEvent, User
+from django_sso.users.tasks import flush_audit_events, maintain_audit_log
+from django_sso.users.utils import audit
+
+
+class ListClient:
+    """
+    The Redis list commands the audit queue uses, in memory.
+    """
+
+    def __init__(self):
+        self.items = []
+
+    def rpush(self, key, *values):
+        self.items.extend(values)
+        return len(self.items)
+
+    def lpush(self, key, *values):
+        for value in values:
+            self.items.insert(0, value)
+
+    def lpop(self, key, count):
+        values, self.items = self.items[:count], self.items[count:]
+        return values or None
+
+
+@override_settings(AUDIT_FLUSH_SIZE=3, AUDIT_FLUSH_INTERVAL=3600)
+class AuditBufferTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        audit._buffer.clear()
+        self.user = User.objects.create_user(email="user@example.com", password="password")
+
+    def test_events_are_written_in_bulk(self):
+        for password in ("wrong", "password"):
+            self.client.post(reverse("accounts:web:login"), {"username": "user@example.com", "password": password})
+        self.assertFalse(AuditEvent.objects.exists())
+
+        # The third event fills the buffer, written once the transaction commits.
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            audit.record(AuditEvent.Event.LOGOUT, user_id=self.user.pk, client_id="client")
+
+        self.assertEqual(
+            list(AuditEvent.objects.order_by("id").values_list("event", "user_id", "client_id")),
+            [("login_failed", None, ""), ("login", self.user.pk, ""), ("logout", self.user.pk, "client")],
+        )
+        self.assertEqual(AuditEvent.objects.get(event="login_failed").data, {"username": "user@example.com"})
+        self.assertEqual(AuditEvent.objects.get(event="login").ip, "127.0.0.1")
+
+    @override_settings(AUDIT_BUFFER_SIZE=2, AUDIT_FLUSH_SIZE=10)
+    def test_ring_buffer_keeps_the_latest_events(self):
+        for i in range(3):
+            audit.record(AuditEvent.Event.LOGIN_FAILED, username=f"user{i}")
+        self.assertEqual(audit.flush_buffer(), 2)
+        self.assertEqual(
+            sorted(data["username"] for data in AuditEvent.objects.values_list("data", flat=True)), ["user1", "user2"]
+        )
+
+    def test_redis_queue(self):
+        client = ListClient()
+        with mock.patch("django_sso.users.utils.audit.get_client", return_value=client), mock.patch(
+            "django_sso.users.tasks.flush_audit_events.delay"
+        ) as delay:
+            for _ in range(3):
+                audit.record(AuditEvent.Event.TOKEN_REFRESHED, user_id=self.user.pk, client_id="client")
+            delay.assert_called_once()
+
+        self.assertEqual(len(client.items), 3)
+        self.assertFalse(AuditEvent.objects.exists())
+        with mock.patch("django_sso.users.tasks.get_client", return_value=client):
+            flush_audit_events()
+        self.assertEqual(client.items, [])
+        self.assertEqual(AuditEvent.objects.filter(event="token_refreshed").count(), 3)
+
+    def test_redis_failure_falls_back_to_the_buffer(self):
+        client = mock.Mock()
+        client.rpush.side_effect = ConnectionError("Connection refused")
+        with mock.patch("django_sso.users.utils.audit.get_client", return_value=client), self.assertLogs(
+            "django_sso.users.utils.audit", "WARNING"
+        ):
+            audit.record(AuditEvent.Event.TOKEN_ISSUED, user_id=self.user.pk, client_id="client")
+
+        self.assertEqual(audit.flush_buffer(), 1)
+        self.assertEqual(AuditEvent.objects.get().event, "token_issued")
+
+    def test_retention(self):
+        now = timezone.now()
+        AuditEvent.objects.bulk_create(
+            [
+                AuditEvent(event="login", created_at=now - timedelta(days=100)),
+                AuditEvent(event="login", created_at=now - timedelta(days=1)),
+            ]
+        )
+        maintain_audit_log()
+        self.assertEqual(AuditEvent.objects.count(), 1)
+
+
+class AuditEventsViewTest(TestCase):
+    def setUp(self):
+        self.app = Application.objects.create(
+            name="SIEM", redirect_uris="https://example.com/cb", allowed_scopes="audit"
+        )
+        credentials = base64.b64encode(f"{self.app.client_id}:{self.app._raw_client_secret}".encode()).decode()
+        self.auth = {"HTTP_AUTHORIZATION": f"Basic {credentials}"}
+
+        self.user_id = uuid.uuid4()
+        now = timezone.now()
+        AuditEvent.objects.bulk_create(
+            [
+                AuditEvent(
+                    event="token_issued",
+                    user_id=self.user_id if i % 2 else uuid.uuid4(),
+                    client_id="a" if i < 6 else "b",
+                    created_at=now - timedelta(minutes=i),
+                )
+                for i in range(10)
+            ]
+        )
+
+    def get(self, **params):
+        return self.client.get(reverse("accounts:api:audit"), params, **self.auth)
+
+    def test_authentication(self):
+        self.assertEqual(self.client.get(reverse("accounts:api:audit")).status_code, 401)
+        self.app.allowed_scopes = "openid"
+        self.app.save()
+        self.assertEqual(self.get().status_code, 403)
+
+    def test_filters_and_pagination(self):
+        data = self.get(sub=str(self.user_id), limit=2).json()
+        self.assertEqual(len(data["events"]), 2)
+        events = data["events"]
+        while data["next_cursor"]:
+            data = self.get(sub=str(self.user_id), limit=2, cursor=data["next_cursor"]).json()
+            events += data["events"]
+        self.assertEqual(len(events), 5)
+        self.assertEqual({event["sub"] for event in events}, {str(self.user_id)})
+        times = [event["time"] for event in events]
+        self.assertEqual(times, sorted(times, reverse=True))
+
+        events = self.get(sub=str(self.user_id), client_id="b").json()["events"]
+        self.assertEqual(len(events), 2)
+
+        since = (timezone.now() - timedelta(minutes=2, seconds=30)).isoformat()
+        self.assertEqual(len(self.get(since=since).json()["events"]), 3)
+
+    def test_invalid_request(self):
+        for params in ({"sub": "nope"}, {"since": "yesterday"}, {"cursor": "!!"}, {"limit": "x"}):
+            self.assertEqual(self.get(**params).status_code, 400)
@@ -0,0 +1,52 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+# local
+from django_sso.users.models import Application
+from django_sso.users.tests.views.test_api import TokenFlowTest
+from django_sso.users.utils.auth import SEALED_PREFIX, create_and_cache_auth_code, load_auth_code
+
+
+@override_settings(AUTH_CODE_MODE="sealed")
+class SealedTokenFlowTest(TokenFlowTest):
+    """
+    The token flow tests, with self-contained codes.
+    """
+
+    def test_nothing_is_stored_until_redemption(self):
+        data = self._token_request()
+        self.assertTrue(data["code"].startswith(SEALED_PREFIX))
+        self.assertEqual(cache._cache, {})
+
+        self.client.post(reverse("accounts:api:token"), data)
+        self.assertEqual(len([key for key in cache._cache if "auth_code:redeemed:" in key]), 1)
+
+    def test_code_is_bound_to_its_client(self):
+        other = Application.objects.create(name="Other", redirect_uris="https://example.com/callback")
+        data = self._token_request(client_id=other.client_id, client_secret=other._raw_client_secret)
+
+        response = self.client.post(reverse("accounts:api:token"), data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error_description"], "Invalid or expired authorization code")
+
+    def test_tampered_code(self):
+        code = self._token_request()["code"]
+        tampered = code[:-2] + ("AA" if code[-2:] != "AA" else "BB")
+        self.assertIsNone(load_auth_code(tampered, self.client_app))
+        self.assertIsNone(load_auth_code(SEALED_PREFIX + "!!", self.client_app))
+
+    def test_expired_code(self):
+        code = self._token_request()["code"]
+        with mock.patch("django_sso.users.utils.auth.time.time", return_value=time.time() + 11 * 60):
+            self.assertIsNone(load_auth_code(code, self.client_app))
+
+    def test_cache_codes_still_redeemable(self):
+        with override_settings(AUTH_CODE_MODE="cache"):
+            code = create_and_cache_auth_code(self.user, self.client_app, "https://example.com/callback", ["openid"])
+
+        response = self.client.post(reverse("accounts:api:token"), self._token_request(code=code))
+        self.assertEqual(response.status_code, 200)
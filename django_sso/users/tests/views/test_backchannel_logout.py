@@ -0,0 +1,178 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import now
+
+# local
+from django_sso.users.models import Application, OutboxMessage, User
+from django_sso.users.utils import outbox
+from django_sso.users.utils.backchannel_logout import (
+    LOGOUT_EVENT,
+    get_rp_sessions,
+    publish_logout,
+    record_rp_session,
+    sessions_cache_key,
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    A relying party's back-channel logout endpoint: ``/ok`` accepts logout tokens, ``/<status>`` answers that status.
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.received.append((self.path, parse_qs(body.decode())["logout_token"][0]))
+        self.send_response(200 if self.path == "/ok" else int(self.path.strip("/")))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class HashClient:
+    """
+    The Redis hash commands the relying party sessions use, in memory.
+    """
+
+    def __init__(self):
+        self.hashes = {}
+        self.ttls = {}
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field.encode()] = str(value).encode()
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+    def hkeys(self, key):
+        return list(self.hashes.get(key, {}))
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field.encode(), None)
+
+    def pipeline(self):
+        # The commands run right away, execute() has nothing left to do.
+        return mock.Mock(hset=self.hset, expire=self.expire)
+
+
+class BackchannelLogoutTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.server.received = []
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.server.received.clear()
+        patcher = mock.patch("django_sso.users.tasks.dispatch_outbox.delay")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email="user@example.com", password="password")
+
+    def create_app(self, name, uri=""):
+        app = Application.objects.create(name=name, redirect_uris="https://example.com/cb", backchannel_logout_uri=uri)
+        record_rp_session(self.user.pk, app.client_id)
+        return app
+
+    def logout(self, app):
+        token = jwt.encode(
+            {"user_id": str(self.user.pk), "client_id": app.client_id, "scopes": [], "exp": now().timestamp() + 60},
+            settings.SSO["JWT_SECRET_KEY"],
+            algorithm="HS256",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("accounts:api:logout"), HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 204)
+
+    def test_fan_out(self):
+        initiator = self.create_app("Initiator", f"{self.base_url}/ok")
+        notified = [self.create_app(f"RP {i}", f"{self.base_url}/ok") for i in range(3)]
+        self.create_app("Without back-channel logout")
+        Application.objects.create(name="Not signed in", redirect_uris="https://example.com/cb")
+
+        self.logout(initiator)
+        self.assertEqual(OutboxMessage.objects.filter(topic="backchannel_logout").count(), 3)
+        self.assertEqual(outbox.dispatch(), 3)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+        audiences = set()
+        for path, token in self.server.received:
+            self.assertEqual(jwt.get_unverified_header(token)["typ"], "logout+jwt")
+            claims = jwt.decode(
+                token,
+                settings.SSO["JWT_SECRET_KEY"],
+                algorithms=["HS256"],
+                audience=[app.client_id for app in notified],
+            )
+            self.assertEqual(claims["sub"], str(self.user.pk))
+            self.assertEqual(claims["events"], {LOGOUT_EVENT: {}})
+            self.assertNotIn("nonce", claims)
+            audiences.add(claims["aud"])
+        self.assertEqual(audiences, {app.client_id for app in notified})
+
+        # The sessions are forgotten.
+        self.logout(initiator)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_failures(self):
+        initiator = self.create_app("Initiator")
+        self.create_app("Down", f"{self.base_url}/503")
+        self.create_app("Rejects", f"{self.base_url}/400")
+        # Nothing listens on port 9 (discard).
+        self.create_app("Unreachable", "http://127.0.0.1:9/logout")
+
+        self.logout(initiator)
+        outbox.dispatch()
+
+        # Server errors and connection failures are retried later, rejections dropped.
+        self.assertEqual(
+            sorted(message.attempts for message in OutboxMessage.objects.all()),
+            [1, 1],
+        )
+        self.assertEqual(sorted(path for path, _ in self.server.received), ["/400", "/503"])
+
+    def test_sessions_forgotten_once_the_logout_commits(self):
+        initiator = self.create_app("Initiator")
+        self.create_app("RP", f"{self.base_url}/ok")
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(publish_logout(self.user.pk, exclude_client_id=initiator.client_id), 1)
+        # Were the logout rolled back, the sessions would still be there.
+        self.assertEqual(len(get_rp_sessions(self.user.pk)), 2)
+
+        # Signed in again meanwhile.
+        other = self.create_app("Other")
+        callbacks[0]()
+        self.assertEqual(get_rp_sessions(self.user.pk), [other.client_id])
+
+    def test_redis_hash(self):
+        client = HashClient()
+        with mock.patch("django_sso.users.utils.backchannel_logout.get_client", return_value=client):
+            initiator = self.create_app("Initiator")
+            app = self.create_app("RP", f"{self.base_url}/ok")
+            key = sessions_cache_key(self.user.pk)
+            self.assertEqual(set(client.hashes[key]), {initiator.client_id.encode(), app.client_id.encode()})
+            self.assertEqual(client.ttls[key], settings.SSO["REFRESH_TOKEN_EXPIRATION"].total_seconds())
+
+            self.logout(initiator)
+        self.assertEqual(client.hashes[key], {})
+        self.assertEqual(OutboxMessage.objects.get().payload["client_id"], app.client_id)
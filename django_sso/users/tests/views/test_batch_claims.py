@@ -0,0 +1,114 @@
+import base64
+import uuid
+from unittest import mock
+
+import orjson
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+# local
+from django_sso.users.models import Application, User
+
+# utils
+from django_sso.users.utils.claims import CLAIMS_CACHE_TIMEOUT, claims_version_cache_key
+
+
+class BatchClaimsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.app = Application.objects.create(
+            name="RP", redirect_uris="https://example.com/cb", allowed_scopes="openid email claims"
+        )
+        self.users = [
+            User.objects.create_user(email=f"user{i}@example.com", password="password", first_name=f"User {i}")
+            for i in range(3)
+        ]
+
+    def post(self, data, app=None):
+        app = app or self.app
+        credentials = base64.b64encode(f"{app.client_id}:{app._raw_client_secret}".encode()).decode()
+        return self.client.post(
+            reverse("accounts:api:claims"),
+            orjson.dumps(data),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Basic {credentials}",
+        )
+
+    def test_authentication(self):
+        response = self.client.post(reverse("accounts:api:claims"), {"sub": []}, content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["error"], "invalid_client")
+
+        response = self.client.post(
+            reverse("accounts:api:claims"),
+            {"sub": [], "client_id": self.app.client_id, "client_secret": self.app._raw_client_secret},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        app = Application.objects.create(name="Other", redirect_uris="https://example.com/cb")
+        self.assertEqual(self.post({"sub": []}, app).status_code, 403)
+
+    def test_claims(self):
+        unknown = str(uuid.uuid4())
+        subjects = [str(self.users[2].id), unknown, str(self.users[0].id), "not-a-uuid", str(self.users[2].id)]
+        response = self.post({"sub": subjects})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "columns": ["sub", "email", "email_verified"],
+                "rows": [
+                    [str(self.users[2].id), "user2@example.com", False],
+                    [str(self.users[0].id), "user0@example.com", False],
+                ],
+                "not_found": ["not-a-uuid", unknown],
+            },
+        )
+
+    def test_profile_scope(self):
+        self.app.allowed_scopes = "claims profile"
+        self.app.save()
+        response = self.post({"sub": [str(self.users[1].id)]})
+        self.assertEqual(response.json()["columns"], ["sub", "name", "given_name", "family_name", "profile_picture"])
+        self.assertEqual(response.json()["rows"], [[str(self.users[1].id), None, "User 1", "", None]])
+
+    def test_queries(self):
+        subjects = [str(user.id) for user in self.users]
+        # The request's savepoint, the client, then the users in one query.
+        with self.assertNumQueries(4):
+            self.post({"sub": subjects})
+        with self.assertNumQueries(3):
+            self.post({"sub": subjects})
+
+        self.users[0].first_name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[0].save()
+        self.app.allowed_scopes = "claims profile"
+        self.app.save()
+        # Only the renamed user is read.
+        with self.assertNumQueries(4):
+            rows = self.post({"sub": subjects}).json()["rows"]
+        self.assertEqual(rows[0][2], "Renamed")
+
+    @override_settings(CLAIMS_BATCH_MAX_SUBJECTS=2)
+    def test_invalid_request(self):
+        for data in ({"sub": [str(user.id) for user in self.users]}, {"sub": "x"}, {"sub": [1]}, {}):
+            response = self.post(data)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["error"], "invalid_request")
+
+    def test_versions_cached_in_one_round_trip(self):
+        client = mock.Mock()
+        with mock.patch("django_sso.users.utils.claims.get_client", return_value=client):
+            self.post({"sub": [str(user.id) for user in self.users]})
+
+        client.pipeline.assert_called_once()
+        pipe = client.pipeline.return_value
+        self.assertCountEqual(
+            [call.args for call in pipe.set.call_args_list],
+            [(cache.make_key(claims_version_cache_key(user.id)), user.claims_version) for user in self.users],
+        )
+        self.assertEqual(pipe.set.call_args.kwargs, {"nx": True, "ex": CLAIMS_CACHE_TIMEOUT})
+        pipe.execute.assert_called_once()
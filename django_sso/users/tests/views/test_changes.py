@@ -0,0 +1,172 @@
+import base64
+from datetime import timedelta
+from unittest import mock
+
+import orjson
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+# local
+from django_sso.users.models import Application, User, UserChange
+from django_sso.users.tasks import prune_user_changes, sequence_user_changes
+from django_sso.users.utils import changes
+
+
+@override_settings(USER_CHANGES_POLL_INTERVAL=0.01)
+class UserChangesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.app = Application.objects.create(
+            name="RP", redirect_uris="https://example.com/cb", allowed_scopes="openid email claims"
+        )
+        self.user = User.objects.create_user(email="user@example.com", password="password")
+        self.user.refresh_from_db()
+
+    def get(self, app=None, **params):
+        app = app or self.app
+        credentials = base64.b64encode(f"{app.client_id}:{app._raw_client_secret}".encode()).decode()
+        return self.client.get(reverse("accounts:api:changes"), params, HTTP_AUTHORIZATION=f"Basic {credentials}")
+
+    def test_recording(self):
+        self.assertFalse(UserChange.objects.exists())
+
+        self.user.last_login = timezone.now()
+        self.user.save()
+        self.assertFalse(UserChange.objects.exists())
+
+        self.user.email = "new@example.com"
+        self.user.first_name = "New"
+        self.user.save()
+        self.user.is_active = False
+        self.user.save()
+        user_id = self.user.pk
+        self.user.delete()
+
+        self.assertEqual(
+            list(UserChange.objects.order_by("id").values_list("user_id", "kind", "fields", "is_active")),
+            [
+                (user_id, "updated", ["email", "first_name"], True),
+                (user_id, "updated", ["is_active"], False),
+                (user_id, "deleted", [], False),
+            ],
+        )
+
+    def test_scim_updates_are_recorded(self):
+        scim = Application.objects.create(name="HR", redirect_uris="https://example.com/cb", allowed_scopes="scim")
+        credentials = base64.b64encode(f"{scim.client_id}:{scim._raw_client_secret}".encode()).decode()
+        operation = {"op": "replace", "value": {"active": False}}
+        response = self.client.patch(
+            reverse("accounts:scim:user", args=[self.user.pk]),
+            orjson.dumps({"schemas": ["urn:ietf:params:scim:api:messages:2.0:PatchOp"], "Operations": [operation]}),
+            content_type="application/scim+json",
+            HTTP_AUTHORIZATION=f"Basic {credentials}",
+        )
+        self.assertEqual(response.status_code, 200)
+        change = UserChange.objects.get()
+        self.assertEqual((change.fields, change.is_active), (["is_active"], False))
+
+    def test_authentication(self):
+        self.assertEqual(self.client.get(reverse("accounts:api:changes")).status_code, 401)
+        app = Application.objects.create(name="Other", redirect_uris="https://example.com/cb")
+        self.assertEqual(self.get(app).status_code, 403)
+
+    def test_feed(self):
+        users = [User.objects.get(pk=self.user.pk)]
+        users += [User.objects.create_user(email=f"user{i}@example.com", password="password") for i in range(2)]
+        users = User.objects.filter(pk__in=[user.pk for user in users]).order_by("email")
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in users:
+                user.email_verified = True
+                user.save()
+            renamed = users[0]
+            renamed.username = "renamed"
+            renamed.save()
+            renamed.is_active = False
+            renamed.save()
+
+        response = self.get(limit=2)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data["has_more"])
+        self.assertEqual([change["sub"] for change in data["changes"]], [str(users[0].pk), str(users[1].pk)])
+        self.assertEqual(data["changes"][0]["claims"], ["email_verified"])
+        self.assertEqual(data["changes"][0]["type"], "updated")
+
+        # The rename isn't visible without the profile scope, the deactivation is.
+        data = self.get(cursor=data["cursor"]).json()
+        self.assertFalse(data["has_more"])
+        self.assertEqual(
+            [(change["sub"], change["claims"], change["active"]) for change in data["changes"]],
+            [(str(users[2].pk), ["email_verified"], True), (str(renamed.pk), [], False)],
+        )
+
+        cursor = data["cursor"]
+        data = self.get(cursor=cursor).json()
+        self.assertEqual(data["changes"], [])
+        self.assertEqual(data["cursor"].split(".")[0], cursor.split(".")[0])
+
+    def test_late_commit_is_not_skipped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserChange.record([UserChange(id=10, user_id=self.user.pk, fields=["email"])])
+        data = self.get().json()
+        self.assertEqual(len(data["changes"]), 1)
+
+        # An entry with a lower id, of a transaction that committed after the read.
+        other = User.objects.create_user(email="other@example.com", password="password")
+        with self.captureOnCommitCallbacks(execute=True):
+            UserChange.record([UserChange(id=5, user_id=other.pk, fields=["email"])])
+        data = self.get(cursor=data["cursor"]).json()
+        self.assertEqual([change["sub"] for change in data["changes"]], [str(other.pk)])
+
+    def test_unsequenced_entries_wait_for_their_position(self):
+        UserChange.objects.create(user_id=self.user.pk, fields=["email"])
+        self.assertEqual(self.get().json()["changes"], [])
+
+        sequence_user_changes()
+        self.assertEqual([change["sub"] for change in self.get().json()["changes"]], [str(self.user.pk)])
+
+    def test_long_poll(self):
+        cursor = self.get().json()["cursor"]
+
+        # The client and the first read: while nothing is committed, waiting doesn't query the database.
+        with self.assertNumQueries(2):
+            data = self.get(cursor=cursor, wait="0.1").json()
+        self.assertEqual(data["changes"], [])
+
+        def change(seconds):
+            self.user.first_name = "Changed"
+            self.user.is_active = False
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.save()
+
+        with mock.patch("django_sso.users.utils.changes.time.sleep", side_effect=change):
+            data = self.get(cursor=cursor, wait="10").json()
+        self.assertEqual([change["sub"] for change in data["changes"]], [str(self.user.pk)])
+
+    def test_long_poll_releases_the_connection(self):
+        cursor = self.get().json()["cursor"]
+        # Outside of the test's transaction the connection is closed (given back to the pool) for the wait.
+        with mock.patch("django_sso.users.utils.changes.connection") as connection:
+            connection.in_atomic_block = False
+            self.assertEqual(changes.read_changes(cursor, 10, wait=0.05)[0], [])
+        connection.close.assert_called()
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.get(cursor="nope").status_code, 400)
+        self.assertEqual(self.get(limit="x").status_code, 400)
+
+        expired = changes.encode_cursor(1, timezone.now() - timedelta(days=30))
+        response = self.get(cursor=expired)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()["error"], "expired_cursor")
+
+    @override_settings(USER_CHANGES_PRUNE_BATCH_SIZE=2)
+    def test_prune(self):
+        old = timezone.now() - timedelta(days=8)
+        UserChange.objects.bulk_create(
+            [UserChange(user_id=self.user.pk, created_at=old) for _ in range(5)] + [UserChange(user_id=self.user.pk)]
+        )
+        prune_user_changes()
+        self.assertEqual(UserChange.objects.count(), 1)
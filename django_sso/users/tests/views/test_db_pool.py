@@ -0,0 +1,43 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+# local
+from django_sso.core.db.backends.postgresql_pool.base import close_pool, pool_timeouts
+from django_sso.core.exceptions import DatabasePoolExhausted
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def connection(self, **settings_dict):
+        # Nothing listens on port 9 (discard): the pool never gets a connection.
+        handler = ConnectionHandler(
+            {
+                "default": {},
+                "pooled": {
+                    "ENGINE": "django_sso.core.db.backends.postgresql_pool",
+                    "NAME": "sso",
+                    "HOST": "127.0.0.1",
+                    "PORT": 9,
+                    "OPTIONS": {"pool": {"min_size": 0, "max_size": 1, "timeout": 0.2, "reconnect_timeout": 1}},
+                    **settings_dict,
+                },
+            }
+        )
+        self.addCleanup(close_pool, "pooled")
+        return handler["pooled"]
+
+    def test_pool_options_are_not_connection_parameters(self):
+        params = self.connection().get_connection_params()
+        self.assertEqual(params["dbname"], "sso")
+        self.assertNotIn("pool", params)
+
+    def test_exhausted_pool(self):
+        connection = self.connection()
+        timeouts = pool_timeouts.get(alias="pooled")
+        with self.assertLogs("psycopg.pool", "WARNING"), self.assertRaises(DatabasePoolExhausted):
+            connection.ensure_connection()
+        self.assertEqual(pool_timeouts.get(alias="pooled"), timeouts + 1)
+
+    def test_persistent_connections_are_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.connection(CONN_MAX_AGE=60).ensure_connection()
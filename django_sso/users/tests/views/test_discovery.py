@@ -0,0 +1,79 @@
+import gzip
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+# utils
+from django_sso.users.utils import discovery
+
+
+class DiscoveryDocumentTest(TestCase):
+    def test_discovery_document(self):
+        response = self.client.get(reverse("oidc_discovery"))
+        self.assertEqual(response.status_code, 200)
+        document = response.json()
+        self.assertEqual(document["issuer"], settings.SSO["ISSUER_URL"])
+        self.assertTrue(document["token_endpoint"].endswith(reverse("accounts:api:token")))
+        self.assertTrue(document["jwks_uri"].endswith(reverse("accounts:api:jwks")))
+
+    def test_cache_headers(self):
+        for url in (reverse("oidc_discovery"), reverse("accounts:api:jwks")):
+            response = self.client.get(url)
+            self.assertTrue(response["ETag"].startswith('"'))
+            self.assertEqual(response["Cache-Control"], "public, max-age=86400")
+            self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(reverse("accounts:api:jwks"))["ETag"]
+
+        response = self.client.get(reverse("accounts:api:jwks"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.get(reverse("accounts:api:jwks"), HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_gzip_variant(self):
+        plain = self.client.get(reverse("oidc_discovery"))
+        compressed = self.client.get(reverse("oidc_discovery"), HTTP_ACCEPT_ENCODING="br, gzip")
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertNotEqual(compressed["ETag"], plain["ETag"])
+        self.assertEqual(json.loads(gzip.decompress(compressed.content)), plain.json())
+
+        response = self.client.get(
+            reverse("oidc_discovery"), HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=plain["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_document_is_rebuilt_when_settings_change(self):
+        etag = self.client.get(reverse("oidc_discovery"))["ETag"]
+        with override_settings(SSO={**settings.SSO, "ISSUER_URL": "https://sso.example.com"}):
+            response = self.client.get(reverse("oidc_discovery"))
+            self.assertEqual(response.json()["issuer"], "https://sso.example.com")
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_rebuild_reaches_other_processes(self):
+        rotated = {"keys": [{"kty": "oct", "use": "sig", "alg": "HS256", "kid": "rotated"}]}
+        sso = {**settings.SSO, "DOCUMENT_VERSION_CHECK_INTERVAL": timedelta(0)}
+        with override_settings(SSO=sso):
+            etag = self.client.get(reverse("accounts:api:jwks"))["ETag"]
+            with mock.patch.dict(discovery.DOCUMENT_BUILDERS, jwks=lambda: rotated):
+                self.assertEqual(self.client.get(reverse("accounts:api:jwks"))["ETag"], etag)
+                # Another process rotated the keys.
+                cache.set(discovery.VERSION_KEY, "rotated", timeout=None)
+                response = self.client.get(reverse("accounts:api:jwks"))
+
+        self.assertEqual(response.json(), rotated)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_version_is_checked_at_most_every_interval(self):
+        discovery.rebuild_documents()
+        document = discovery.get_document("jwks")
+        cache.set(discovery.VERSION_KEY, "rotated", timeout=None)
+        self.assertIs(discovery.get_document("jwks"), document)
@@ -0,0 +1,117 @@
+import smtplib
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+
+# local
+from django_sso.core.email.delivery import TokenBucket, deliver, make_message
+from django_sso.core.email.send_mail import send_mail
+from django_sso.users.models import OutboxMessage
+from django_sso.users.utils import outbox
+
+
+class FlakyBackend(EmailBackend):
+    """
+    Fails on the message to ``fail@example.com``, rejects ``rejected@example.com``.
+    """
+
+    opened = 0
+
+    def open(self):
+        FlakyBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to == ["fail@example.com"]:
+                raise smtplib.SMTPServerDisconnected("Connection lost")
+            if message.to == ["rejected@example.com"]:
+                raise smtplib.SMTPRecipientsRefused({"rejected@example.com": (550, b"No such user")})
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND="django_sso.users.tests.views.test_email_delivery.FlakyBackend",
+    EMAIL_DEFAULT_RATE_LIMIT=1000,
+    EMAIL_MAX_ATTEMPTS=3,
+)
+class DeliveryTest(TestCase):
+    def setUp(self):
+        FlakyBackend.opened = 0
+
+    def test_batch_uses_one_connection(self):
+        messages = [make_message("Subject", f"<p>Hello {i}</p>", f"user{i}@example.com") for i in range(5)]
+        self.assertEqual(deliver(messages), [])
+
+        self.assertEqual(FlakyBackend.opened, 1)
+        self.assertEqual([email.to for email in mail.outbox], [[f"user{i}@example.com"] for i in range(5)])
+        self.assertEqual(mail.outbox[0].body, "Hello 0")
+        self.assertEqual(mail.outbox[0].alternatives, [("<p>Hello 0</p>", "text/html")])
+
+    def test_rejected_message_is_dropped(self):
+        messages = [make_message("Subject", "Hello", to) for to in ("rejected@example.com", "user@example.com")]
+        self.assertEqual(deliver(messages), [])
+        self.assertEqual([email.to for email in mail.outbox], [["user@example.com"]])
+
+    def test_transient_failure_returns_the_rest(self):
+        messages = [
+            make_message("Subject", "Hello", to) for to in ("a@example.com", "fail@example.com", "b@example.com")
+        ]
+        failed = deliver(messages)
+
+        self.assertEqual([message["to"] for message in failed], ["fail@example.com", "b@example.com"])
+        self.assertEqual([message["attempts"] for message in failed], [1, 0])
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_message_dropped_after_max_attempts(self):
+        message = {**make_message("Subject", "Hello", "fail@example.com"), "attempts": 2}
+        self.assertEqual(
+            deliver([message, make_message("Subject", "Hello", "b@example.com")])[0]["to"], "b@example.com"
+        )
+
+
+class TokenBucketTest(TestCase):
+    def test_rate_limit(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        with mock.patch.object(TokenBucket, "clock", staticmethod(lambda: now[0])), mock.patch.object(
+            TokenBucket, "sleep", staticmethod(sleep)
+        ):
+            bucket = TokenBucket(rate=10, capacity=5)
+            for _ in range(5):
+                bucket.take()
+            self.assertEqual(sleeps, [])
+
+            bucket.take()
+            self.assertAlmostEqual(sleeps[-1], 0.1)
+
+            now[0] += 1
+            for _ in range(5):
+                bucket.take()
+            self.assertEqual(len(sleeps), 1)
+
+
+class SendMailTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_goes_through_the_outbox(self):
+        with mock.patch("django_sso.users.tasks.dispatch_outbox.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                send_mail("Subject", "<p>Hello</p>", "user@example.com", [("notes.txt", "Notes", "text/plain")])
+        delay.assert_called_once_with()
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(outbox.dispatch(), 1)
+        self.assertEqual([email.to for email in mail.outbox], [["user@example.com"]])
+        self.assertEqual(mail.outbox[0].alternatives, [("<p>Hello</p>", "text/html")])
+        self.assertEqual(mail.outbox[0].attachments, [("notes.txt", "Notes", "text/plain")])
+        self.assertFalse(OutboxMessage.objects.exists())
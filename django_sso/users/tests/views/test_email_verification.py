@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+# local
+from django_sso.users.models import User
+from django_sso.users.utils.email_verification import generate_email_verification_token, verify_email_token
+
+
+class EmailVerificationTokenTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="user@example.com", password="securepassword")
+
+    def test_verify_email(self):
+        token = generate_email_verification_token(self.user)
+        response = self.client.post(reverse("accounts:web:email_verification", args=[token]))
+
+        self.assertTrue(response.context["success"])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.email_verified)
+
+    def test_issuing_tokens_stores_nothing(self):
+        with self.assertNumQueries(0):
+            tokens = {generate_email_verification_token(self.user) for _ in range(3)}
+        self.assertEqual(cache.get(f"email_verification:{tokens.pop()}"), None)
+
+    def test_token_is_single_use(self):
+        token = generate_email_verification_token(self.user)
+        self.assertEqual(verify_email_token(token), self.user)
+        self.assertIsNone(verify_email_token(token))
+
+    def test_tokens_expire_with_the_verification_state(self):
+        token = generate_email_verification_token(self.user)
+        other = generate_email_verification_token(self.user)
+        self.user.email = "new@example.com"
+        self.user.save()
+        self.assertIsNone(verify_email_token(token))
+
+        self.user.email = "user@example.com"
+        self.user.email_verified = True
+        self.user.save()
+        self.assertIsNone(verify_email_token(other))
+
+    def test_tampered_or_expired_token(self):
+        token = generate_email_verification_token(self.user)
+        self.assertIsNone(verify_email_token(token[:-1]))
+        self.assertIsNone(verify_email_token("not-a-token"))
+
+        with override_settings(EMAIL_VERIFICATION_TOKEN_MAX_AGE=-1):
+            self.assertIsNone(verify_email_token(token))
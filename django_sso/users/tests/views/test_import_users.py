@@ -0,0 +1,121 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+# local
+from django_sso.users.models import User
+
+
+@override_settings(ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=1024, ARGON2_PARALLELISM=1)
+class ImportUsersTest(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.legacy_hash = PBKDF2PasswordHasher().encode("legacy-password", "saltsalt", iterations=1000)
+
+    def import_users(self, name, content, **options):
+        path = self.tmp / name
+        path.write_text(content)
+        stdout, stderr = StringIO(), StringIO()
+        call_command("import_users", str(path), stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_csv_import(self):
+        User.objects.create_user(email="existing@example.com", password="securepassword")
+        content = (
+            "email,username,first_name,email_verified,password,password_hash\n"
+            f"legacy@example.com,legacy,Legacy,true,,{self.legacy_hash}\n"
+            "plain@example.com,plain,Plain,0,plain-password,\n"
+            "nopassword@example.com,,,,,\n"
+            "existing@example.com,,,,,\n"
+            "legacy@EXAMPLE.com,,,,,\n"
+            "not-an-email,,,,,\n"
+            "md5@example.com,,,,,md5$salt$0123456789abcdef0123456789abcdef\n"
+        )
+        stdout, stderr = self.import_users("users.csv", content, workers=2, batch_size=3)
+
+        legacy = User.objects.get(email="legacy@example.com")
+        self.assertEqual((legacy.username, legacy.first_name, legacy.email_verified), ("legacy", "Legacy", True))
+        self.assertEqual(legacy.password, self.legacy_hash)
+        self.assertTrue(legacy.check_password("legacy-password"))
+
+        plain = User.objects.get(email="plain@example.com")
+        self.assertFalse(plain.email_verified)
+        self.assertTrue(plain.password.startswith("argon2$"))
+        self.assertTrue(check_password("plain-password", plain.password))
+
+        self.assertFalse(User.objects.get(email="nopassword@example.com").has_usable_password())
+        self.assertEqual(User.objects.count(), 4)
+
+        self.assertIn("Record 6: Enter a valid email address.", stderr)
+        self.assertIn("Record 7: Unknown password hash format.", stderr)
+        self.assertIn("7 records: 3 created, 2 skipped, 2 failed", stdout)
+
+    def test_jsonl_import_without_workers(self):
+        lines = [
+            {"email": "a@example.com", "password": "password-a", "is_active": False},
+            {"email": "b@example.com", "password_hash": self.legacy_hash, "date_joined": "2020-01-02T03:04:05Z"},
+        ]
+        self.import_users("users.jsonl", "\n".join(json.dumps(line) for line in lines), workers=0)
+
+        a = User.objects.get(email="a@example.com")
+        self.assertFalse(a.is_active)
+        self.assertTrue(check_password("password-a", a.password))
+        self.assertEqual(User.objects.get(email="b@example.com").date_joined.year, 2020)
+
+    def test_invalid_jsonl_records_are_skipped(self):
+        content = "\n".join(
+            [
+                json.dumps({"email": "a@example.com"}),
+                "{not json",
+                json.dumps(["b@example.com"]),
+                json.dumps({"email": 5}),
+                json.dumps({"email": "c@example.com", "is_active": {"value": True}}),
+                json.dumps({"email": "d@example.com", "is_active": "false"}),
+            ]
+        )
+        stdout, stderr = self.import_users("users.jsonl", content, workers=0)
+
+        self.assertEqual(sorted(User.objects.values_list("email", flat=True)), ["a@example.com", "d@example.com"])
+        self.assertIn("Record 2: Invalid JSON", stderr)
+        self.assertIn("Record 3: Expected an object.", stderr)
+        self.assertIn("Record 4: Invalid value for email.", stderr)
+        self.assertIn("Record 5: Invalid value for is_active.", stderr)
+        self.assertIn("6 records: 2 created, 0 skipped, 4 failed", stdout)
+
+    def test_users_created_meanwhile_are_not_counted(self):
+        atomic = transaction.atomic
+
+        def create_meanwhile(*args, **kwargs):
+            # Another process imports one of the emails between the lookup and the insert.
+            if not User.objects.filter(email="b@example.com").exists():
+                User.objects.create_user(email="b@example.com")
+            return atomic(*args, **kwargs)
+
+        with mock.patch("django_sso.users.management.commands.import_users.transaction.atomic", create_meanwhile):
+            stdout, _ = self.import_users("users.csv", "email\na@example.com\nb@example.com\n", workers=0)
+
+        self.assertIn("2 records: 1 created, 1 skipped, 0 failed", stdout)
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_resume_from_checkpoint(self):
+        checkpoint = self.tmp / "checkpoint"
+        content = "email\n" + "".join(f"user{i}@example.com\n" for i in range(5))
+
+        self.import_users("users.csv", content, batch_size=2, workers=0, checkpoint=str(checkpoint))
+        self.assertEqual(checkpoint.read_text(), "5")
+
+        User.objects.all().delete()
+        checkpoint.write_text("3")
+        stdout, _ = self.import_users("users.csv", content, batch_size=2, workers=0, checkpoint=str(checkpoint))
+
+        self.assertIn("Resuming after record 3", stdout)
+        self.assertEqual(
+            sorted(User.objects.values_list("email", flat=True)), ["user3@example.com", "user4@example.com"]
+        )
@@ -0,0 +1,28 @@
+from django.test import TestCase
+from django.urls import reverse
+
+
+class PathDispatchMiddlewareTest(TestCase):
+    def test_api_routes_skip_web_middleware(self):
+        response = self.client.get(reverse("accounts:api:jwks"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Frame-Options", response.headers)
+        self.assertFalse(hasattr(response.wsgi_request, "session"))
+
+    def test_api_routes_keep_security_and_cors_middleware(self):
+        response = self.client.get(reverse("accounts:api:jwks"), HTTP_ORIGIN="https://rp.example.com")
+        self.assertIn("Access-Control-Allow-Origin", response.headers)
+        self.assertIn("X-Content-Type-Options", response.headers)
+
+    def test_web_routes_run_full_stack(self):
+        response = self.client.get(reverse("accounts:web:login"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Frame-Options"], "DENY")
+        self.assertTrue(hasattr(response.wsgi_request, "session"))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+        self.assertIn("csrftoken", response.cookies)
+
+    def test_csrf_is_enforced_on_web_routes(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        response = client.post(reverse("accounts:web:login"), {"username": "a@example.com", "password": "x"})
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+# local
+from django_sso.users.models import OutboxMessage, User
+from django_sso.users.utils import outbox
+from django_sso.users.utils.emails import send_templated_email
+
+VERIFICATION_TEMPLATES = ("email/users/email_verification_subject.txt", "email/users/email_verification_email.html")
+
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("django_sso.users.tasks.dispatch_outbox.delay")
+        self.dispatch_delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_registration_email_goes_through_the_outbox(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("accounts:web:register"),
+                {
+                    "email": "new@example.com",
+                    "username": "new",
+                    "password1": "a-Strong-passw0rd",
+                    "password2": "a-Strong-passw0rd",
+                },
+            )
+        self.assertEqual(response.status_code, 302)
+
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.topic, "email")
+        self.assertEqual(message.payload["user_id"], str(User.objects.get(email="new@example.com").pk))
+        # Nothing is rendered or sent in the request.
+        self.assertEqual(mail.outbox, [])
+        self.dispatch_delay.assert_called_once_with()
+
+        self.assertEqual(outbox.dispatch(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "Verify Your Email Address - Django SSO")
+        self.assertIn("Hello new@example.com", mail.outbox[0].body)
+        self.assertIn("/users/verify-email/", mail.outbox[0].body)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_password_reset_email_goes_through_the_outbox(self):
+        User.objects.create_user(email="user@example.com", password="securepassword")
+        self.client.post(reverse("accounts:web:password_reset"), {"email": "user@example.com"})
+
+        self.assertEqual(mail.outbox, [])
+        outbox.dispatch()
+        self.assertEqual(mail.outbox[0].subject, "Password Reset Request - Django SSO")
+        self.assertIn("/users/reset/", mail.outbox[0].body)
+
+    def test_rolled_back_message_is_never_sent(self):
+        user = User.objects.create_user(email="user@example.com", password="securepassword")
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    send_templated_email(user.email, *VERIFICATION_TEMPLATES, {"token": "t", "domain": "d"}, user=user)
+                    raise ValueError
+            except ValueError:
+                pass
+
+        self.assertFalse(OutboxMessage.objects.exists())
+        self.dispatch_delay.assert_not_called()
+
+    @override_settings(EMAIL_BACKEND="django_sso.users.tests.views.test_email_delivery.FlakyBackend")
+    def test_failed_message_is_retried_later(self):
+        context = {"token": "t", "domain": "d", "protocol": "https"}
+        send_templated_email("user@example.com", *VERIFICATION_TEMPLATES, context)
+        send_templated_email("fail@example.com", *VERIFICATION_TEMPLATES, context)
+
+        self.assertEqual(outbox.dispatch(), 2)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.payload["to"], "fail@example.com")
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.available_at, timezone.now())
+        self.assertEqual([email.to for email in mail.outbox], [["user@example.com"]])
+
+        # Not available until the backoff is over.
+        self.assertEqual(outbox.dispatch(), 0)
+
+    def test_email_to_deleted_user_is_dropped(self):
+        user = User.objects.create_user(email="user@example.com", password="securepassword")
+        send_templated_email(user.email, *VERIFICATION_TEMPLATES, {"token": "t"}, user=user)
+        User.objects.filter(pk=user.pk).delete()
+
+        outbox.dispatch()
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(OutboxMessage.objects.exists())
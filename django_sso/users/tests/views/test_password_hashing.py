@@ -0,0 +1,165 @@
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management import call_command
+from django.http import HttpRequest
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+# local
+from django_sso.core.exceptions import HashingQueueFull
+from django_sso.core.hashers import get_hashing_executor, hash_rejected
+from django_sso.users.models import User
+from django_sso.users.utils import passwords
+
+
+@override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE_SIZE=0, PASSWORD_HASHING_RETRY_AFTER=3)
+class HashingExecutorTest(TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def _block_executor(self):
+        def slow_hash():
+            self.started.set()
+            self.release.wait(5)
+
+        thread = threading.Thread(target=get_hashing_executor().run, args=("encode", slow_hash))
+        thread.start()
+        self.started.wait(5)
+        self.addCleanup(thread.join)
+
+    def test_hashes_run_on_the_pool(self):
+        user = User.objects.create_user(email="user@example.com", password="securepassword")
+        self.assertTrue(user.password.startswith("argon2$"))
+        self.assertTrue(user.check_password("securepassword"))
+
+    def test_full_queue_fails_fast(self):
+        self._block_executor()
+        rejected = hash_rejected.get()
+        with self.assertRaises(HashingQueueFull):
+            get_hashing_executor().run("encode", lambda: None)
+        self.assertEqual(hash_rejected.get(), rejected + 1)
+
+    def test_map_keeps_room_in_the_queue(self):
+        # One worker and no queue: each hash waits for the previous one instead of failing.
+        self.assertEqual(get_hashing_executor().map("encode", str.upper, ["a", "b", "c"]), ["A", "B", "C"])
+
+        self._block_executor()
+        with self.assertRaises(HashingQueueFull):
+            get_hashing_executor().map("encode", str.upper, ["a"])
+
+    def test_full_queue_returns_503(self):
+        User.objects.create_user(email="user@example.com", password="securepassword")
+        self._block_executor()
+
+        response = self.client.post(
+            reverse("accounts:web:login"), {"username": "user@example.com", "password": "securepassword"}
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(response.json()["error"], "temporarily_unavailable")
+
+    def test_metrics_endpoint(self):
+        User.objects.create_user(email="user@example.com", password="securepassword")
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('password_hash_seconds_count{operation="encode"}', response.content.decode())
+
+
+@override_settings(ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=1024, ARGON2_PARALLELISM=1)
+class RehashOnLoginTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="user@example.com", password="securepassword")
+        self.futures = []
+        patcher = mock.patch(
+            "django_sso.users.models.rehash_password",
+            side_effect=lambda *args: self.futures.append(passwords.rehash_password(*args)),
+        )
+        self.rehash = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _cost(self):
+        self.user.refresh_from_db()
+        return identify_hasher(self.user.password).decode(self.user.password)["memory_cost"]
+
+    def test_current_hash_is_kept(self):
+        self.assertTrue(self.user.check_password("securepassword"))
+        self.rehash.assert_not_called()
+
+    def test_outdated_hash_is_upgraded_in_background(self):
+        with self.settings(ARGON2_MEMORY_COST=2048):
+            self.assertTrue(self.user.check_password("securepassword"))
+            self.assertTrue(self.futures[0].result(timeout=5))
+            self.assertEqual(self._cost(), 2048)
+            self.assertTrue(self.user.check_password("securepassword"))
+
+    def test_password_change_wins_over_rehash(self):
+        with self.settings(ARGON2_MEMORY_COST=2048):
+            self.assertTrue(self.user.check_password("securepassword"))
+        self.rehash.assert_called_once()
+        User.objects.filter(pk=self.user.pk).update(password="changed")
+        self.assertFalse(passwords._rehash_password(*self.rehash.call_args.args))
+
+    def test_session_survives_rehash(self):
+        with self.settings(ARGON2_MEMORY_COST=2048):
+            self.assertTrue(self.client.login(username="user@example.com", password="securepassword"))
+            self.futures[0].result(timeout=5)
+
+            request = HttpRequest()
+            request.session = self.client.session
+            self.assertEqual(get_user(request), self.user)
+
+    def test_password_change_after_rehash_ends_sessions(self):
+        with self.settings(ARGON2_MEMORY_COST=2048):
+            self.assertTrue(self.client.login(username="user@example.com", password="securepassword"))
+            self.futures[0].result(timeout=5)
+
+        self.user.refresh_from_db()
+        self.user.set_password("newpassword")
+        self.user.save()
+
+        request = HttpRequest()
+        request.session = self.client.session
+        self.assertTrue(get_user(request).is_anonymous)
+
+    def test_password_reset_in_bulk_after_rehash_ends_sessions(self):
+        with self.settings(ARGON2_MEMORY_COST=2048):
+            self.assertTrue(self.client.login(username="user@example.com", password="securepassword"))
+            self.futures[0].result(timeout=5)
+
+        # Bypasses set_password, the superseded hash is left in the cache.
+        User.objects.filter(pk=self.user.pk).update(password=make_password("newpassword"))
+
+        request = HttpRequest()
+        request.session = self.client.session
+        self.assertTrue(get_user(request).is_anonymous)
+
+
+class CalibrateHashersTest(TestCase):
+    def test_writes_env_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / ".django"
+            path.write_text("DJANGO_DEBUG=0\nDJANGO_ARGON2_TIME_COST=9\n")
+            call_command(
+                "calibrate_hashers",
+                target_ms=2000,
+                concurrency=1,
+                memory_costs=[1024],
+                rounds=1,
+                output=str(path),
+                stdout=mock.MagicMock(),
+            )
+            lines = path.read_text().splitlines()
+
+        self.assertEqual(lines[0], "DJANGO_DEBUG=0")
+        self.assertIn("DJANGO_ARGON2_MEMORY_COST=1024", lines)
+        self.assertIn("DJANGO_ARGON2_PARALLELISM=1", lines)
+        self.assertEqual(len([line for line in lines if line.startswith("DJANGO_ARGON2_TIME_COST=")]), 1)
@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+# local
+from django_sso.core.ratelimit import get_rate_limiter, reset_rate_limiter
+
+RATE_LIMITS = {**settings.RATE_LIMITS, "login:account": (2, 60), "login:ip": (3, 60), "token:client": (1, 60)}
+
+
+@override_settings(RATE_LIMITS=RATE_LIMITS, CLIENT_IP_HEADER="HTTP_X_REAL_IP")
+class RateLimitTest(TestCase):
+    def setUp(self):
+        # Start every test with empty counters.
+        reset_rate_limiter(setting="RATE_LIMITS")
+
+    def _login(self, email="user@example.com", ip="10.0.0.1"):
+        return self.client.post(
+            reverse("accounts:web:login"), {"username": email, "password": "wrong"}, HTTP_X_REAL_IP=ip
+        )
+
+    def test_login_limited_per_account(self):
+        self.assertEqual(self._login(ip="10.0.0.1").status_code, 200)
+        self.assertEqual(self._login(email="USER@example.com", ip="10.0.0.2").status_code, 200)
+
+        response = self._login(ip="10.0.0.3")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()["error"], "rate_limited")
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+
+        self.assertEqual(self._login(email="other@example.com", ip="10.0.0.3").status_code, 200)
+
+    def test_login_limited_per_ip(self):
+        for i in range(3):
+            self.assertEqual(self._login(email=f"user{i}@example.com").status_code, 200)
+        self.assertEqual(self._login(email="user3@example.com").status_code, 429)
+        self.assertEqual(self._login(email="user3@example.com", ip="10.0.0.2").status_code, 200)
+
+    def test_token_limited_per_client(self):
+        data = {"client_id": "client", "client_secret": "secret", "code": "code", "redirect_uri": "https://a.com"}
+        self.assertEqual(self.client.post(reverse("accounts:api:token"), data).status_code, 400)
+
+        response = self.client.post(reverse("accounts:api:token"), data)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_blocked_keys_skip_the_backend(self):
+        for _ in range(3):
+            self._login()
+
+        limiter = get_rate_limiter()
+        with mock.patch.object(limiter.backend, "check") as backend_check:
+            self.assertEqual(self._login().status_code, 429)
+        backend_check.assert_not_called()
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(4):
+            self.assertEqual(self._login().status_code, 200)
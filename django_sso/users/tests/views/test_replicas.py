@@ -0,0 +1,75 @@
+import base64
+
+import jwt
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+
+# local
+from django_sso.users.models import Application, User
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    The "replica" database of the local settings is not replicated: the copies written to it differ from the primary
+    rows, so the responses show where each read went.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="user@example.com", password="password", first_name="Primary")
+        replica_copy = User.objects.using("default").get(pk=self.user.pk)
+        replica_copy.first_name = "Replica"
+        User.objects.using("replica").bulk_create([replica_copy])
+
+    def userinfo(self):
+        token = jwt.encode(
+            {
+                "user_id": str(self.user.pk),
+                "client_id": "client",
+                "scopes": ["profile"],
+                "exp": now().timestamp() + 60,
+            },
+            settings.SSO["JWT_SECRET_KEY"],
+            algorithm="HS256",
+        )
+        response = self.client.get(reverse("accounts:api:userinfo"), HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_reads_outside_transactions_go_to_the_replicas(self):
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, "Replica")
+        self.assertEqual(Application.objects.all().db, "replica")
+        with transaction.atomic():
+            self.assertEqual(User.objects.get(pk=self.user.pk).first_name, "Primary")
+
+    def test_read_only_view(self):
+        self.assertEqual(self.userinfo()["given_name"], "Replica")
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, self.client.cookies)
+
+    def test_read_your_writes(self):
+        app = Application.objects.create(name="HR", redirect_uris="https://example.com/cb", allowed_scopes="scim")
+        credentials = base64.b64encode(f"{app.client_id}:{app._raw_client_secret}".encode()).decode()
+        operation = {"op": "replace", "value": {"name": {"givenName": "Renamed"}}}
+        response = self.client.patch(
+            reverse("accounts:scim:user", args=[self.user.pk]),
+            orjson.dumps({"schemas": ["urn:ietf:params:scim:api:messages:2.0:PatchOp"], "Operations": [operation]}),
+            content_type="application/scim+json",
+            HTTP_AUTHORIZATION=f"Basic {credentials}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies[settings.REPLICA_STICKY_COOKIE]["max-age"], settings.REPLICA_STICKY_SECONDS)
+
+        # The cookie keeps the reads on the primary, which has the write the replica misses.
+        cache.clear()
+        self.assertEqual(self.userinfo()["given_name"], "Renamed")
+        del self.client.cookies[settings.REPLICA_STICKY_COOKIE]
+        cache.clear()
+        self.assertEqual(self.userinfo()["given_name"], "Replica")
@@ -0,0 +1,293 @@
+import base64
+from unittest import mock
+
+import orjson
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import DatabaseError, connection, models, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+# local
+from django_sso.users.models import Application, RefreshTokenUsage, User, UserChange
+from django_sso.users.scim.provisioning import Batch
+from django_sso.users.utils.claims import claims_version_cache_key
+
+PATCH_OP = "urn:ietf:params:scim:api:messages:2.0:PatchOp"
+
+
+class SCIMTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        app = Application.objects.create(name="HR", redirect_uris="https://example.com/cb", allowed_scopes="scim")
+        credentials = base64.b64encode(f"{app.client_id}:{app._raw_client_secret}".encode()).decode()
+        self.auth = {"HTTP_AUTHORIZATION": f"Basic {credentials}"}
+
+    def request(self, method, name, data=None, *args, **params):
+        url = reverse(f"accounts:scim:{name}", args=args)
+        if method == "get":
+            return self.client.get(url, params, **self.auth)
+        return getattr(self.client, method)(
+            url, orjson.dumps(data) if data is not None else b"", content_type="application/scim+json", **self.auth
+        )
+
+
+class SCIMUsersTest(SCIMTestCase):
+    def test_authentication(self):
+        response = self.client.get(reverse("accounts:scim:users"))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], 'Basic realm="SCIM"')
+
+        app = Application.objects.create(name="RP", redirect_uris="https://example.com/cb")
+        credentials = base64.b64encode(f"{app.client_id}:{app._raw_client_secret}".encode()).decode()
+        response = self.client.get(reverse("accounts:scim:users"), HTTP_AUTHORIZATION=f"Basic {credentials}")
+        self.assertEqual(response.status_code, 403)
+
+    def test_user_lifecycle(self):
+        response = self.request(
+            "post",
+            "users",
+            {
+                "schemas": ["urn:ietf:params:scim:schemas:core:2.0:User"],
+                "userName": "jane@EXAMPLE.com",
+                "name": {"givenName": "Jane", "familyName": "Doe"},
+                "externalId": "E-1",
+                "active": True,
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response["Content-Type"], "application/scim+json")
+        resource = response.json()
+        self.assertEqual(resource["userName"], "jane@example.com")
+        self.assertEqual(response["Location"], resource["meta"]["location"])
+        user = User.objects.get(email="jane@example.com")
+        self.assertFalse(user.has_usable_password())
+
+        response = self.request("post", "users", {"userName": "jane@example.com"})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["scimType"], "uniqueness")
+
+        patch = {
+            "schemas": [PATCH_OP],
+            "Operations": [
+                {"op": "replace", "path": "name.givenName", "value": "Janet"},
+                {"op": "replace", "value": {"active": "False", "displayName": "janet"}},
+            ],
+        }
+        response = self.request("patch", "user", patch, user.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["displayName"], "janet")
+        user.refresh_from_db()
+        self.assertEqual((user.first_name, user.username, user.is_active), ("Janet", "janet", False))
+        self.assertEqual(user.claims_version, 2)
+
+        response = self.request("put", "user", {"userName": "jane.doe@example.com"}, user.id)
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertEqual((user.email, user.first_name, user.is_active), ("jane.doe@example.com", "", True))
+
+        self.assertEqual(self.request("get", "user", None, user.id).json()["userName"], "jane.doe@example.com")
+        self.assertEqual(self.request("delete", "user", None, user.id).status_code, 204)
+        self.assertEqual(self.request("get", "user", None, user.id).status_code, 404)
+
+    def test_filters(self):
+        User.objects.create_user(email="alice@example.com", username="alice", first_name="Alice")
+        User.objects.create_user(email="bob@example.com", username="bob", is_active=False)
+        User.objects.create_user(email="carol@other.org")
+
+        def emails(expression):
+            response = self.request("get", "users", filter=expression)
+            self.assertEqual(response.status_code, 200, response.content)
+            return sorted(resource["userName"] for resource in response.json()["Resources"])
+
+        self.assertEqual(emails('userName eq "alice@EXAMPLE.COM"'), ["alice@example.com"])
+        self.assertEqual(
+            emails('emails[type eq "work"].value ew "example.com"'), ["alice@example.com", "bob@example.com"]
+        )
+        self.assertEqual(emails("active eq false"), ["bob@example.com"])
+        self.assertEqual(
+            emails('name.givenName pr or (displayName sw "b" and not (active eq true))'),
+            ["alice@example.com", "bob@example.com"],
+        )
+        self.assertEqual(emails('id eq "not-a-uuid"'), [])
+
+        response = self.request("get", "users", filter='userName eq "unterminated')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["scimType"], "invalidFilter")
+        self.assertEqual(self.request("get", "users", filter="password eq 1").status_code, 400)
+
+    def test_cursor_pagination(self):
+        for i in range(5):
+            User.objects.create_user(email=f"user{i}@example.com")
+
+        seen, cursor, pages = [], "", 0
+        while cursor is not None:
+            body = self.request("get", "users", cursor=cursor, count=2).json()
+            if not cursor:
+                self.assertEqual(body["totalResults"], 5)
+            seen += [resource["id"] for resource in body["Resources"]]
+            cursor = body.get("nextCursor")
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, sorted(str(pk) for pk in User.objects.values_list("id", flat=True)))
+
+        body = self.request("get", "users", startIndex=5, count=2).json()
+        self.assertEqual((body["totalResults"], body["itemsPerPage"]), (5, 1))
+        self.assertEqual(self.request("get", "users", cursor="!!").json()["scimType"], "invalidCursor")
+
+
+@override_settings(SCIM_BULK_BATCH_SIZE=3)
+class SCIMBulkTest(SCIMTestCase):
+    def bulk(self, operations, **extra):
+        response = self.request("post", "bulk", {"Operations": operations, **extra})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["Operations"]
+
+    def test_bulk_operations(self):
+        existing = User.objects.create_user(email="existing@example.com", first_name="Old")
+        cache.set(claims_version_cache_key(existing.id), 1)
+        operations = [
+            {"method": "POST", "path": "/Users", "bulkId": f"u{i}", "data": {"userName": f"new{i}@example.com"}}
+            for i in range(4)
+        ]
+        operations += [
+            {"method": "POST", "path": "/Users", "bulkId": "dup", "data": {"userName": "existing@example.com"}},
+            {
+                "method": "PATCH",
+                "path": "/Users/bulkId:u3",
+                "data": {"schemas": [PATCH_OP], "Operations": [{"op": "replace", "path": "active", "value": False}]},
+            },
+            {
+                "method": "PATCH",
+                "path": f"/Users/{existing.id}",
+                "data": {"Operations": [{"op": "replace", "path": "name.givenName", "value": "New"}]},
+            },
+            {"method": "DELETE", "path": "/Users/bulkId:u1"},
+            {"method": "DELETE", "path": "/Users/00000000-0000-0000-0000-000000000000"},
+            {"method": "GET", "path": "/Users"},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            results = self.bulk(operations)
+
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["201", "201", "201", "201", "409", "200", "200", "204", "404", "400"],
+        )
+        self.assertEqual(results[0]["bulkId"], "u0")
+        self.assertIn(str(User.objects.get(email="new0@example.com").id), results[0]["location"])
+        self.assertFalse(User.objects.get(email="new3@example.com").is_active)
+        self.assertFalse(User.objects.filter(email="new1@example.com").exists())
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.first_name, existing.claims_version), ("New", 2))
+        self.assertEqual(cache.get(claims_version_cache_key(existing.id)), 2)
+
+    def test_passwords_are_hashed_before_the_transaction(self):
+        operations = [
+            {"method": "POST", "path": "/Users", "data": {"userName": f"new{i}@example.com", "password": f"secret{i}"}}
+            for i in range(2)
+        ]
+        operations.append({"method": "POST", "path": "/Users", "data": {"userName": "nopassword@example.com"}})
+        with mock.patch("django_sso.users.scim.provisioning.transaction.atomic", wraps=transaction.atomic) as atomic:
+            hash_password = make_password
+
+            def make_password_outside_transaction(password):
+                atomic.assert_not_called()
+                return hash_password(password)
+
+            with mock.patch("django_sso.users.scim.provisioning.make_password", make_password_outside_transaction):
+                results = self.bulk(operations)
+
+        self.assertEqual([result["status"] for result in results], ["201", "201", "201"])
+        self.assertTrue(User.objects.get(email="new1@example.com").check_password("secret1"))
+        self.assertFalse(User.objects.get(email="nopassword@example.com").has_usable_password())
+
+    def test_deletes_take_a_fixed_number_of_queries(self):
+        def delete(count):
+            users = [User.objects.create_user(email=f"user{count}-{i}@example.com") for i in range(count)]
+            app = Application.objects.create(name="RP", redirect_uris="https://example.com/cb")
+            RefreshTokenUsage.objects.create(user=users[0], application=app, last_used_at=timezone.now())
+            for user in users:
+                cache.set(claims_version_cache_key(user.id), 1)
+            with CaptureQueriesContext(connection) as queries:
+                results = self.bulk([{"method": "DELETE", "path": f"/Users/{user.id}"} for user in users])
+            self.assertEqual({result["status"] for result in results}, {"204"})
+            self.assertFalse(User.objects.filter(id__in=[user.id for user in users]).exists())
+            self.assertFalse(RefreshTokenUsage.objects.exists())
+            self.assertEqual(
+                UserChange.objects.filter(
+                    kind=UserChange.Kind.DELETED, user_id__in=[user.id for user in users]
+                ).count(),
+                count,
+            )
+            self.assertIsNone(cache.get(claims_version_cache_key(users[0].id)))
+            return len(queries)
+
+        self.assertEqual(delete(1), delete(3))
+
+    def test_deletes_follow_on_delete(self):
+        protected, deleted = (User.objects.create_user(email=f"user{i}@example.com") for i in range(2))
+        LogEntry.objects.create(user=protected, action_flag=ADDITION)
+        Token.objects.create(user=deleted)
+
+        relation = LogEntry._meta.get_field("user").remote_field
+        with mock.patch.object(relation, "on_delete", models.PROTECT):
+            results = self.bulk([{"method": "DELETE", "path": f"/Users/{user.id}"} for user in (protected, deleted)])
+
+        self.assertEqual([result["status"] for result in results], ["409", "204"])
+        self.assertIn("admin.LogEntry", results[0]["response"]["detail"])
+        self.assertEqual(list(User.objects.values_list("id", flat=True)), [protected.id])
+        self.assertTrue(LogEntry.objects.filter(user=protected).exists())
+        self.assertFalse(Token.objects.exists())
+
+    def test_fail_on_errors(self):
+        operations = [
+            {"method": "POST", "path": "/Users", "bulkId": f"b{i}", "data": {"userName": "invalid"}} for i in range(7)
+        ]
+        results = self.bulk(operations, failOnErrors=2)
+        # The first batch (3 operations) ran, no other one.
+        self.assertEqual(len(results), 3)
+
+    def test_limits(self):
+        with self.settings(SCIM_BULK_MAX_OPERATIONS=2):
+            response = self.request("post", "bulk", {"Operations": [{}, {}, {}]})
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()["scimType"], "tooMany")
+
+        with self.settings(SCIM_BULK_MAX_PAYLOAD_SIZE=10):
+            response = self.request("post", "bulk", {"Operations": []})
+        self.assertEqual(response.json()["scimType"], "tooLarge")
+
+
+@override_settings(SCIM_BULK_BATCH_SIZE=2)
+class SCIMBulkTransactionTest(TransactionTestCase):
+    setUp = SCIMTestCase.setUp
+    request = SCIMTestCase.request
+
+    def test_batches_commit_on_their_own(self):
+        operations = [
+            {"method": "POST", "path": "/Users", "bulkId": f"u{i}", "data": {"userName": f"new{i}@example.com"}}
+            for i in range(4)
+        ]
+        create = Batch.create
+        batches = []
+
+        def fail_second_batch(batch, creates):
+            batches.append(batch)
+            if len(batches) == 2:
+                raise DatabaseError("connection lost")
+            return create(batch, creates)
+
+        self.client.raise_request_exception = False
+        with mock.patch.object(Batch, "create", fail_second_batch):
+            response = self.request("post", "bulk", {"Operations": operations})
+
+        self.assertEqual(response.status_code, 500)
+        # The first batch was committed before the second one failed.
+        self.assertEqual(
+            sorted(User.objects.values_list("email", flat=True)), ["new0@example.com", "new1@example.com"]
+        )
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+
+# local
+from django_sso.users.models import User
+
+
+class UserInfoETagTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com", username="user", first_name="Ada", password="securepassword"
+        )
+
+    def _get(self, scopes=("openid", "email", "profile"), **headers):
+        token = jwt.encode(
+            {
+                "user_id": str(self.user.id),
+                "client_id": "client",
+                "scopes": list(scopes),
+                "exp": now() + timedelta(minutes=5),
+            },
+            settings.SSO["JWT_SECRET_KEY"],
+            algorithm="HS256",
+        )
+        return self.client.get(reverse("accounts:api:userinfo"), HTTP_AUTHORIZATION=f"Bearer {token}", **headers)
+
+    def test_response_has_etag(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["given_name"], "Ada")
+        self.assertTrue(response["ETag"])
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+    def test_if_none_match_skips_database(self):
+        etag = self._get()["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in queries if query["sql"].startswith("SELECT")])
+        self.assertEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_scopes(self):
+        self.assertNotEqual(self._get(scopes=["openid", "email"])["ETag"], self._get()["ETag"])
+
+    def test_claim_change_bumps_version(self):
+        etag = self._get()["ETag"]
+
+        user = User.objects.get(id=self.user.id)
+        user.email_verified = True
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=["email_verified"])
+
+        user.refresh_from_db()
+        self.assertEqual(user.claims_version, 2)
+        response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["email_verified"])
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_unrelated_change_keeps_version(self):
+        etag = self._get()["ETag"]
+
+        user = User.objects.get(id=self.user.id)
+        user.last_login = now()
+        user.save(update_fields=["last_login"])
+
+        user.refresh_from_db()
+        self.assertEqual(user.claims_version, 1)
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_deleted_user(self):
+        self._get()
+        User.objects.filter(id=self.user.id).delete()
+        response = self._get()
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"error": "user_not_found"})
@@ -5,4 +5,5 @@ app_name = "accounts"
 urlpatterns = [
     path("users/", include(("django_sso.users.web.urls", "accounts"), namespace="web")),
     path("api/users/", include(("django_sso.users.api.urls", "accounts"), namespace="api")),
+    path("api/scim/v2/", include(("django_sso.users.scim.urls", "accounts"), namespace="scim")),
 ]
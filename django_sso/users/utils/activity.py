@@ -0,0 +1,200 @@
+"""
+Write-behind activity timestamps: users' last login, applications' last use and the last use of a user's refresh
+tokens at an application.
+
+The ``touch_*`` functions don't write to the database. With Redis behind the cache a timestamp is one HSET in the
+hash of its kind, so the activity of a user or an application between two flushes coalesces into one field, and the
+``flush_activity`` task writes the hashes in batched UPDATEs every ``ACTIVITY_MAX_STALENESS`` seconds. Without Redis
+(local development, tests) each process coalesces them in a dict it flushes itself, after the current transaction,
+once the oldest pending timestamp is ``ACTIVITY_MAX_STALENESS`` seconds old. So do the processes whose HSET fails.
+
+The timestamps in the database are thus late by up to ``ACTIVITY_MAX_STALENESS`` seconds (plus the flush).
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+# local
+from django_sso.core.redis import get_client
+
+# model
+from django_sso.users.models import Application, RefreshTokenUsage
+
+logger = logging.getLogger(__name__)
+
+USERS = "users"
+CLIENTS = "clients"
+GRANTS = "grants"
+KINDS = (USERS, CLIENTS, GRANTS)
+
+_pending = {kind: {} for kind in KINDS}
+_pending_lock = threading.Lock()
+# time.monotonic() when the oldest pending timestamp was added.
+_oldest_at = None
+
+
+def hash_key(kind: str) -> str:
+    return f"activity:{kind}"
+
+
+def touch_user(user):
+    """
+    Record a login of ``user``. Its ``last_login`` is set right away, and saved by the next flush.
+    """
+    user.last_login = timezone.now()
+    _touch(USERS, str(user.pk), user.last_login)
+
+
+def touch_client(client_id: str):
+    _touch(CLIENTS, client_id, timezone.now())
+
+
+def touch_token(user_id, client_id: str):
+    """
+    Record that tokens were issued to ``client_id`` for the user.
+    """
+    used_at = timezone.now()
+    _touch(CLIENTS, client_id, used_at)
+    _touch(GRANTS, f"{user_id}:{client_id}", used_at)
+
+
+def _touch(kind: str, key: str, used_at: datetime):
+    client = get_client()
+    if client is not None:
+        from redis.exceptions import RedisError
+
+        try:
+            client.hset(hash_key(kind), key, used_at.isoformat())
+            return
+        except RedisError:
+            # Never fail the request over a timestamp, the process flushes it itself instead.
+            logger.warning("Activity hash unavailable, keeping the timestamp in process", exc_info=True)
+
+    global _oldest_at
+    with _pending_lock:
+        _pending[kind][key] = used_at
+        if _oldest_at is None:
+            _oldest_at = time.monotonic()
+        due = time.monotonic() - _oldest_at >= settings.ACTIVITY_MAX_STALENESS
+
+    if not due:
+        return
+    if connection.in_atomic_block:
+        # Not within the request's transaction, a rollback would lose the timestamps of other requests.
+        transaction.on_commit(flush_pending)
+    else:
+        flush_pending()
+
+
+def flush_pending() -> int:
+    """
+    Write the timestamps pending in the process, returns how many were written. On failure they are kept.
+    """
+    global _pending, _oldest_at
+    with _pending_lock:
+        pending, _pending, _oldest_at = _pending, {kind: {} for kind in KINDS}, None
+    if not any(pending.values()):
+        return 0
+
+    try:
+        write(pending)
+    except DatabaseError:
+        logger.exception("Writing activity timestamps failed")
+        with _pending_lock:
+            for kind in KINDS:
+                # The timestamps recorded meanwhile are newer.
+                _pending[kind] = {**pending[kind], **_pending[kind]}
+            _oldest_at = time.monotonic()
+        return 0
+    return sum(len(timestamps) for timestamps in pending.values())
+
+
+def pop(client) -> dict[str, dict[str, datetime]]:
+    """
+    Take the timestamps coalesced in Redis.
+    """
+    pipe = client.pipeline()
+    for kind in KINDS:
+        pipe.hgetall(hash_key(kind))
+        pipe.delete(hash_key(kind))
+    results = pipe.execute()
+    return {
+        kind: {key.decode(): datetime.fromisoformat(value.decode()) for key, value in values.items()}
+        for kind, values in zip(KINDS, results[::2])
+    }
+
+
+def push_back(client, pending: dict[str, dict[str, datetime]]):
+    pipe = client.pipeline()
+    for kind, timestamps in pending.items():
+        for key, used_at in timestamps.items():
+            # Unless a newer timestamp was recorded meanwhile.
+            pipe.hsetnx(hash_key(kind), key, used_at.isoformat())
+    pipe.execute()
+
+
+def write(pending: dict[str, dict[str, datetime]]):
+    with transaction.atomic():
+        update_timestamps(get_user_model().objects.all(), "pk", "last_login", pending.get(USERS, {}))
+        update_timestamps(Application.objects.all(), "client_id", "last_used_at", pending.get(CLIENTS, {}))
+        write_grants(pending.get(GRANTS, {}))
+
+
+def update_timestamps(queryset, key: str, field: str, timestamps: dict[str, datetime]):
+    """
+    Set ``field`` of the rows whose ``key`` is in ``timestamps``, in UPDATEs of ``ACTIVITY_BATCH_SIZE`` rows.
+    """
+    # Sorted, so that concurrent flushes lock the rows in the same order.
+    items = sorted(timestamps.items())
+    for start in range(0, len(items), settings.ACTIVITY_BATCH_SIZE):
+        batch = items[start : start + settings.ACTIVITY_BATCH_SIZE]
+        queryset.filter(**{f"{key}__in": [value for value, _ in batch]}).update(
+            **{
+                field: Case(
+                    *(When(**{key: value}, then=Value(used_at)) for value, used_at in batch),
+                    output_field=DateTimeField(),
+                )
+            }
+        )
+
+
+def write_grants(timestamps: dict[str, datetime]):
+    """
+    Upsert the ``RefreshTokenUsage`` of the ``"<user id>:<client id>"`` keys of ``timestamps``.
+    """
+    if not timestamps:
+        return
+    keys = {key: key.split(":", 1) for key in timestamps}
+    user_ids = {
+        str(pk)
+        for pk in get_user_model()
+        .objects.filter(pk__in={user_id for user_id, _ in keys.values()})
+        .values_list("pk", flat=True)
+    }
+    applications = dict(
+        Application.objects.filter(client_id__in={client_id for _, client_id in keys.values()}).values_list(
+            "client_id", "pk"
+        )
+    )
+
+    # The users and applications deleted meanwhile are skipped.
+    usages = [
+        RefreshTokenUsage(user_id=user_id, application_id=applications[client_id], last_used_at=timestamps[key])
+        for key, (user_id, client_id) in sorted(keys.items())
+        if user_id in user_ids and client_id in applications
+    ]
+    RefreshTokenUsage.objects.bulk_create(
+        usages,
+        batch_size=settings.ACTIVITY_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["user", "application"],
+        update_fields=["last_used_at"],
+    )
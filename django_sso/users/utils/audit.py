@@ -0,0 +1,269 @@
+"""
+Audit log of authentication events.
+
+``record()`` doesn't touch the database. With Redis behind the cache an event is one RPUSH to a list that the
+``flush_audit_events`` task drains with bulk inserts. Otherwise (local development, tests) events go to an
+in-process ring buffer that the process flushes itself when an event arrives and ``AUDIT_FLUSH_SIZE`` events
+accumulated or the oldest one is ``AUDIT_FLUSH_INTERVAL`` seconds old. The ring buffer keeps the latest
+``AUDIT_BUFFER_SIZE`` events when the database can't keep up, and is lost when the process exits: use Redis where
+the audit log matters.
+
+On PostgreSQL ``AuditEvent`` is partitioned by day of ``created_at``. Partitions are created ahead by the
+``maintain_audit_log`` task, and on demand when writing; retention drops whole partitions instead of deleting rows.
+"""
+
+import base64
+import binascii
+import ipaddress
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# local
+from django_sso.core.ratelimit import get_client_ip
+from django_sso.core.redis import get_client
+
+# model
+from django_sso.users.models import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "audit:events"
+FLUSH_SCHEDULED_KEY = "audit:flush_scheduled"
+
+_buffer = deque()
+_buffer_lock = threading.Lock()
+# time.monotonic() when the oldest buffered event was added.
+_oldest_at = None
+# Days whose partition is known to exist.
+_partitions = set()
+
+
+def _ip(request) -> str | None:
+    try:
+        return str(ipaddress.ip_address(get_client_ip(request)))
+    except ValueError:
+        return None
+
+
+def record(event: str, request=None, user_id=None, client_id: str = "", **data):
+    """
+    Log an ``AuditEvent.Event``. ``data`` must be JSON serializable.
+    """
+    entry = {
+        "event": event,
+        "created_at": timezone.now().isoformat(),
+        "user_id": str(user_id) if user_id else None,
+        "client_id": client_id or "",
+        "ip": _ip(request) if request is not None else None,
+        "data": data,
+    }
+    client = get_client()
+    if client is None:
+        buffer_event(entry)
+        return
+
+    from redis.exceptions import RedisError
+
+    try:
+        queued = client.rpush(QUEUE_KEY, json.dumps(entry))
+    except RedisError:
+        # Never fail the request over its audit trail, keep the event in the process instead.
+        logger.warning("Audit queue unavailable, buffering the event in process", exc_info=True)
+        buffer_event(entry)
+        return
+    if queued >= settings.AUDIT_FLUSH_SIZE:
+        schedule_flush()
+
+
+def schedule_flush():
+    from django_sso.users.tasks import flush_audit_events
+
+    # At most one flush scheduled at a time, the running one clears the key when it starts.
+    if cache.add(FLUSH_SCHEDULED_KEY, 1, timeout=60):
+        flush_audit_events.delay()
+
+
+def buffer_event(entry: dict):
+    global _oldest_at
+    with _buffer_lock:
+        if len(_buffer) >= settings.AUDIT_BUFFER_SIZE:
+            _buffer.popleft()
+        _buffer.append(entry)
+        if _oldest_at is None:
+            _oldest_at = time.monotonic()
+        due = (
+            len(_buffer) >= settings.AUDIT_FLUSH_SIZE or time.monotonic() - _oldest_at >= settings.AUDIT_FLUSH_INTERVAL
+        )
+
+    if not due:
+        return
+    if connection.in_atomic_block:
+        # Not within the request's transaction, a rollback would lose the events of other requests.
+        transaction.on_commit(flush_buffer)
+    else:
+        flush_buffer()
+
+
+def flush_buffer() -> int:
+    """
+    Write the events of the in-process buffer, returns how many were written. On failure they are kept.
+    """
+    global _buffer, _oldest_at
+    with _buffer_lock:
+        entries, _buffer, _oldest_at = list(_buffer), deque(), None
+    if not entries:
+        return 0
+
+    try:
+        write(entries)
+    except DatabaseError:
+        logger.exception("Writing %d audit events failed", len(entries))
+        with _buffer_lock:
+            _buffer = deque([*entries, *_buffer][-settings.AUDIT_BUFFER_SIZE :])
+            _oldest_at = time.monotonic()
+        return 0
+    return len(entries)
+
+
+def pop(client, count: int) -> list[dict]:
+    values = client.lpop(QUEUE_KEY, count) or []
+    return [json.loads(value) for value in values]
+
+
+def push_back(client, entries: list[dict]):
+    client.lpush(QUEUE_KEY, *reversed([json.dumps(entry) for entry in entries]))
+
+
+def write(entries: list[dict]):
+    events = [
+        AuditEvent(
+            event=entry["event"],
+            created_at=datetime.fromisoformat(entry["created_at"]),
+            user_id=entry["user_id"],
+            client_id=entry["client_id"],
+            ip=entry["ip"],
+            data=entry["data"],
+        )
+        for entry in entries
+    ]
+    ensure_partitions({event.created_at.date() for event in events})
+    AuditEvent.objects.bulk_create(events)
+
+
+def partition_name(day) -> str:
+    return f"{AuditEvent._meta.db_table}_p{day:%Y%m%d}"
+
+
+def ensure_partitions(days):
+    """
+    Create the partitions of ``days`` that don't exist yet, on PostgreSQL.
+    """
+    if connection.vendor != "postgresql":
+        return
+    missing = set(days) - _partitions
+    if not missing:
+        return
+
+    table = connection.ops.quote_name(AuditEvent._meta.db_table)
+    with connection.cursor() as cursor:
+        for day in sorted(missing):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(partition_name(day))} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+            )
+    _partitions.update(missing)
+
+
+def prune() -> int:
+    """
+    Delete the events older than ``AUDIT_RETENTION_DAYS``: drop their partitions on PostgreSQL, delete them
+    elsewhere. Returns how many partitions were dropped (or rows deleted).
+    """
+    cutoff = (timezone.now() - timedelta(days=settings.AUDIT_RETENTION_DAYS)).date()
+    if connection.vendor != "postgresql":
+        deleted, _ = AuditEvent.objects.filter(created_at__lt=datetime.combine(cutoff, datetime.min.time())).delete()
+        return deleted
+
+    prefix = f"{AuditEvent._meta.db_table}_p"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s",
+            [AuditEvent._meta.db_table],
+        )
+        names = [name for (name,) in cursor.fetchall() if name.startswith(prefix)]
+
+        dropped = 0
+        for name in names:
+            try:
+                day = datetime.strptime(name[len(prefix) :], "%Y%m%d").date()
+            except ValueError:
+                continue
+            if day < cutoff:
+                cursor.execute(f"DROP TABLE IF EXISTS {connection.ops.quote_name(name)}")
+                _partitions.discard(day)
+                dropped += 1
+    return dropped
+
+
+def maintain():
+    """
+    Create the partitions of the next ``AUDIT_PARTITIONS_AHEAD`` days and apply the retention.
+    """
+    today = timezone.now().date()
+    ensure_partitions({today + timedelta(days=days) for days in range(settings.AUDIT_PARTITIONS_AHEAD + 1)})
+    return prune()
+
+
+def query_events(
+    user_id=None, client_id=None, event=None, since=None, until=None, before: tuple | None = None, limit: int = 100
+):
+    """
+    The events matching the filters, newest first. ``before`` is the ``(created_at, id)`` of the last event of the
+    previous page.
+
+    A user or client filter is served by its ``(user_id|client_id, created_at)`` index, and the time range prunes
+    the partitions scanned.
+    """
+    queryset = AuditEvent.objects.order_by("-created_at", "-id")
+    if user_id:
+        queryset = queryset.filter(user_id=user_id)
+    if client_id:
+        queryset = queryset.filter(client_id=client_id)
+    if event:
+        queryset = queryset.filter(event=event)
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lt=until)
+    if before:
+        queryset = queryset.filter(Q(created_at__lt=before[0]) | Q(created_at=before[0], id__lt=before[1]))
+    return list(queryset[:limit])
+
+
+def encode_cursor(event: AuditEvent) -> str:
+    return base64.urlsafe_b64encode(f"{event.created_at.isoformat()}|{event.id}".encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    The ``before`` of ``query_events`` encoded in ``cursor``, raises ``ValueError``.
+    """
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError(cursor)
+    created_at, _, event_id = value.partition("|")
+    return datetime.fromisoformat(created_at), int(event_id)
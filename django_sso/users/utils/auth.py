@@ -1,8 +1,29 @@
+"""
+Authorization codes.
+
+With ``AUTH_CODE_MODE = "cache"`` a code is a random string keyed to its data in the cache. With ``"sealed"`` the
+data travels in the code itself, encrypted and authenticated with AES-GCM under a key derived from ``SECRET_KEY``
+and bound to the ``client_id`` it was issued to: nothing is stored at ``/authorize/``, and ``/token/`` only adds a
+small marker, living until the code expires, so a code is redeemed once. Codes of both modes are accepted whatever
+the current mode, switching doesn't break codes in flight.
+"""
+
+import base64
+import binascii
+import functools
 import json
+import math
+import os
 import secrets
+import time
+import uuid
 
+import orjson
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from django.conf import settings
 from django.core.cache import cache
+from django.utils.crypto import salted_hmac
 
 # django
 from django.utils.timezone import now
@@ -10,6 +31,23 @@ from django.utils.timezone import now
 # local
 from django_sso.users.models import Application, User
 
+SEALED_PREFIX = "s1."
+NONCE_SIZE = 12
+
+
+@functools.lru_cache(maxsize=2)
+def _get_aead(secret_key: str) -> AESGCM:
+    key = salted_hmac("django_sso.users.auth_code", "aes-256-gcm", secret=secret_key, algorithm="sha256").digest()
+    return AESGCM(key)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
 
 def create_and_cache_auth_code(
     user: User,
@@ -20,7 +58,20 @@ def create_and_cache_auth_code(
     nonce=None,
     code_challenge=None,
     code_challenge_method=None,
+    claims=None,
 ):
+    if settings.AUTH_CODE_MODE == "sealed":
+        return seal_auth_code(
+            user,
+            client,
+            redirect_uri,
+            scopes,
+            nonce=nonce,
+            code_challenge=code_challenge,
+            code_challenge_method=code_challenge_method,
+            claims=claims,
+        )
+
     code = secrets.token_urlsafe(code_length)
 
     data = {
@@ -33,8 +84,90 @@ def create_and_cache_auth_code(
         "nonce": nonce,
         "code_challenge": code_challenge,
         "code_challenge_method": code_challenge_method,
+        "claims": claims or [],
     }
 
     cache.set(f"auth_code:{code}", json.dumps(data), timeout=settings.AUTH_CODE_TTL)
 
     return code
+
+
+def seal_auth_code(
+    user: User,
+    client: Application,
+    redirect_uri: str,
+    scopes: list[str],
+    nonce=None,
+    code_challenge=None,
+    code_challenge_method=None,
+    claims=None,
+) -> str:
+    """
+    Build a self-contained authorization code, nothing is stored.
+    """
+    payload = [
+        user.id.hex,
+        int(time.time()),
+        redirect_uri,
+        " ".join(scopes),
+        nonce,
+        code_challenge,
+        code_challenge_method,
+        claims or [],
+    ]
+    iv = os.urandom(NONCE_SIZE)
+    sealed = _get_aead(settings.SECRET_KEY).encrypt(iv, orjson.dumps(payload), client.client_id.encode())
+    return SEALED_PREFIX + _b64encode(iv + sealed)
+
+
+def _open_auth_code(code: str, client: Application) -> dict | None:
+    try:
+        raw = _b64decode(code[len(SEALED_PREFIX) :])
+        iv, sealed = raw[:NONCE_SIZE], raw[NONCE_SIZE:]
+        user_id, issued_at, redirect_uri, scopes, nonce, code_challenge, code_challenge_method, claims = orjson.loads(
+            _get_aead(settings.SECRET_KEY).decrypt(iv, sealed, client.client_id.encode())
+        )
+    except (binascii.Error, ValueError, InvalidTag):
+        return None
+
+    expires_at = issued_at + settings.AUTH_CODE_TTL
+    if time.time() >= expires_at:
+        return None
+
+    return {
+        "user_id": str(uuid.UUID(user_id)),
+        "client_id": str(client.id),
+        "redirect_uri": redirect_uri,
+        "issued_at": issued_at,
+        "expires_at": expires_at,
+        "code_id": iv.hex(),
+        "scopes": scopes.split(),
+        "used": False,
+        "nonce": nonce,
+        "code_challenge": code_challenge,
+        "code_challenge_method": code_challenge_method,
+        "claims": claims,
+    }
+
+
+def load_auth_code(code: str, client: Application) -> dict | None:
+    """
+    Return the data of an authorization code issued to ``client``, or None if it is invalid or expired.
+    """
+    if code.startswith(SEALED_PREFIX):
+        return _open_auth_code(code, client)
+
+    data = cache.get(f"auth_code:{code}")
+    return json.loads(data) if data else None
+
+
+def mark_auth_code_used(code: str, code_data: dict) -> bool:
+    """
+    Record that an authorization code was redeemed, returns False if it already was.
+    """
+    if code.startswith(SEALED_PREFIX):
+        timeout = max(math.ceil(code_data["expires_at"] - time.time()), 1)
+        return cache.add(f"auth_code:redeemed:{code_data['code_id']}", 1, timeout=timeout)
+
+    cache.set(f"auth_code:{code}", json.dumps({**code_data, "used": True}), timeout=60)
+    return True
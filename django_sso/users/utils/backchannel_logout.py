@@ -0,0 +1,206 @@
+"""
+OpenID Connect Back-Channel Logout 1.0.
+
+Issuing tokens to an application records it among the user's relying party sessions, a field of the user's Redis hash
+(so concurrent token requests of the user don't overwrite each other's sessions). When the user logs out, every
+other application of these sessions that has a ``backchannel_logout_uri`` gets a message in the outbox, in the
+logout's transaction. The outbox dispatcher hands a batch of them to ``deliver_logout_tokens``, which POSTs the
+signed logout tokens concurrently with one pooled async HTTP client: connections to the same host are reused across
+the batch, connection failures are retried right away and the other failures are retried by the outbox with
+backoff.
+"""
+
+import asyncio
+import logging
+import secrets
+
+import httpx
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.timezone import now
+
+# local
+from django_sso.core.redis import get_client
+
+# model
+from django_sso.users.models import Application
+
+# utils
+from django_sso.users.utils import outbox
+
+logger = logging.getLogger(__name__)
+
+LOGOUT_EVENT = "http://schemas.openid.net/event/backchannel-logout"
+TOPIC = "backchannel_logout"
+
+
+def sessions_cache_key(user_id) -> str:
+    return f"rp_sessions:{user_id}"
+
+
+def record_rp_session(user_id, client_id: str):
+    """
+    Remember that ``client_id`` holds tokens of the user, for as long as its latest refresh token lives.
+    """
+    key = sessions_cache_key(user_id)
+    signed_in_at = int(now().timestamp())
+    timeout = int(settings.SSO.get("REFRESH_TOKEN_EXPIRATION").total_seconds())
+    client = get_client()
+    if client is None:
+        sessions = cache.get(key) or {}
+        sessions[client_id] = signed_in_at
+        cache.set(key, sessions, timeout=timeout)
+        return
+
+    from redis.exceptions import RedisError
+
+    pipe = client.pipeline()
+    pipe.hset(key, client_id, signed_in_at)
+    pipe.expire(key, timeout)
+    try:
+        pipe.execute()
+    except RedisError:
+        # Never fail the token request over it, the application just won't be told of the user's logout.
+        logger.warning("Recording the relying party session failed", exc_info=True)
+
+
+def get_rp_sessions(user_id) -> list[str]:
+    """
+    The client ids of the user's relying party sessions.
+    """
+    key = sessions_cache_key(user_id)
+    client = get_client()
+    if client is None:
+        return list(cache.get(key) or {})
+
+    from redis.exceptions import RedisError
+
+    try:
+        return [client_id.decode() for client_id in client.hkeys(key)]
+    except RedisError:
+        logger.warning("Reading the relying party sessions failed", exc_info=True)
+        return []
+
+
+def forget_rp_sessions(user_id, client_ids: list[str]):
+    """
+    Drop these sessions of the user, keeping those recorded since they were read.
+    """
+    key = sessions_cache_key(user_id)
+    client = get_client()
+    if client is None:
+        sessions = cache.get(key) or {}
+        for client_id in client_ids:
+            sessions.pop(client_id, None)
+        if sessions:
+            cache.set(key, sessions, timeout=settings.SSO.get("REFRESH_TOKEN_EXPIRATION").total_seconds())
+        else:
+            cache.delete(key)
+        return
+
+    from redis.exceptions import RedisError
+
+    try:
+        client.hdel(key, *client_ids)
+    except RedisError:
+        logger.warning("Forgetting the relying party sessions failed", exc_info=True)
+
+
+def publish_logout(user_id, exclude_client_id: str | None = None) -> int:
+    """
+    Queue a logout token to the user's relying parties, except ``exclude_client_id`` (the one logging out).
+    Returns how many were queued.
+    """
+    sessions = get_rp_sessions(user_id)
+    if not sessions:
+        return 0
+    # Once the logout commits: if it rolls back, so do the messages, and the sessions must still be there.
+    transaction.on_commit(lambda: forget_rp_sessions(user_id, sessions), robust=True)
+    client_ids = [client_id for client_id in sessions if client_id != exclude_client_id]
+    if not client_ids:
+        return 0
+
+    clients = Application.objects.filter(client_id__in=client_ids, is_active=True).exclude(backchannel_logout_uri="")
+    count = 0
+    for client_id in clients.values_list("client_id", flat=True):
+        outbox.publish(TOPIC, {"client_id": client_id, "user_id": str(user_id)})
+        count += 1
+    return count
+
+
+def make_logout_token(user_id, client_id: str) -> str:
+    issued_at = now()
+    payload = {
+        "iss": settings.SSO.get("ISSUER_URL", "http://localhost:8000"),
+        "sub": str(user_id),
+        "aud": client_id,
+        "iat": int(issued_at.timestamp()),
+        "exp": int((issued_at + settings.SSO.get("LOGOUT_TOKEN_EXPIRATION")).timestamp()),
+        "jti": secrets.token_urlsafe(16),
+        "events": {LOGOUT_EVENT: {}},
+    }
+    return jwt.encode(payload, settings.SSO.get("JWT_SECRET_KEY"), algorithm="HS256", headers={"typ": "logout+jwt"})
+
+
+def make_http_client() -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(
+        retries=settings.BACKCHANNEL_LOGOUT_CONNECT_RETRIES,
+        limits=httpx.Limits(
+            max_connections=settings.BACKCHANNEL_LOGOUT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.BACKCHANNEL_LOGOUT_MAX_CONNECTIONS,
+        ),
+    )
+    return httpx.AsyncClient(transport=transport, timeout=settings.BACKCHANNEL_LOGOUT_TIMEOUT)
+
+
+async def post_logout_token(http: httpx.AsyncClient, uri: str, token: str) -> bool | None:
+    """
+    POST a logout token. ``True`` when delivered, ``False`` to retry later, ``None`` when the relying party
+    rejected it (a 4xx) and retrying wouldn't help.
+    """
+    try:
+        response = await http.post(uri, data={"logout_token": token}, headers={"Cache-Control": "no-store"})
+    except httpx.HTTPError as e:
+        logger.warning("Back-channel logout to %s failed: %r", uri, e)
+        return False
+    if response.is_success:
+        return True
+    logger.warning("Back-channel logout to %s answered %d", uri, response.status_code)
+    return None if response.is_client_error else False
+
+
+async def post_logout_tokens(requests: list[tuple[str, str]]) -> list[bool | None]:
+    async with make_http_client() as http:
+        return await asyncio.gather(*(post_logout_token(http, uri, token) for uri, token in requests))
+
+
+def deliver_logout_tokens(messages):
+    """
+    Outbox handler of the ``backchannel_logout`` topic: send the logout tokens concurrently.
+    """
+    client_ids = {message.payload["client_id"] for message in messages}
+    uris = dict(
+        Application.objects.filter(client_id__in=client_ids, is_active=True)
+        .exclude(backchannel_logout_uri="")
+        .values_list("client_id", "backchannel_logout_uri")
+    )
+
+    # The applications that were deactivated or dropped back-channel logout meanwhile are skipped.
+    pending = [message for message in messages if message.payload["client_id"] in uris]
+    requests = [
+        (
+            uris[message.payload["client_id"]],
+            make_logout_token(message.payload["user_id"], message.payload["client_id"]),
+        )
+        for message in pending
+    ]
+    results = asyncio.run(post_logout_tokens(requests)) if requests else []
+
+    retries = []
+    for message, delivered in zip(pending, results):
+        if delivered is False:
+            message.attempts += 1
+            retries.append(message)
+    return retries
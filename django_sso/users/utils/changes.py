@@ -0,0 +1,163 @@
+"""
+User change feed.
+
+Saving a user records a ``UserChange`` when a claim field or ``is_active`` changed, and deleting one records its
+deletion, in the transaction of the change. Relying parties read the feed in position order from a cursor, in large
+pages, and then fetch the claims they need with the batch claims endpoint.
+
+Ids are allocated when an entry is inserted but become visible when its transaction commits, so an entry with a
+lower id may show up after a higher one was read. Entries are therefore served by ``position`` instead, given once
+they are committed (``sequence_changes``, right after the transaction commits and every 10 seconds by beat as a
+safety net) by one sequencer at a time, so no position shows up below one a reader already read.
+
+With ``wait`` a read long-polls: while there is nothing to serve it only watches a generation counter in the cache,
+bumped whenever entries are sequenced, and queries the database again once it moved. It doesn't hold a database
+connection while waiting, but holds its thread: the ``changes`` admission class caps the waiting reads per process.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+# model
+from django_sso.users.models import UserChange
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "user_changes:generation"
+FEED_COLUMNS = ("position", "user_id", "kind", "fields", "is_active", "created_at")
+# Serializes the sequencers on PostgreSQL, SQLite serializes writers anyway.
+SEQUENCE_LOCK_ID = 0x5553_4552_4348_4E47
+
+
+class ExpiredCursor(Exception):
+    """
+    The cursor is older than the retention, entries after it may have been pruned.
+    """
+
+
+def notify_changes():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+
+
+def sequence_changes(batch_size: int = 1000) -> int:
+    """
+    Give the committed entries without a position the next positions, in id order. Returns how many were sequenced.
+    """
+    sequenced = 0
+    while True:
+        try:
+            with transaction.atomic():
+                if connection.vendor == "postgresql":
+                    # Held until commit, so the positions of the next sequencer are visible after these.
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [SEQUENCE_LOCK_ID])
+                pending = list(UserChange.objects.filter(position=None).order_by("id").only("id")[:batch_size])
+                if not pending:
+                    return sequenced
+                last = UserChange.objects.aggregate(last=Max("position"))["last"] or 0
+                for offset, change in enumerate(pending, 1):
+                    change.position = last + offset
+                UserChange.objects.bulk_update(pending, ["position"])
+        except IntegrityError:
+            # Another sequencer took these positions, and sequences the remaining entries.
+            logger.info("Concurrent user change sequencing", exc_info=True)
+            return sequenced
+        sequenced += len(pending)
+
+
+def publish_changes():
+    """
+    Run once entries committed: sequence them and wake the long-polling readers.
+    """
+    if sequence_changes():
+        notify_changes()
+
+
+def get_generation() -> int:
+    return cache.get(GENERATION_KEY, 0)
+
+
+def encode_cursor(position: int, at) -> str:
+    return f"{position}.{int(at.timestamp())}"
+
+
+def parse_cursor(value: str | None) -> tuple[int, int | None]:
+    """
+    The last position read and the time the reader was caught up to, raises ``ValueError`` on a malformed cursor.
+    """
+    if not value:
+        return 0, None
+    position, _, timestamp = value.partition(".")
+    return int(position), int(timestamp)
+
+
+def fetch(after: int, limit: int):
+    """
+    The entries after position ``after``, at most ``limit`` of them, whether more follow and the time of the read.
+    """
+    now = timezone.now()
+    rows = list(
+        UserChange.objects.filter(position__gt=after).order_by("position").values_list(*FEED_COLUMNS)[: limit + 1]
+    )
+    return rows[:limit], len(rows) > limit, now
+
+
+def release_connection():
+    """
+    Close the database connection (give it back to the pool) for the wait, the next fetch opens one again.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def read_changes(cursor: str | None, limit: int, wait: float = 0) -> tuple[list, str, bool]:
+    """
+    Read the entries after ``cursor``, as tuples of ``FEED_COLUMNS``. Returns them with the cursor to continue from
+    and whether more are available.
+
+    Waits up to ``wait`` seconds for entries when there are none. Raises ``ExpiredCursor``, and ``ValueError`` on a
+    malformed cursor.
+    """
+    after, caught_up = parse_cursor(cursor)
+    expiry = timezone.now() - timedelta(seconds=settings.USER_CHANGES_RETENTION)
+    if caught_up is not None and caught_up < int(expiry.timestamp()):
+        raise ExpiredCursor(cursor)
+
+    deadline = time.monotonic() + wait
+    generation = get_generation()
+    rows, has_more, read_at = fetch(after, limit)
+    while not rows and time.monotonic() < deadline:
+        release_connection()
+        time.sleep(min(settings.USER_CHANGES_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+        current = get_generation()
+        if current != generation:
+            generation = current
+            rows, has_more, read_at = fetch(after, limit)
+
+    if has_more:
+        return rows, encode_cursor(rows[-1][0], rows[-1][-1]), True
+    # Caught up with everything sequenced.
+    return rows, encode_cursor(rows[-1][0] if rows else after, read_at), False
+
+
+def prune(batch_size: int) -> int:
+    """
+    Delete up to ``batch_size`` entries older than the retention, returns how many were deleted.
+    """
+    expiry = timezone.now() - timedelta(seconds=settings.USER_CHANGES_RETENTION)
+    ids = list(
+        UserChange.objects.filter(created_at__lt=expiry).order_by("id").values_list("id", flat=True)[:batch_size]
+    )
+    if ids:
+        UserChange.objects.filter(id__in=ids).delete()
+    return len(ids)
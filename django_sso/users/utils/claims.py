@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# local
+from django_sso.core.redis import get_client
+
+logger = logging.getLogger(__name__)
+
+# Claims released for each scope, in the order they appear in responses.
+SCOPE_CLAIMS = {
+    "email": ("email", "email_verified"),
+    "profile": ("name", "given_name", "family_name", "profile_picture"),
+}
+
+SUPPORTED_CLAIMS = [name for names in SCOPE_CLAIMS.values() for name in names]
+
+CLAIMS_CACHE_TIMEOUT = 24 * 60 * 60
+
+# The claim each of User.CLAIM_FIELDS is released as.
+COLUMN_CLAIMS = {
+    "email": "email",
+    "email_verified": "email_verified",
+    "username": "name",
+    "first_name": "given_name",
+    "last_name": "family_name",
+    "profile_picture": "profile_picture",
+}
+
+
+def claims_version_cache_key(user_id) -> str:
+    return f"user_claims_version:{user_id}"
+
+
+def claims_cache_key(user_id, version) -> str:
+    return f"user_claims:{user_id}:{version}"
+
+
+def set_claims_version(user_id, version: int):
+    cache.set(claims_version_cache_key(user_id), version, timeout=CLAIMS_CACHE_TIMEOUT)
+
+
+def set_claims_versions(versions: dict):
+    """
+    ``set_claims_version`` for many users at once, ``versions`` maps user ids to versions.
+    """
+    cache.set_many(
+        {claims_version_cache_key(user_id): version for user_id, version in versions.items()},
+        timeout=CLAIMS_CACHE_TIMEOUT,
+    )
+
+
+def add_claims_versions(versions: dict):
+    """
+    Cache the versions of the users that have none cached yet, ``versions`` maps user ids to versions.
+
+    As in get_claims_version(), a concurrent save that cached a newer version wins. With Redis the versions are
+    written in one round trip, a pipeline of ``SET NX EX``.
+    """
+    client = get_client()
+    if client is None:
+        for user_id, version in versions.items():
+            cache.add(claims_version_cache_key(user_id), version, timeout=CLAIMS_CACHE_TIMEOUT)
+        return
+
+    from redis.exceptions import RedisError
+
+    pipe = client.pipeline(transaction=False)
+    for user_id, version in versions.items():
+        # django-redis stores integers unpickled, so cache.get() reads these back.
+        pipe.set(cache.make_key(claims_version_cache_key(user_id)), version, nx=True, ex=CLAIMS_CACHE_TIMEOUT)
+    try:
+        pipe.execute()
+    except RedisError:
+        # get_claims_version() caches them on its next miss.
+        logger.warning("Caching claims versions failed", exc_info=True)
+
+
+def delete_claims_version(user_id):
+    cache.delete(claims_version_cache_key(user_id))
+
+
+def delete_claims_versions(user_ids):
+    cache.delete_many([claims_version_cache_key(user_id) for user_id in user_ids])
+
+
+def get_claims_version(user_id) -> int | None:
+    """
+    Return the current claims version of a user, or ``None`` if the user does not exist.
+
+    Served from the cache, the database is only hit (for a single column) on a miss.
+    """
+    key = claims_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = get_user_model().objects.filter(id=user_id).values_list("claims_version", flat=True).first()
+        if version is not None:
+            # add() rather than set(), so a concurrent save that already cached a newer version wins.
+            cache.add(key, version, timeout=CLAIMS_CACHE_TIMEOUT)
+    return version
+
+
+def serialize_claims(user) -> dict:
+    """
+    All claims of a user, regardless of scope. ``profile_picture`` is kept as a relative URL.
+    """
+    return {
+        "sub": str(user.id),
+        "email": user.email,
+        "email_verified": user.email_verified,
+        "name": user.username,
+        "given_name": user.first_name,
+        "family_name": user.last_name,
+        "profile_picture": user.profile_picture.url if user.profile_picture else None,
+    }
+
+
+def get_user_claims(user_id, version: int) -> dict | None:
+    """
+    Return the claims of a user at the given version, or ``None`` if the user does not exist.
+    """
+    key = claims_cache_key(user_id, version)
+    claims = cache.get(key)
+    if claims is None:
+        user = get_user_model().objects.filter(id=user_id).first()
+        if user is None or user.claims_version < version:
+            # Read from a replica that is behind: the claims cached under this version must be the current ones.
+            user = get_user_model().objects.using(DEFAULT_DB_ALIAS).filter(id=user_id).first()
+        if not user:
+            return None
+        claims = serialize_claims(user)
+        cache.set(key, claims, timeout=CLAIMS_CACHE_TIMEOUT)
+    return claims
+
+
+def get_many_user_claims(user_ids: list[str]) -> dict:
+    """
+    ``get_user_claims`` of many users at their current version, keyed by user id. Missing users are left out.
+
+    Two cache round trips for the cached users, and for the others one query (of the claim columns only) and two
+    more round trips to cache them.
+    """
+    version_keys = {claims_version_cache_key(user_id): user_id for user_id in user_ids}
+    versions = {version_keys[key]: version for key, version in cache.get_many(version_keys).items()}
+    claims_keys = {claims_cache_key(user_id, version): user_id for user_id, version in versions.items()}
+    found = {claims_keys[key]: claims for key, claims in cache.get_many(claims_keys).items()}
+
+    missing = [user_id for user_id in user_ids if user_id not in found]
+    if missing:
+        User = get_user_model()
+        users = User.objects.filter(id__in=missing).only("claims_version", *User.CLAIM_FIELDS)
+        fresh, versions = {}, {}
+        for user in users:
+            user_id = str(user.id)
+            found[user_id] = fresh[claims_cache_key(user_id, user.claims_version)] = serialize_claims(user)
+            versions[user_id] = user.claims_version
+        cache.set_many(fresh, timeout=CLAIMS_CACHE_TIMEOUT)
+        add_claims_versions(versions)
+    return found
+
+
+def filter_claims(claims: dict, scopes: list[str], request=None) -> dict:
+    """
+    Keep the claims granted by ``scopes``. Relative picture URLs are made absolute when a request is given.
+    """
+    data = {"sub": claims["sub"]}
+    for scope, names in SCOPE_CLAIMS.items():
+        if scope in scopes:
+            for name in names:
+                data[name] = claims[name]
+
+    picture = data.get("profile_picture")
+    if picture and request is not None:
+        data["profile_picture"] = request.build_absolute_uri(picture)
+    return data
+
+
+def userinfo_etag(user_id, version: int, scopes: list[str]) -> str:
+    digest = hashlib.sha256(f"{user_id}:{version}:{' '.join(sorted(scopes))}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def parse_claims_request(value: str | None) -> list[str]:
+    """
+    Return the claim names the OIDC ``claims`` request parameter asks for in the ID token.
+
+    Unknown claims are ignored. Raises ``ValueError`` when the parameter is not a JSON object.
+    """
+    if not value:
+        return []
+    data = json.loads(value)
+    if not isinstance(data, dict):
+        raise ValueError("claims must be a JSON object")
+    id_token = data.get("id_token") or {}
+    if not isinstance(id_token, dict):
+        raise ValueError("claims.id_token must be a JSON object")
+    return [name for name in id_token if name in SUPPORTED_CLAIMS]
+
+
+def build_id_token_claims(user, scopes: list[str], names: list[str], request=None) -> dict:
+    """
+    The claims among ``names`` that the granted scopes release, taken from an already loaded user.
+    """
+    claims = filter_claims(serialize_claims(user), scopes, request)
+    return {name: claims[name] for name in names if name in claims and name != "sub"}
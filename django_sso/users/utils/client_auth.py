@@ -0,0 +1,45 @@
+import base64
+import binascii
+from urllib.parse import unquote
+
+# model
+from django_sso.users.models import Application
+
+# utils
+from django_sso.users.utils.activity import touch_client
+
+
+def get_basic_credentials(request) -> tuple[str, str] | None:
+    """
+    The ``(client_id, client_secret)`` of an HTTP Basic ``Authorization`` header (RFC 6749 section 2.3.1).
+    """
+    auth_header = request.headers.get("Authorization", "")
+    scheme, _, credentials = auth_header.partition(" ")
+    if scheme.lower() != "basic" or not credentials:
+        return None
+    try:
+        client_id, separator, client_secret = base64.b64decode(credentials, validate=True).decode().partition(":")
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    if not separator:
+        return None
+    return unquote(client_id), unquote(client_secret)
+
+
+def authenticate_client(request, data=None) -> Application | None:
+    """
+    Return the active application authenticated by the request, from HTTP Basic credentials or, when ``data`` is
+    given, its ``client_id`` and ``client_secret`` parameters.
+    """
+    credentials = get_basic_credentials(request)
+    if credentials is None and data is not None:
+        credentials = (str(data.get("client_id", "")), str(data.get("client_secret", "")))
+    if not credentials or not all(credentials):
+        return None
+
+    client_id, client_secret = credentials
+    client = Application.objects.filter(client_id=client_id, is_active=True).first()
+    if client is None or not client.check_client_secret(client_secret):
+        return None
+    touch_client(client.client_id)
+    return client
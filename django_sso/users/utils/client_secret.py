@@ -0,0 +1,37 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+
+# Client secrets are 512-bit random tokens, a keyed hash is enough to protect them at rest, a memory-hard password
+# hash only makes every token request CPU-bound. The version identifies the scheme, bump it to change the scheme.
+ALGORITHM = "hmac_sha256"
+VERSION = "v1"
+PREFIX = f"{ALGORITHM}${VERSION}$"
+
+
+def make_client_secret(raw_secret: str) -> str:
+    """
+    Return ``raw_secret`` hashed for storage: an HMAC-SHA256 keyed with ``SSO["CLIENT_SECRET_PEPPER"]``.
+    """
+    digest = hmac.new(settings.SSO["CLIENT_SECRET_PEPPER"].encode(), raw_secret.encode(), hashlib.sha256)
+    return PREFIX + digest.hexdigest()
+
+
+def check_client_secret(raw_secret: str, encoded: str) -> bool:
+    """
+    Check ``raw_secret`` against a stored secret.
+
+    Secrets stored before the HMAC scheme (argon2) are still accepted, use ``must_update_client_secret`` to
+    migrate them once they verified.
+    """
+    if not raw_secret or not encoded:
+        return False
+    if encoded.startswith(PREFIX):
+        return hmac.compare_digest(make_client_secret(raw_secret), encoded)
+    return check_password(raw_secret, encoded)
+
+
+def must_update_client_secret(encoded: str) -> bool:
+    return not encoded.startswith(PREFIX)
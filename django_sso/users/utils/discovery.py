@@ -0,0 +1,114 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import reverse
+
+# local
+from django_sso.core.http import PrecomputedDocument
+from django_sso.users.utils.claims import SUPPORTED_CLAIMS
+
+# Bumped by rebuild_documents() in the shared cache, so that every process rebuilds its documents.
+VERSION_KEY = "documents:version"
+
+_documents: dict[str, PrecomputedDocument] = {}
+_version = None
+_version_checked_at = float("-inf")
+
+
+def build_discovery_document():
+    issuer = settings.SSO.get("ISSUER_URL")
+    base = issuer.rstrip("/")
+    return {
+        "issuer": issuer,
+        "authorization_endpoint": base + reverse("accounts:web:authorize"),
+        "token_endpoint": base + reverse("accounts:api:token"),
+        "userinfo_endpoint": base + reverse("accounts:api:userinfo"),
+        "jwks_uri": base + reverse("accounts:api:jwks"),
+        "response_types_supported": ["code"],
+        "subject_types_supported": ["public"],
+        "id_token_signing_alg_values_supported": ["HS256"],
+        "scopes_supported": ["openid", "email", "profile"],
+        "claims_supported": ["sub", *SUPPORTED_CLAIMS],
+        "claims_parameter_supported": True,
+        "grant_types_supported": ["authorization_code", "refresh_token"],
+        "token_endpoint_auth_methods_supported": ["client_secret_post"],
+        "code_challenge_methods_supported": ["plain", "S256"],
+        "backchannel_logout_supported": True,
+        "backchannel_logout_session_supported": False,
+    }
+
+
+def build_jwks_document():
+    # TODO: add RS256 support
+    return {
+        "keys": [
+            {
+                "kty": "oct",
+                "use": "sig",
+                "alg": "HS256",
+                "kid": "default",
+            }
+        ]
+    }
+
+
+DOCUMENT_BUILDERS = {
+    "discovery": build_discovery_document,
+    "jwks": build_jwks_document,
+}
+
+
+def check_version():
+    """
+    Drop the documents of this process when another one rebuilt them, looking at most every
+    ``DOCUMENT_VERSION_CHECK_INTERVAL``.
+    """
+    global _version, _version_checked_at
+    now = time.monotonic()
+    if now - _version_checked_at < settings.SSO.get("DOCUMENT_VERSION_CHECK_INTERVAL").total_seconds():
+        return
+    _version_checked_at = now
+    version = cache.get(VERSION_KEY)
+    if version != _version:
+        _documents.clear()
+        _version = version
+
+
+def get_document(name: str) -> PrecomputedDocument:
+    check_version()
+    document = _documents.get(name)
+    if document is None:
+        max_age = int(settings.SSO.get("DOCUMENT_CACHE_MAX_AGE").total_seconds())
+        document = _documents[name] = PrecomputedDocument(DOCUMENT_BUILDERS[name](), max_age=max_age)
+    return document
+
+
+def build_documents():
+    """
+    Build the discovery and JWKS documents of this process ahead of the first request.
+    """
+    for name in DOCUMENT_BUILDERS:
+        get_document(name)
+
+
+def rebuild_documents():
+    """
+    Rebuild the discovery and JWKS documents, in every process. Call this after rotating the signing keys: the other
+    processes rebuild theirs within ``DOCUMENT_VERSION_CHECK_INTERVAL``.
+    """
+    global _version, _version_checked_at
+    _version = uuid.uuid4().hex
+    _version_checked_at = time.monotonic()
+    cache.set(VERSION_KEY, _version, timeout=None)
+    _documents.clear()
+    build_documents()
+
+
+@receiver(setting_changed)
+def reset_documents(*, setting, **kwargs):
+    if setting in ("SSO", "ROOT_URLCONF"):
+        _documents.clear()
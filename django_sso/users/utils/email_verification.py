@@ -1,25 +1,47 @@
-import secrets
-
+"""
+Stateless email verification tokens.
+
+A token is the user id and a hash of their verification state (email address, whether it is verified), signed and
+timestamped with ``SECRET_KEY``. Nothing is stored when a token is issued, so links can be generated in bulk, and
+every link sent to a user stops working once the email is verified or changed. The only storage is a short lived
+marker of used tokens, guarding against the same link being submitted twice at once.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
 from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+SALT = "django_sso.users.email_verification"
 
 
-def generate_email_verification_token(user_id):
-    """Generate a new email verification token and store it in Redis"""
-    token = secrets.token_urlsafe(32)
-    cache_key = f"email_verification:{token}"
+def verification_state_hash(user) -> str:
+    return salted_hmac(SALT, f"{user.pk}:{user.email}:{user.email_verified}", algorithm="sha256").hexdigest()[:32]
 
-    cache.set(cache_key, user_id, timeout=24 * 60 * 60)
 
-    return token
+def generate_email_verification_token(user) -> str:
+    """
+    Generate an email verification token for ``user``, no server side storage is involved.
+    """
+    return signing.dumps({"u": str(user.pk), "s": verification_state_hash(user)}, salt=SALT)
 
 
-def verify_email_token(token):
-    """Verify email verification token and return user_id if valid"""
-    cache_key = f"email_verification:{token}"
-    user_id = cache.get(cache_key)
+def verify_email_token(token: str):
+    """
+    Return the user an email verification token was issued to, or None if it is invalid, expired or already used.
+    """
+    try:
+        data = signing.loads(token, salt=SALT, max_age=settings.EMAIL_VERIFICATION_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
 
-    if user_id:
-        cache.delete(cache_key)
-        return user_id
+    user = get_user_model().objects.filter(pk=data["u"]).first()
+    if user is None or verification_state_hash(user) != data["s"]:
+        return None
 
-    return None
+    # The state hash changes once the email is verified, this only stops a token being replayed in the meantime.
+    signature = token.rsplit(signing.Signer().sep, 1)[1]
+    if not cache.add(f"email_verification:used:{signature}", 1, timeout=settings.EMAIL_VERIFICATION_TOKEN_MAX_AGE):
+        return None
+    return user
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+
+# local
+from django_sso.core.email.delivery import deliver, make_message
+
+# utils
+from django_sso.users.utils import outbox
+
+
+def send_templated_email(to: str, subject_template: str, body_template: str, context: dict, user=None):
+    """
+    Queue an email through the outbox, in the current transaction.
+
+    The templates are rendered by the worker. ``context`` must be JSON serializable, ``user`` is reloaded and added
+    to it as ``user``.
+    """
+    payload = {
+        "to": to,
+        "subject_template": subject_template,
+        "body_template": body_template,
+        "context": context,
+        "user_id": str(user.pk) if user else None,
+    }
+    return outbox.publish("email", payload)
+
+
+def deliver_outbox_emails(messages):
+    """
+    Outbox handler of the ``email`` topic: render the messages and send them over one connection.
+    """
+    user_ids = {message.payload["user_id"] for message in messages if message.payload.get("user_id")}
+    users = {str(pk): user for pk, user in get_user_model().objects.in_bulk(user_ids).items()}
+
+    emails = []
+    for message in messages:
+        payload = message.payload
+        if "html" in payload:
+            # Rendered by the sender (django_sso.core.email.send_mail).
+            email = make_message(payload["subject"], payload["html"], payload["to"], payload["attachments"])
+            emails.append({**email, "attempts": message.attempts, "outbox_id": str(message.id)})
+            continue
+
+        context = dict(payload["context"])
+        if payload["user_id"]:
+            context["user"] = users.get(payload["user_id"])
+            if context["user"] is None:
+                # The user is gone, so is the reason to email them.
+                continue
+
+        emails.append(
+            {
+                **make_message(
+                    render_to_string(payload["subject_template"], context).strip(),
+                    render_to_string(payload["body_template"], context),
+                    payload["to"],
+                ),
+                "attempts": message.attempts,
+                "outbox_id": str(message.id),
+            }
+        )
+
+    failed = {email["outbox_id"]: email["attempts"] for email in deliver(emails)}
+    retries = []
+    for message in messages:
+        if str(message.id) in failed:
+            message.attempts = failed[str(message.id)]
+            retries.append(message)
+    return retries
@@ -0,0 +1,110 @@
+"""
+Transactional outbox.
+
+``publish()`` writes an ``OutboxMessage`` in the current transaction, so a message exists if and only if the work
+that produced it committed. Once committed, ``dispatch()`` (run by the ``dispatch_outbox`` task) claims the
+available messages in bulk, hands them to the handler of their topic (``settings.OUTBOX_HANDLERS``), deletes the
+ones handled and schedules the others for a retry.
+
+A claimed message is leased for ``OUTBOX_LEASE`` seconds: when a worker dies mid-batch its messages are picked up
+again after the lease, so delivery is at least once, and exactly once unless a worker dies.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# model
+from django_sso.users.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_SCHEDULED_KEY = "outbox:dispatch_scheduled"
+
+
+def publish(topic: str, payload: dict) -> OutboxMessage:
+    """
+    Add a message to the outbox, within the current transaction. The dispatcher is kicked once it commits.
+    """
+    message = OutboxMessage.objects.create(topic=topic, payload=payload)
+    transaction.on_commit(schedule_dispatch)
+    return message
+
+
+def schedule_dispatch():
+    from django_sso.users.tasks import dispatch_outbox
+
+    # At most one dispatch scheduled at a time, the running one clears the key when it starts.
+    if cache.add(DISPATCH_SCHEDULED_KEY, 1, timeout=60):
+        dispatch_outbox.delay()
+
+
+def claim(batch_size: int) -> list[OutboxMessage]:
+    """
+    Lease up to ``batch_size`` available messages, oldest first, skipping the ones other workers are claiming.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(available_at__lte=now)
+            .order_by("available_at")[:batch_size]
+        )
+        OutboxMessage.objects.filter(id__in=[message.id for message in messages]).update(
+            available_at=now + timedelta(seconds=settings.OUTBOX_LEASE)
+        )
+    return messages
+
+
+def dispatch(batch_size: int | None = None) -> int:
+    """
+    Handle one batch of messages, returns how many were claimed.
+
+    A handler takes the messages of its topic and returns the ones to retry, with ``attempts`` updated.
+    """
+    messages = claim(batch_size or settings.OUTBOX_BATCH_SIZE)
+
+    by_topic = defaultdict(list)
+    for message in messages:
+        by_topic[message.topic].append(message)
+
+    handled, retries = [], []
+    for topic, topic_messages in by_topic.items():
+        try:
+            handler = import_string(settings.OUTBOX_HANDLERS[topic])
+            failed = handler(topic_messages)
+        except Exception:
+            logger.exception("Outbox handler for %s failed", topic)
+            for message in topic_messages:
+                message.attempts += 1
+            failed = topic_messages
+
+        failed_ids = {message.id for message in failed}
+        handled += [message.id for message in topic_messages if message.id not in failed_ids]
+        retries += failed
+
+    now = timezone.now()
+    for message in list(retries):
+        if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            logger.error("Dropping outbox message %s after %d attempts", message, message.attempts)
+            retries.remove(message)
+            handled.append(message.id)
+        else:
+            message.available_at = now + timedelta(seconds=retry_delay(message.attempts))
+
+    OutboxMessage.objects.filter(id__in=handled).delete()
+    OutboxMessage.objects.bulk_update(retries, ["attempts", "available_at"])
+    return len(messages)
+
+
+def retry_delay(attempts: int) -> int:
+    """
+    Seconds before retrying a message that failed ``attempts`` times: 10s, 20s, 40s... capped at an hour.
+    """
+    return min(10 * 2 ** max(attempts - 1, 0), 60 * 60)
@@ -0,0 +1,75 @@
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import PasswordResetTokenGenerator as DJPasswordResetTokenGenerator
+from django.core.cache import cache
+from django.db import connection
+from django.utils.crypto import salted_hmac
+
+# local
+from django_sso.core.hashers import get_hashing_executor
+
+SESSION_AUTH_HASH_SALT = "django.contrib.auth.models.AbstractBaseUser.get_session_auth_hash"
+
+
+def superseded_password_cache_key(user_id) -> str:
+    return f"superseded_password:{user_id}"
+
+
+def rehash_password(user_id, encoded: str, raw_password: str) -> Future | None:
+    """
+    Re-hash a password with the current hasher parameters in the background, on the hashing pool.
+
+    Returns the future, or ``None`` when the pool is busy, in which case the next login tries again.
+    """
+    return get_hashing_executor().submit("rehash", _rehash_password, user_id, encoded, raw_password)
+
+
+def _rehash_password(user_id, encoded: str, raw_password: str) -> bool:
+    try:
+        # Only replace the hash we verified, a password change in the meantime wins.
+        rehashed = make_password(raw_password)
+        updated = get_user_model().objects.filter(id=user_id, password=encoded).update(password=rehashed)
+        if updated:
+            # Sessions store an HMAC of the password hash, keep the ones made with the old hash valid for as long as
+            # the password stays the rehashed one.
+            cache.set(superseded_password_cache_key(user_id), (encoded, rehashed), timeout=settings.SESSION_COOKIE_AGE)
+        return bool(updated)
+    finally:
+        # Pool threads live outside the request cycle, don't leave their connection open.
+        connection.close()
+
+
+def superseded_session_auth_hash(user_id, password: str) -> str | None:
+    """
+    The session auth hash of the password hash replaced by the last background rehash, if ``password`` (the user's
+    current hash) is still the one the rehash wrote. Once the password changes, sessions made before are out.
+    """
+    superseded = cache.get(superseded_password_cache_key(user_id))
+    if superseded is None:
+        return None
+    encoded, rehashed = superseded
+    if password != rehashed:
+        return None
+    return salted_hmac(SESSION_AUTH_HASH_SALT, encoded, algorithm="sha256").hexdigest()
+
+
+def forget_superseded_password(user_id):
+    cache.delete(superseded_password_cache_key(user_id))
+
+
+class PasswordResetTokenGenerator(DJPasswordResetTokenGenerator):
+    """
+    Django's generator hashes ``last_login`` so that a login voids the links sent before, but ``last_login`` is
+    written behind (see ``django_sso.users.utils.activity``), and would void them only once flushed. A link is
+    bound to the password instead, so it stops working once used (or the password changes otherwise), and to the
+    email address it was sent to.
+    """
+
+    def _make_hash_value(self, user, timestamp):
+        return f"{user.pk}{user.password}{user.email}{timestamp}"
+
+
+password_reset_token_generator = PasswordResetTokenGenerator()
@@ -1,3 +1,4 @@
+import json
 from urllib.parse import urlencode
 
 from django.conf import settings
@@ -10,30 +11,38 @@ from django.contrib.auth.views import PasswordResetCompleteView as DJPasswordRes
 from django.contrib.auth.views import PasswordResetConfirmView as DJPasswordResetConfirmView
 from django.contrib.auth.views import PasswordResetDoneView as DJPasswordResetDoneView
 from django.contrib.auth.views import PasswordResetView as DJPasswordResetView
+from django.db import transaction
 from django.shortcuts import redirect
-from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.utils.timezone import now
 from django.views import View
 from django.views.generic.base import TemplateView
 from django.views.generic.edit import FormView
 
-from django_sso.core.email.send_mail import send_mail
+from django_sso.core.ratelimit import check_rate_limits, get_client_ip
 
 # form
 from django_sso.users.forms import PasswordResetForm, RegisterForm, ResendVerificationForm
 
 # local
 # models
-from django_sso.users.models import Application, User
+from django_sso.users.models import Application, AuditEvent, User
+from django_sso.users.utils import audit
 from django_sso.users.utils.auth import create_and_cache_auth_code
+from django_sso.users.utils.claims import parse_claims_request
 from django_sso.users.utils.email_verification import generate_email_verification_token, verify_email_token
+from django_sso.users.utils.emails import send_templated_email
+from django_sso.users.utils.passwords import password_reset_token_generator
 
 # utils
 from django_sso.utils.string import normalize_uri
 
 
+# Reads only (the client, and the user through the session), so it doesn't hold a transaction and the reads go to
+# the replicas.
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class AuthorizeView(View):
     def get(self, request, *args, **kwargs):
         client_id = request.GET.get("client_id")
@@ -45,6 +54,11 @@ class AuthorizeView(View):
         code_challenge = request.GET.get("code_challenge")
         code_challenge_method = request.GET.get("code_challenge_method")
 
+        try:
+            claims = parse_claims_request(request.GET.get("claims"))
+        except ValueError:
+            return self._error_redirect(redirect_uri, state, "invalid_request")
+
         if response_type != "code":
             return self._error_redirect(redirect_uri, state, "unsupported_response_type")
 
@@ -77,6 +91,7 @@ class AuthorizeView(View):
             "nonce": nonce,
             "code_challenge": code_challenge,
             "code_challenge_method": code_challenge_method,
+            "claims": claims,
         }
 
         if not request.user.is_authenticated:
@@ -117,6 +132,7 @@ class AuthorizeView(View):
         nonce = context.get("nonce")
         code_challenge = context.get("code_challenge")
         code_challenge_method = context.get("code_challenge_method")
+        claims = context.get("claims", [])
 
         client = Application.objects.filter(client_id=client_id, is_active=True).first()
         if not client:
@@ -130,7 +146,9 @@ class AuthorizeView(View):
             nonce=nonce,
             code_challenge=code_challenge,
             code_challenge_method=code_challenge_method,
+            claims=claims,
         )
+        audit.record(AuditEvent.Event.CODE_ISSUED, request, user_id=request.user.pk, client_id=client_id, scopes=scope)
         query = urlencode({"code": auth_code, "state": state})
         return redirect(f"{redirect_uri}?{query}")
 
@@ -168,6 +186,7 @@ class ResumeAuthorizationView(LoginRequiredMixin, View):
         nonce = oidc_context.get("nonce", [])
         code_challenge = oidc_context.get("code_challenge", [])
         code_challenge_method = oidc_context.get("code_challenge_method", [])
+        claims = oidc_context.get("claims", [])
 
         authorizer_url = reverse("accounts:web:authorize")
         query_params = {
@@ -179,6 +198,8 @@ class ResumeAuthorizationView(LoginRequiredMixin, View):
             "code_challenge": code_challenge,
             "code_challenge_method": code_challenge_method,
         }
+        if claims:
+            query_params["claims"] = json.dumps({"id_token": {name: None for name in claims}})
         authorizer_url += f"?{urlencode(query_params)}"
         return redirect(authorizer_url)
 
@@ -201,6 +222,14 @@ class LoginView(DJLoginView):
     authentication_form = AuthenticationForm
     redirect_authenticated_user = True
 
+    def post(self, request, *args, **kwargs):
+        # Before the form, so throttled attempts never reach the password hasher.
+        check_rate_limits(
+            ("login:ip", get_client_ip(request)),
+            ("login:account", request.POST.get("username", "").strip().lower()),
+        )
+        return super().post(request, *args, **kwargs)
+
     def get_success_url(self):
         redirect_to = self.request.GET.get("next")
         if redirect_to and url_has_allowed_host_and_scheme(redirect_to, self.request.get_host()):
@@ -218,7 +247,7 @@ class RegisterView(FormView):
         user.email_verified = False
         user.save()
 
-        token = generate_email_verification_token(user.id)
+        token = generate_email_verification_token(user)
         self.send_verification_email(user, token)
 
         next_url = self.request.GET.get("next", "")
@@ -230,15 +259,18 @@ class RegisterView(FormView):
     def send_verification_email(self, user, token):
         """Send email verification email"""
         context = {
-            "user": user,
             "token": token,
             "domain": self.request.get_host(),
             "protocol": "https" if self.request.is_secure() else "http",
         }
 
-        subject = render_to_string("email/users/email_verification_subject.txt", context).strip()
-        body = render_to_string("email/users/email_verification_email.html", context)
-        send_mail.delay(subject, body, user.email)
+        send_templated_email(
+            user.email,
+            "email/users/email_verification_subject.txt",
+            "email/users/email_verification_email.html",
+            context,
+            user=user,
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -270,19 +302,15 @@ class EmailVerificationView(TemplateView):
 
     def post(self, request, *args, **kwargs):
         token = kwargs.get("token")
-        user_id = verify_email_token(token)
+        user = verify_email_token(token) if token else None
 
-        if not token or not user_id:
+        if not user:
             return self.render_to_response({"success": False, "user": None})
 
-        try:
-            user = User.objects.get(id=user_id)
-            user.email_verified = True
-            user.save(update_fields=["email_verified"])
+        user.email_verified = True
+        user.save(update_fields=["email_verified"])
 
-            return self.render_to_response({"success": True, "user": user})
-        except User.DoesNotExist:
-            return self.render_to_response({"success": False, "user": None})
+        return self.render_to_response({"success": True, "user": user})
 
 
 class ResendVerificationView(FormView):
@@ -297,7 +325,7 @@ class ResendVerificationView(FormView):
         user = User.objects.get(email=email)
 
         if not user.email_verified:
-            token = generate_email_verification_token(user.id)
+            token = generate_email_verification_token(user)
             self.send_verification_email(user, token)
 
         return super().form_valid(form)
@@ -305,15 +333,18 @@ class ResendVerificationView(FormView):
     def send_verification_email(self, user, token):
         """Send email verification email"""
         context = {
-            "user": user,
             "token": token,
             "domain": self.request.get_host(),
             "protocol": "https" if self.request.is_secure() else "http",
         }
 
-        subject = render_to_string("email/users/email_verification_subject.txt", context).strip()
-        body = render_to_string("email/users/email_verification_email.html", context)
-        send_mail.delay(subject, body, user.email)
+        send_templated_email(
+            user.email,
+            "email/users/email_verification_subject.txt",
+            "email/users/email_verification_email.html",
+            context,
+            user=user,
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -336,6 +367,7 @@ class PasswordResetView(DJPasswordResetView):
     subject_template_name = "email/users/password_reset_subject.txt"
     success_url = "/users/password-reset/done/"
     form_class = PasswordResetForm
+    token_generator = password_reset_token_generator
 
 
 class PasswordResetDoneView(DJPasswordResetDoneView):
@@ -346,6 +378,7 @@ class PasswordResetConfirmView(DJPasswordResetConfirmView):
     template_name = "users/password_reset_confirm.html"
     form_class = SetPasswordForm
     success_url = "/users/reset/done/"
+    token_generator = password_reset_token_generator
 
 
 class PasswordResetCompleteView(DJPasswordResetCompleteView):